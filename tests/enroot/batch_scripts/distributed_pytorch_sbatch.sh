@@ -15,6 +15,7 @@
 # limitations under the License.
 
 #SBATCH --job-name=pytorch-nccl-multinode
+# --nodes and --ntasks-per-node are defaults, the scaling sweep overrides them on the sbatch command line
 #SBATCH --nodes=2
 #SBATCH --ntasks-per-node=8
 #SBATCH --cpus-per-task=8
@@ -41,14 +42,19 @@ srun --ntasks-per-node=1 bash -lc 'mkdir -p /tmp/xdg-$SLURM_NODEID/enroot /tmp/x
 
 # Create temporary directories on all nodes
 echo "Creating enroot image on all nodes..."
-srun --nodes=2 --ntasks=2 \
+srun --nodes=$SLURM_JOB_NUM_NODES --ntasks=$SLURM_JOB_NUM_NODES \
      --ntasks-per-node=1 \
      bash -c '
     mkdir -p "$ENROOT_DATA_PATH" "$ENROOT_CACHE_PATH"
 
+        # Jobs sharing the node import one after the other, the image is moved in place once complete
+        exec 9>"$ENROOT_DATA_PATH/$IMAGE_NAME.lock"
+        flock 9
         if [ ! -f "$ENROOT_DATA_PATH/$IMAGE_NAME" ]; then
             echo "[$(hostname)] Importing enroot image..."
-            enroot import -o "$ENROOT_DATA_PATH/$IMAGE_NAME" "$DOCKER_IMAGE"
+            rm -f "$ENROOT_DATA_PATH/$IMAGE_NAME.$SLURM_JOB_ID"
+            enroot import -o "$ENROOT_DATA_PATH/$IMAGE_NAME.$SLURM_JOB_ID" "$DOCKER_IMAGE"
+            mv "$ENROOT_DATA_PATH/$IMAGE_NAME.$SLURM_JOB_ID" "$ENROOT_DATA_PATH/$IMAGE_NAME"
         else
             echo "[$(hostname)] Image already present"
         fi
@@ -56,7 +62,7 @@ srun --nodes=2 --ntasks=2 \
 
 
 # Barrier (all nodes must have image)
-srun --nodes=2 --ntasks=2 \
+srun --nodes=$SLURM_JOB_NUM_NODES --ntasks=$SLURM_JOB_NUM_NODES \
      --ntasks-per-node=1 \
      bash -c 'echo "[\$(hostname)] Image ready"'
 
@@ -93,7 +99,9 @@ echo "================================================"
 # Get master node IP using srun
 echo "Detecting master node IP..."
 MASTER_ADDR=$(srun --nodes=1 --ntasks=1 bash -c 'getent hosts $(hostname -s) | awk "{print \$1}"' | head -n 1)
-MASTER_PORT=29500
+# Port per job, jobs sharing a node must not collide. Even ports only,
+# distributed_pytorch.py also listens on MASTER_PORT + 1
+MASTER_PORT=$(( 20000 + (SLURM_JOB_ID % 10000) * 2 ))
 
 # Validate we got an IP
 if [ -z "$MASTER_ADDR" ]; then
@@ -124,6 +132,9 @@ echo "================================================"
 export MASTER_ADDR=$MASTER_ADDR 
 export MASTER_PORT=$MASTER_PORT
 
+# Extra arguments of distributed_pytorch.py, e.g. "--sweep --max-bytes 1G"
+export DIST_PYTORCH_ARGS="${DIST_PYTORCH_ARGS:-}"
+
 # To enable NCCL/RCCL Debug logs 
 export NCCL_DEBUG=INFO
 export NCCL_DEBUG_SUBSYS=INIT,NET
@@ -151,7 +162,7 @@ srun --unbuffered \
      export LOCAL_RANK=$SLURM_LOCALID
 
      echo "[Rank $RANK on $SLURMD_NODENAME] Using $MASTER_ADDR:$MASTER_PORT on interface $NCCL_SOCKET_IFNAME"
-     python3 -u distributed_pytorch.py
+     python3 -u distributed_pytorch.py $DIST_PYTORCH_ARGS
      '
 
 echo "================================================"
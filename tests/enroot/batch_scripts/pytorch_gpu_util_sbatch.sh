@@ -29,9 +29,12 @@ IMAGE_PATH=$PWD/$IMAGE_NAME
 DOCKER_IMAGE=rocm/pytorch:latest
 
 # Create image only once
+# Jobs of several nodes may run at the same time on a shared home directory,
+# so the image is imported to a per-job file and renamed into place atomically
 if [[ ! -f "$IMAGE_PATH" ]]; then
     echo "Creating Enroot image..."
-    enroot import -o "$IMAGE_PATH" docker://$DOCKER_IMAGE
+    enroot import -o "$IMAGE_PATH.$SLURM_JOB_ID" docker://$DOCKER_IMAGE
+    mv -f "$IMAGE_PATH.$SLURM_JOB_ID" "$IMAGE_PATH"
 else
     echo "Using existing Enroot image"
 fi
@@ -58,4 +61,5 @@ srun      --container-image="$IMAGE_PATH" \
      export MIOPEN_CUSTOM_CACHE_DIR=/ws/test_slurm/.config/miopen
      mkdir -p /ws/test_slurm/miopen_cache
      chmod +x /ws/test_slurm/gpu_stress_10s.py
-     torchrun --standalone --nproc_per_node=4 /ws/test_slurm/gpu_stress_10s.py '
\ No newline at end of file
+     torchrun --standalone --nproc_per_node=${NPROC_PER_NODE:-gpu} /ws/test_slurm/gpu_stress_10s.py \
+         --duration ${STRESS_DURATION:-30} --saturation-window ${SATURATION_WINDOW:-5} '
\ No newline at end of file
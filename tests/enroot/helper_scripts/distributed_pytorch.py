@@ -16,11 +16,24 @@
 
 import torch
 import torch.distributed as dist
+import torch.nn as nn
+from torch.nn.parallel import DistributedDataParallel
+import argparse
+import json
 import os
+import re
 import sys
 import socket
 import datetime
+import time
 import traceback
+from contextlib import contextmanager
+
+COLLECTIVES = ("all_reduce", "all_gather", "reduce_scatter", "broadcast", "all_to_all")
+DTYPES = {"float32": torch.float32, "float16": torch.float16, "bfloat16": torch.bfloat16}
+# The teardown spans are exchanged through a separate store on MASTER_PORT + offset,
+# the process group is gone by then
+TIMING_STORE_PORT_OFFSET = 1
 
 def log(message, rank=None):
     timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
@@ -28,8 +41,295 @@ def log(message, rank=None):
     rank_str = f"[Rank {rank}]" if rank is not None else "[INIT]"
     print(f"{timestamp} | {hostname} | {rank_str} | {message}", flush=True)
 
+class PhaseTimer:
+    """
+    Wall clock spans of the phases of one rank, in seconds
+    """
+    def __init__(self, device=None):
+        self.device = device
+        self.spans = {}
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            # Collectives are asynchronous on GPU
+            if self.device is not None:
+                synchronize(self.device)
+            self.spans[name] = time.perf_counter() - start
+
+def summarize_spans(records):
+    """
+    Min/max/mean of every phase across the rank records [{"rank", "hostname", "spans"}],
+    with the slowest rank and its hostname to spot stragglers
+    """
+    phases = {}
+    for name in dict.fromkeys(name for record in records for name in record["spans"]):
+        values = [(record["spans"][name], record) for record in records if name in record["spans"]]
+        slowest = max(values, key=lambda v: v[0])
+        phases[name] = {
+            "min": min(v[0] for v in values),
+            "max": slowest[0],
+            "mean": sum(v[0] for v in values) / len(values),
+            "ranks": len(values),
+            "slowest_rank": slowest[1]["rank"],
+            "slowest_host": slowest[1]["hostname"],
+        }
+    return phases
+
+def write_timings(records, world_size, backend):
+    job_id = os.environ.get('SLURM_JOB_ID', 'unknown')
+    timings_file = f"phase_timings_{job_id}.json"
+    phases = summarize_spans(records)
+    with open(timings_file, "w") as f:
+        json.dump({"job_id": job_id, "world_size": world_size, "backend": backend,
+                   "phases": phases, "ranks": records}, f, indent=4)
+    for name, phase in phases.items():
+        log(f"{name:<20} min {phase['min']:>9.4f}s  mean {phase['mean']:>9.4f}s  max {phase['max']:>9.4f}s "
+            f"(rank {phase['slowest_rank']} on {phase['slowest_host']})", 0)
+    print(f"\n✓ Phase timings written to: {timings_file}", flush=True)
+
+def parse_size(text):
+    """ "4K" -> 4096, "2G" -> 2147483648 """
+    match = re.fullmatch(r"(\d+)([KMG]?)B?", text.strip().upper())
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid size {text}")
+    return int(match.group(1)) * {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30}[match.group(2)]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="PyTorch distributed test - ROCm/RCCL")
+    parser.add_argument("--sweep", action="store_true", help="Run the collective bandwidth sweep after the correctness tests")
+    parser.add_argument("--collectives", default=",".join(COLLECTIVES), help="Comma separated collectives of the sweep")
+    parser.add_argument("--min-bytes", type=parse_size, default=parse_size("4K"), help="Smallest message size of the sweep")
+    parser.add_argument("--max-bytes", type=parse_size, default=parse_size("2G"), help="Largest message size of the sweep")
+    parser.add_argument("--step-factor", type=int, default=2, help="Multiplication factor between two message sizes")
+    parser.add_argument("--dtype", choices=sorted(DTYPES), default="float32", help="Data type of the sweep buffers")
+    parser.add_argument("--warmup", type=int, default=5, help="Warmup iterations per message size")
+    parser.add_argument("--iters", type=int, default=20, help="Timed iterations per message size")
+    parser.add_argument("--ddp", action="store_true", help="Run the DDP training throughput benchmark after the correctness tests")
+    parser.add_argument("--ddp-hidden", type=int, default=4096, help="Width of the synthetic model layers")
+    parser.add_argument("--ddp-layers", type=int, default=8, help="Number of layers of the synthetic model")
+    parser.add_argument("--ddp-batch", type=int, default=64, help="Samples per rank and step")
+    parser.add_argument("--ddp-steps", type=int, default=50, help="Timed training steps")
+    parser.add_argument("--ddp-warmup", type=int, default=5, help="Warmup training steps")
+    parser.add_argument("--bucket-cap-mb", type=int, default=25, help="DDP gradient bucket size in MB")
+    return parser.parse_args(argv)
+
+def busbw_factor(collective, world_size):
+    """Bus bandwidth factor of rccl-tests, busbw = algbw * factor"""
+    n = world_size
+    if collective == "all_reduce":
+        return 2 * (n - 1) / n
+    if collective in ("all_gather", "reduce_scatter", "all_to_all"):
+        return (n - 1) / n
+    return 1.0
+
+def synchronize(device):
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+
+def make_collective(collective, size, dtype, device, world_size, backend):
+    """
+    Returns (run callable, bytes, count, emulated) for one message size.
+
+    size is the largest buffer of a rank, as in rccl-tests: the input of
+    all_reduce/broadcast/reduce_scatter/all_to_all and the output of all_gather.
+    reduce_scatter is emulated with an all_reduce on gloo, which has no reduce_scatter.
+    """
+    elem = torch.tensor([], dtype=dtype).element_size()
+    count = size // elem
+    if collective in ("all_gather", "reduce_scatter", "all_to_all"):
+        count -= count % world_size
+    if count == 0 or (collective in ("all_gather", "reduce_scatter", "all_to_all") and count < world_size):
+        return None
+    chunk = count // world_size
+    emulated = False
+
+    if collective == "all_reduce":
+        buf = torch.ones(count, dtype=dtype, device=device)
+        run = lambda: dist.all_reduce(buf)
+    elif collective == "broadcast":
+        buf = torch.ones(count, dtype=dtype, device=device)
+        run = lambda: dist.broadcast(buf, src=0)
+    elif collective == "all_gather":
+        inp = torch.ones(chunk, dtype=dtype, device=device)
+        out = torch.empty(count, dtype=dtype, device=device)
+        if backend == "nccl":
+            run = lambda: dist.all_gather_into_tensor(out, inp)
+        else:
+            outs = list(out.chunk(world_size))
+            run = lambda: dist.all_gather(outs, inp)
+    elif collective == "reduce_scatter":
+        inp = torch.ones(count, dtype=dtype, device=device)
+        out = torch.empty(chunk, dtype=dtype, device=device)
+        if backend == "nccl":
+            run = lambda: dist.reduce_scatter_tensor(out, inp)
+        else:
+            emulated = True
+            def run():
+                dist.all_reduce(inp)
+                out.copy_(inp[dist.get_rank() * chunk:(dist.get_rank() + 1) * chunk])
+    elif collective == "all_to_all":
+        inp = torch.ones(count, dtype=dtype, device=device)
+        out = torch.empty(count, dtype=dtype, device=device)
+        run = lambda: dist.all_to_all_single(out, inp)
+    else:
+        raise ValueError(f"unknown collective {collective}")
+    return run, count * elem, count, emulated
+
+def run_sweep(args, device, backend, rank, world_size):
+    """
+    Runs every collective over the message sizes and returns the rows on rank 0.
+    The time of a size is the slowest rank's average time per iteration.
+    """
+    dtype = DTYPES[args.dtype]
+    rows = []
+    for collective in [c.strip() for c in args.collectives.split(",") if c.strip()]:
+        size = args.min_bytes
+        while size <= args.max_bytes:
+            op = make_collective(collective, size, dtype, device, world_size, backend)
+            if op is not None:
+                run, nbytes, count, emulated = op
+                for _ in range(args.warmup):
+                    run()
+                synchronize(device)
+                dist.barrier()
+                start = time.perf_counter()
+                for _ in range(args.iters):
+                    run()
+                synchronize(device)
+                elapsed = torch.tensor([(time.perf_counter() - start) / args.iters], dtype=torch.float64, device=device)
+                dist.all_reduce(elapsed, op=dist.ReduceOp.MAX)
+                seconds = elapsed.item()
+                algbw = nbytes / seconds / 1e9
+                rows.append({
+                    "collective": collective, "size": nbytes, "count": count, "type": args.dtype,
+                    "time_us": seconds * 1e6, "algbw": algbw, "busbw": algbw * busbw_factor(collective, world_size),
+                    "emulated": emulated,
+                })
+                if rank == 0:
+                    log(f"{collective:<15} {nbytes:>12} B {seconds * 1e6:>12.1f} us "
+                        f"algbw {algbw:>8.2f} GB/s busbw {rows[-1]['busbw']:>8.2f} GB/s", rank)
+                del run
+            size *= args.step_factor
+    return rows if rank == 0 else None
+
+def percentile(values, pct):
+    """Nearest rank percentile"""
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))]
+
+def synthetic_model(args, device):
+    layers = []
+    for _ in range(args.ddp_layers):
+        layers += [nn.Linear(args.ddp_hidden, args.ddp_hidden), nn.ReLU()]
+    return nn.Sequential(*layers).to(device)
+
+def train(model, args, device):
+    """
+    Trains the model on random data, returns the time of every timed step in seconds
+    """
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.001)
+    loss_fn = nn.MSELoss()
+    inputs = torch.randn(args.ddp_batch, args.ddp_hidden, device=device)
+    targets = torch.randn(args.ddp_batch, args.ddp_hidden, device=device)
+    step_times = []
+    for step in range(args.ddp_warmup + args.ddp_steps):
+        start = time.perf_counter()
+        optimizer.zero_grad(set_to_none=True)
+        loss_fn(model(inputs), targets).backward()
+        optimizer.step()
+        synchronize(device)
+        if step >= args.ddp_warmup:
+            step_times.append(time.perf_counter() - start)
+    return step_times
+
+def run_ddp(args, device, rank, hostname):
+    """
+    Trains the synthetic model on rank 0 alone first, as the single rank baseline,
+    while the other ranks wait, then on every rank under DistributedDataParallel.
+
+    The baseline runs alone so it is not slowed down by the other ranks sharing
+    the node (host memory bandwidth, PCIe, CPU cores), rank 0 shares it with
+    every rank afterwards.
+
+    Return : per rank record
+    """
+    torch.manual_seed(0)
+    model = synthetic_model(args, device)
+    baseline = [None]
+    if rank == 0:
+        baseline_times = train(model, args, device)
+        baseline[0] = args.ddp_batch * len(baseline_times) / sum(baseline_times)
+    dist.barrier()
+    dist.broadcast_object_list(baseline, src=0)
+
+    # DistributedDataParallel starts every rank from the weights of rank 0
+    ddp_model = DistributedDataParallel(model, device_ids=[device.index] if device.type == "cuda" else None,
+                                        bucket_cap_mb=args.bucket_cap_mb)
+    step_times = train(ddp_model, args, device)
+    log(f"DDP {args.ddp_batch * len(step_times) / sum(step_times):.1f} samples/s, "
+        f"single rank {baseline[0]:.1f} samples/s", rank)
+    return {
+        "rank": rank,
+        "hostname": hostname,
+        "elapsed": sum(step_times),
+        "samples_per_sec": args.ddp_batch * len(step_times) / sum(step_times),
+        "baseline_samples_per_sec": baseline[0],
+        "step_time_p50": percentile(step_times, 50),
+        "step_time_p99": percentile(step_times, 99),
+        "step_times": step_times,
+    }
+
+def write_ddp(records, args, world_size, backend):
+    job_id = os.environ.get('SLURM_JOB_ID', 'unknown')
+    ddp_file = f"ddp_throughput_{job_id}.json"
+    step_times = [t for record in records for t in record["step_times"]]
+    # The ranks run in lock step, the slowest one sets the pace
+    total = world_size * args.ddp_batch * args.ddp_steps / max(record["elapsed"] for record in records)
+    # Measured on rank 0 alone, the same value on every rank
+    baseline = records[0]["baseline_samples_per_sec"]
+    report = {
+        "job_id": job_id,
+        "world_size": world_size,
+        "backend": backend,
+        "hidden": args.ddp_hidden,
+        "layers": args.ddp_layers,
+        "batch": args.ddp_batch,
+        "steps": args.ddp_steps,
+        "bucket_cap_mb": args.bucket_cap_mb,
+        "samples_per_sec": total,
+        "baseline_samples_per_sec": baseline,
+        "scaling_efficiency": total / (world_size * baseline),
+        "step_time": {
+            "mean": sum(step_times) / len(step_times),
+            "p50": percentile(step_times, 50),
+            "p90": percentile(step_times, 90),
+            "p99": percentile(step_times, 99),
+            "max": max(step_times),
+        },
+        "ranks": [{k: v for k, v in record.items() if k not in ("step_times", "baseline_samples_per_sec")}
+                  for record in records],
+    }
+    with open(ddp_file, "w") as f:
+        json.dump(report, f, indent=4)
+    log(f"DDP total {total:.1f} samples/s, scaling efficiency {report['scaling_efficiency'] * 100:.1f}% "
+        f"against {world_size} x {baseline:.1f} samples/s", 0)
+    print(f"\n✓ DDP throughput written to: {ddp_file}", flush=True)
+
+def write_sweep(rows, args, world_size, backend):
+    job_id = os.environ.get('SLURM_JOB_ID', 'unknown')
+    sweep_file = f"collective_sweep_{job_id}.json"
+    with open(sweep_file, "w") as f:
+        json.dump({"job_id": job_id, "world_size": world_size, "backend": backend, "dtype": args.dtype,
+                   "warmup": args.warmup, "iters": args.iters, "results": rows}, f, indent=4)
+    print(f"\n✓ Collective sweep written to: {sweep_file}", flush=True)
+
 def main():
     try:
+        args = parse_args()
         log("="*80)
         log("PYTORCH DISTRIBUTED TEST - ROCM/RCCL")
         log("="*80)
@@ -44,6 +344,12 @@ def main():
         log(f"Master: {master_addr}:{master_port}")
         log(f"World size: {world_size}")
         log(f"Rank: {rank} (local: {local_rank})")
+        hostname = socket.gethostname().split('.')[0]
+        timer = PhaseTimer()
+
+        # Store for the teardown spans, opened before the process group so every rank can reach it
+        timing_store = dist.TCPStore(master_addr, int(master_port) + TIMING_STORE_PORT_OFFSET, world_size,
+                                     rank == 0, timeout=datetime.timedelta(seconds=300))
         
         # Track device info and test results
         device_type = "CPU"
@@ -55,6 +361,7 @@ def main():
         allgather_passed = False
         
         # Set up device BEFORE initializing process group
+        device_setup_start = time.perf_counter()
         if torch.cuda.is_available():
             device = torch.device(f'cuda:{local_rank}')
             torch.cuda.set_device(device)
@@ -72,6 +379,8 @@ def main():
             backend_name = 'gloo'
             log("Using CPU", rank)
             log(f"Using backend: {backend}", rank)
+        timer.spans["device_setup"] = time.perf_counter() - device_setup_start
+        timer.device = device
         
         log("="*80)
         log("INITIALIZING PROCESS GROUP")
@@ -89,7 +398,8 @@ def main():
         if backend == 'nccl':
             init_kwargs['device_id'] = device
             
-        dist.init_process_group(**init_kwargs)
+        with timer.span("init_process_group"):
+            dist.init_process_group(**init_kwargs)
         log("✓ Process group initialized!", rank)
         log("="*80, rank)
         
@@ -99,7 +409,9 @@ def main():
         tensor = torch.ones(2, 2).to(device) * (rank + 1)
         log(f"Before allreduce:\n{tensor}", rank)
         
-        dist.all_reduce(tensor, op=dist.ReduceOp.SUM)
+        # The first collective also sets up the communicators
+        with timer.span("all_reduce_first"):
+            dist.all_reduce(tensor, op=dist.ReduceOp.SUM)
         log(f"After allreduce:\n{tensor}", rank)
         
         expected = sum(range(1, world_size + 1))
@@ -120,7 +432,8 @@ def main():
             broadcast_tensor = torch.zeros(4).to(device)
             log(f"Before broadcast: {broadcast_tensor}", rank)
         
-        dist.broadcast(broadcast_tensor, src=0)
+        with timer.span("broadcast"):
+            dist.broadcast(broadcast_tensor, src=0)
         log(f"After broadcast: {broadcast_tensor}", rank)
         
         expected_bcast = torch.tensor([1.0, 2.0, 3.0, 4.0]).to(device)
@@ -137,7 +450,8 @@ def main():
         local_tensor = torch.tensor([float(rank)], dtype=torch.float32).to(device)
         gathered = [torch.zeros(1, dtype=torch.float32).to(device) for _ in range(world_size)]
         
-        dist.all_gather(gathered, local_tensor)
+        with timer.span("all_gather"):
+            dist.all_gather(gathered, local_tensor)
         
         log(f"Gathered tensors: {[t.item() for t in gathered]}", rank)
         
@@ -148,18 +462,19 @@ def main():
         else:
             log("✗ AllGather FAILED", rank)
         
+        # Same collective once the communicators exist
+        with timer.span("all_reduce"):
+            dist.all_reduce(torch.ones(2, 2).to(device))
+
         # Synchronize before summary
-        dist.barrier()
-        
-        # Give time for buffered output to flush
-        import time
-        time.sleep(0.2 * rank)
+        with timer.span("barrier"):
+            dist.barrier()
         
         # Per-rank summary payload
         rank_info = {
             "rank": rank,
             "local_rank": local_rank,
-            "hostname": socket.gethostname().split('.')[0],  # Short hostname
+            "hostname": hostname,  # Short hostname
             "device_type": device_type,
             "device_name": device_name,
             "device_index": device_index,
@@ -169,17 +484,14 @@ def main():
             "allgather_passed": allgather_passed,
         }
         
-        # Gather all results on rank 0
+        # Gather all results on rank 0, all_gather_object returns them in rank order
+        # and synchronizes the ranks, no sleeps or extra barriers are needed
         all_rank_info = [None] * world_size
-        dist.all_gather_object(all_rank_info, rank_info)
-        
-        # Extra barrier and delay before writing summary
-        dist.barrier()
+        with timer.span("all_gather_object"):
+            dist.all_gather_object(all_rank_info, rank_info)
         
         # Rank 0 writes consolidated summary to file AND prints to stdout
         if rank == 0:
-            time.sleep(0.5)  # Let all other output settle
-            
             # Determine output file path
             job_id = os.environ.get('SLURM_JOB_ID', 'unknown')
             summary_file = f"test_summary_{job_id}.txt"
@@ -261,10 +573,36 @@ def main():
             # Also print to stdout
             print("\n" + '\n'.join(summary_lines) + "\n", flush=True)
         
+        if args.sweep:
+            log("="*80, rank)
+            log("COLLECTIVE BANDWIDTH SWEEP", rank)
+            with timer.span("sweep"):
+                rows = run_sweep(args, device, backend, rank, world_size)
+            if rank == 0:
+                write_sweep(rows, args, world_size, backend_name)
+
+        if args.ddp:
+            log("="*80, rank)
+            log("DDP TRAINING THROUGHPUT", rank)
+            with timer.span("ddp"):
+                record = run_ddp(args, device, rank, hostname)
+            records = [None] * world_size
+            dist.all_gather_object(records, record)
+            if rank == 0:
+                write_ddp(records, args, world_size, backend_name)
+
         log("="*80, rank)
         log("✓ Rank completed, destroying process group", rank)
         
-        dist.destroy_process_group()
+        with timer.span("teardown"):
+            dist.destroy_process_group()
+
+        # Every rank publishes its spans, rank 0 waits for all of them
+        timing_store.set(f"spans/{rank}", json.dumps({"rank": rank, "hostname": hostname, "spans": timer.spans}))
+        if rank == 0:
+            keys = [f"spans/{r}" for r in range(world_size)]
+            timing_store.wait(keys)
+            write_timings([json.loads(timing_store.get(key)) for key in keys], world_size, backend_name)
         
     except Exception as e:
         log(f"ERROR: {e}")
@@ -14,42 +14,190 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import argparse
+import csv
+import glob
+import json
+import queue
+import re
+import socket
 import torch
+import torch.distributed as dist
 import torch.multiprocessing as mp
 import threading
 import subprocess
 import time
 import os
-from typing import List, Tuple, Optional
+from array import array
+from collections import deque
+from datetime import timedelta
+from typing import Dict, List, Tuple, Optional
 
 LOG_FILE = "gpu_max_utilization.log"
+STATS_JSON = "gpu_utilization_stats.json"
+STATS_CSV = "gpu_utilization_stats.csv"
+REPORT_FILE = "gpu_stress_report.json"
 UTIL_THRESHOLD = 95      # percent threshold considered "max"
+SYSFS_DRM = "/sys/class/drm"
+SAMPLE_RATE = 20         # monitor samples per second with the sysfs sampler
+STOP_CHECK_INTERVAL = 0.25  # seconds between two checks of the stop file by the workers
 WROTE_EVENT = threading.Event()
 
 
 # --------------------------
-# Worker: multi-stream GEMM
+# Workload: multi-stream GEMM
 # --------------------------
-def stress_gpu(gpu_id: int, duration: int = 30, num_streams: int = 8, N: int = 16384):
-    # each process sets its own device
-    torch.cuda.set_device(gpu_id)
-    device = torch.device("cuda", gpu_id)
+DTYPES = {"fp32": torch.float32, "fp16": torch.float16, "bf16": torch.bfloat16}
+
+# Peak dense matrix TFLOPS by device name, the first key found in the name is used
+EXPECTED_TFLOPS = {
+    "MI355": {"fp32": 157.3, "fp16": 2516.6, "bf16": 2516.6},
+    "MI325": {"fp32": 163.4, "fp16": 1307.4, "bf16": 1307.4},
+    "MI300A": {"fp32": 122.6, "fp16": 980.6, "bf16": 980.6},
+    "MI300": {"fp32": 163.4, "fp16": 1307.4, "bf16": 1307.4},
+    "MI250": {"fp32": 95.7, "fp16": 383.0, "bf16": 383.0},
+    "MI210": {"fp32": 45.3, "fp16": 181.0, "bf16": 181.0},
+}
+
+
+def expected_tflops(device_name: str, dtype: str) -> Optional[float]:
+    for key, values in EXPECTED_TFLOPS.items():
+        if key in device_name:
+            return values.get(dtype)
+    return None
+
+
+class GemmWorkload:
+    """Multi-stream square GEMM load on one device, measures the achieved TFLOPS.
+
+    On a GPU the elapsed time is taken from events around the whole run and at
+    most `inflight` waves are queued ahead, without a device synchronize per
+    wave. device="cpu" runs the same loop on the host with wall-clock timing.
+    """
+
+    def __init__(self, device: str = "cuda:0", dtype: str = "fp32", size: int = 16384, streams: int = 8,
+                 duration: float = 30.0, inflight: int = 2):
+        self.device = torch.device(device)
+        self.dtype = dtype
+        self.size = size
+        self.streams = max(1, streams) if self.device.type == "cuda" else 1
+        self.duration = duration
+        self.inflight = max(1, inflight)
+
+    @property
+    def device_name(self) -> str:
+        if self.device.type == "cuda":
+            return torch.cuda.get_device_name(self.device)
+        return "cpu"
+
+    def _result(self, iterations: int, elapsed: float) -> dict:
+        tflops = 2 * self.size ** 3 * iterations / elapsed / 1e12 if elapsed > 0 else 0.0
+        expected = expected_tflops(self.device_name, self.dtype)
+        return {
+            "device": str(self.device), "name": self.device_name, "dtype": self.dtype, "size": self.size,
+            "streams": self.streams, "iterations": iterations, "elapsed": round(elapsed, 3),
+            "tflops": tflops, "expected_tflops": expected,
+            "efficiency": tflops / expected if expected else None,
+        }
+
+    def _run_cpu(self, should_stop) -> dict:
+        a = torch.randn(self.size, self.size, dtype=DTYPES[self.dtype])
+        b = torch.randn(self.size, self.size, dtype=DTYPES[self.dtype])
+        c = torch.empty_like(a)
+        iterations = 0
+        start = time.perf_counter()
+        deadline = start + self.duration
+        while time.perf_counter() < deadline and not should_stop():
+            torch.matmul(a, b, out=c)
+            iterations += 1
+        return self._result(iterations, time.perf_counter() - start)
+
+    def _run_gpu(self, should_stop) -> dict:
+        torch.cuda.set_device(self.device)
+        a = torch.randn(self.size, self.size, device=self.device, dtype=DTYPES[self.dtype])
+        b = torch.randn(self.size, self.size, device=self.device, dtype=DTYPES[self.dtype])
+        outputs = [torch.empty_like(a) for _ in range(self.streams)]
+        streams = [torch.cuda.Stream(device=self.device) for _ in range(self.streams)]
+        current = torch.cuda.current_stream(self.device)
+
+        # warm up outside of the timed region
+        torch.matmul(a, b, out=outputs[0])
+        torch.cuda.synchronize(self.device)
+
+        start_event = torch.cuda.Event(enable_timing=True)
+        end_event = torch.cuda.Event(enable_timing=True)
+        start_event.record(current)
+        for s in streams:
+            s.wait_stream(current)
+
+        waves = deque()
+        iterations = 0
+        deadline = time.monotonic() + self.duration
+        while time.monotonic() < deadline and not should_stop():
+            for s, out in zip(streams, outputs):
+                with torch.cuda.stream(s):
+                    torch.matmul(a, b, out=out)
+            wave = torch.cuda.Event()
+            for s in streams:
+                current.wait_stream(s)
+            wave.record(current)
+            waves.append(wave)
+            iterations += self.streams
+            # bound the queued work instead of synchronizing every wave
+            if len(waves) > self.inflight:
+                waves.popleft().synchronize()
+
+        end_event.record(current)
+        end_event.synchronize()
+        return self._result(iterations, start_event.elapsed_time(end_event) / 1000.0)
+
+    def run(self, should_stop=None) -> dict:
+        should_stop = should_stop or (lambda: False)
+        if self.device.type == "cuda":
+            return self._run_gpu(should_stop)
+        return self._run_cpu(should_stop)
+
+
+def format_result(result: dict) -> str:
+    text = f"{result['iterations']} GEMMs {result['dtype']} N={result['size']} in {result['elapsed']}s, {result['tflops']:.1f} TFLOPS"
+    if result["expected_tflops"]:
+        text += f" ({result['efficiency'] * 100:.0f}% of {result['expected_tflops']} expected for {result['name']})"
+    return text
+
+
+# --------------------------
+# Early exit: the monitor creates a stop file seen by the workers of every rank
+# --------------------------
+def stop_file_path() -> str:
+    # Unique per launch, so a stale file of a previous run is never picked up
+    run_id = os.environ.get("TORCHELASTIC_RUN_ID") or os.environ.get("SLURM_JOB_ID") or str(os.getpid())
+    return f"gpu_stress_{run_id}.stop"
 
-    # allocate once
-    a = torch.randn(N, N, device=device)
-    b = torch.randn(N, N, device=device)
 
-    streams = [torch.cuda.Stream(device=device) for _ in range(num_streams)]
-    print(f"[GPU {gpu_id}] Starting stress: duration={duration}s, streams={num_streams}, N={N}")
+def stop_file_checker(path: str, interval: float = STOP_CHECK_INTERVAL):
+    """Returns a callable telling whether the stop file exists, checked at most every interval seconds."""
+    state = {"next": 0.0, "stopped": False}
+
+    def should_stop() -> bool:
+        now = time.monotonic()
+        if not state["stopped"] and now >= state["next"]:
+            state["stopped"] = os.path.exists(path)
+            state["next"] = now + interval
+        return state["stopped"]
+    return should_stop
 
-    end = time.time() + duration
-    while time.time() < end:
-        for s in streams:
-            with torch.cuda.stream(s):
-                _ = a @ b
-        # ensure completion of all streams before next wave
-        torch.cuda.synchronize()
-    print(f"[GPU {gpu_id}] Stress finished.")
+
+# --------------------------
+# Worker: one GEMM workload per GPU
+# --------------------------
+def stress_gpu(gpu_id: int, config: dict, results=None, stop_file: Optional[str] = None):
+    workload = GemmWorkload(f"cuda:{gpu_id}", **config)
+    print(f"[GPU {gpu_id}] Starting stress: duration={workload.duration}s, streams={workload.streams}, "
+          f"N={workload.size}, dtype={workload.dtype}")
+    result = dict(workload.run(stop_file_checker(stop_file) if stop_file else None), gpu=gpu_id)
+    print(f"[GPU {gpu_id}] Stress finished: {format_result(result)}")
+    if results is not None:
+        results.put(result)
 
 
 # --------------------------
@@ -114,110 +262,516 @@ def parse_percent(s: str) -> Optional[int]:
 
 
 # --------------------------
-# Determine if all GPUs exceed threshold
+# Parse the current level of a pp_dpm_* clock file
 # --------------------------
-def all_gpus_at_threshold(header: List[str], rows: List[List[str]], threshold: int) -> bool:
-    # find the first header column that contains "use" (case-insensitive)
-    util_idx = None
-    for i, h in enumerate(header):
-        if "use" in h.lower():
-            util_idx = i
-            break
-    if util_idx is None:
-        # cannot find utilization column
-        return False
+def parse_dpm_clock(text: str) -> Optional[int]:
+    # "0: 500Mhz\n1: 2100Mhz *" -> 2100, the current level is marked with "*"
+    for line in text.splitlines():
+        if line.strip().endswith("*"):
+            match = re.search(r"(\d+)\s*Mhz", line, re.IGNORECASE)
+            if match:
+                return int(match.group(1))
+    return None
 
-    # parse each row's util column
-    for r in rows:
-        if util_idx >= len(r):
-            return False
-        p = parse_percent(r[util_idx])
-        if p is None:
-            return False
-        if p < threshold:
+
+# --------------------------
+# Sysfs sampler: persistent fds, one pread per file and sample
+# --------------------------
+class SysfsGpuSampler:
+    """Reads utilization, power and clocks of every GPU straight from sysfs.
+
+    The files are opened once and re-read with os.pread, so a sample costs a
+    few syscalls instead of a rocm-smi process. sysfs_root can point to a fake
+    tree for testing.
+    """
+    max_rate = 100
+
+    def __init__(self, sysfs_root: str = SYSFS_DRM):
+        self.sysfs_root = sysfs_root
+        # (card name, {"busy"|"power"|"sclk"|"mclk": fd}) in GPU order
+        self.cards: List[Tuple[str, Dict[str, int]]] = []
+
+    def _card_files(self, device: str) -> Dict[str, str]:
+        files = {"busy": os.path.join(device, "gpu_busy_percent")}
+        for hwmon in sorted(glob.glob(os.path.join(device, "hwmon", "hwmon*"))):
+            for name in ("power1_average", "power1_input"):
+                path = os.path.join(hwmon, name)
+                if os.path.exists(path):
+                    files["power"] = path
+                    break
+            if "power" in files:
+                break
+        for name in ("sclk", "mclk"):
+            path = os.path.join(device, f"pp_dpm_{name}")
+            if os.path.exists(path):
+                files[name] = path
+        return files
+
+    def open(self) -> bool:
+        try:
+            entries = os.listdir(self.sysfs_root)
+        except OSError:
             return False
-    return True
+        cards = sorted((e for e in entries if re.fullmatch(r"card\d+", e)), key=lambda e: int(e[4:]))
+        for card in cards:
+            device = os.path.join(self.sysfs_root, card, "device")
+            if not os.path.exists(os.path.join(device, "gpu_busy_percent")):
+                continue
+            fds = {}
+            for name, path in self._card_files(device).items():
+                try:
+                    fds[name] = os.open(path, os.O_RDONLY)
+                except OSError:
+                    continue
+            if "busy" in fds:
+                self.cards.append((card, fds))
+            else:
+                for fd in fds.values():
+                    os.close(fd)
+        return bool(self.cards)
+
+    def close(self):
+        for _, fds in self.cards:
+            for fd in fds.values():
+                os.close(fd)
+        self.cards = []
+
+    def read(self) -> List[dict]:
+        samples = []
+        for gpu, (card, fds) in enumerate(self.cards):
+            sample = {"gpu": gpu, "card": card, "busy": None, "power_w": None, "sclk_mhz": None, "mclk_mhz": None}
+            for name, fd in fds.items():
+                try:
+                    text = os.pread(fd, 4096, 0).decode(errors="ignore")
+                except OSError:
+                    continue
+                if name == "busy":
+                    sample["busy"] = parse_percent(text)
+                elif name == "power":
+                    value = parse_percent(text)
+                    sample["power_w"] = value / 1e6 if value is not None else None
+                else:
+                    sample[f"{name}_mhz"] = parse_dpm_clock(text)
+            samples.append(sample)
+        return samples
+
+
+# --------------------------
+# rocm-smi sampler: fallback when sysfs is not readable
+# --------------------------
+class RocmSmiSampler:
+    """Same interface as SysfsGpuSampler on top of rocm-smi --showuse --csv."""
+    max_rate = 1
+
+    def open(self) -> bool:
+        return True
+
+    def close(self):
+        pass
+
+    def read(self) -> List[dict]:
+        header, rows = parse_rocm_smi_csv()
+        if header is None or rows is None:
+            return []
+        util_idx = next((i for i, h in enumerate(header) if "use" in h.lower()), None)
+        if util_idx is None:
+            return []
+        return [{"gpu": gpu, "card": r[0] if r else str(gpu),
+                 "busy": parse_percent(r[util_idx]) if util_idx < len(r) else None,
+                 "power_w": None, "sclk_mhz": None, "mclk_mhz": None}
+                for gpu, r in enumerate(rows)]
+
+
+def open_sampler(sysfs_root: str = SYSFS_DRM):
+    sampler = SysfsGpuSampler(sysfs_root)
+    if sampler.open():
+        print(f"[monitor] sampling {len(sampler.cards)} GPUs from {sysfs_root}")
+        return sampler
+    print(f"[monitor] no readable gpu_busy_percent under {sysfs_root}, falling back to rocm-smi")
+    return RocmSmiSampler()
 
 
 # --------------------------
-# Monitor thread (prints live, writes log once)
+# Per GPU time series of the utilization
 # --------------------------
-def monitor_thread_func(stop_time: float, warmup: float = 3.0, poll_interval: float = 1.0):
-    global WROTE_EVENT
+class UtilizationRing:
+    """Preallocated ring buffer of the (timestamp, utilization) samples of one GPU."""
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, int(capacity))
+        self.times = array("d", bytes(8 * self.capacity))
+        self.values = array("f", bytes(4 * self.capacity))
+        self.count = 0
+
+    def append(self, timestamp: float, value: float):
+        i = self.count % self.capacity
+        self.times[i] = timestamp
+        self.values[i] = value
+        self.count += 1
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def ordered_values(self) -> List[float]:
+        if self.count <= self.capacity:
+            return list(self.values[:self.count])
+        i = self.count % self.capacity
+        return list(self.values[i:]) + list(self.values[:i])
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    rank = (len(sorted_values) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+class UtilizationRecorder:
+    """Records every monitor sample and summarizes the utilization of every GPU.
+
+    Time to saturation and time above the threshold are accumulated while
+    sampling, so they stay exact when the ring buffer wraps around.
+    """
+
+    def __init__(self, start: float, capacity: int, threshold: int = UTIL_THRESHOLD):
+        self.start = start
+        self.capacity = capacity
+        self.threshold = threshold
+        self.rings: Dict[int, UtilizationRing] = {}
+        self.cards: Dict[int, str] = {}
+        self.first_saturated: Dict[int, Optional[float]] = {}
+        self.time_above: Dict[int, float] = {}
+        self.last: Dict[int, Tuple[float, float]] = {}
+        # Set when the run was stopped early after a saturation window
+        self.stopped_at: Optional[float] = None
+
+    def record(self, timestamp: float, samples: List[dict]):
+        for sample in samples:
+            gpu, value = sample["gpu"], sample["busy"]
+            if value is None:
+                continue
+            if gpu not in self.rings:
+                self.rings[gpu] = UtilizationRing(self.capacity)
+                self.cards[gpu] = sample["card"]
+                self.first_saturated[gpu] = None
+                self.time_above[gpu] = 0.0
+            self.rings[gpu].append(timestamp, value)
+            previous = self.last.get(gpu)
+            if previous is not None and previous[1] >= self.threshold:
+                self.time_above[gpu] += timestamp - previous[0]
+            if value >= self.threshold and self.first_saturated[gpu] is None:
+                self.first_saturated[gpu] = timestamp
+            self.last[gpu] = (timestamp, value)
+
+    def summary(self) -> List[dict]:
+        stats = []
+        for gpu in sorted(self.rings):
+            ring = self.rings[gpu]
+            values = sorted(ring.ordered_values())
+            first = self.first_saturated[gpu]
+            stats.append({
+                "gpu": gpu,
+                "card": self.cards[gpu],
+                "samples": ring.count,
+                "min": values[0],
+                "mean": sum(values) / len(values),
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "p99": percentile(values, 99),
+                "max": values[-1],
+                "time_to_saturation": round(first - self.start, 3) if first is not None else None,
+                "time_above_threshold": round(self.time_above[gpu], 3),
+            })
+        return stats
+
+    def write(self, json_path: str = STATS_JSON, csv_path: str = STATS_CSV) -> List[dict]:
+        stats = self.summary()
+        with open(json_path, "w") as f:
+            stopped_after = round(self.stopped_at - self.start, 3) if self.stopped_at is not None else None
+            json.dump({"threshold": self.threshold, "stopped_after": stopped_after, "gpus": stats}, f, indent=4)
+        with open(csv_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(stats[0]) if stats else ["gpu"])
+            writer.writeheader()
+            writer.writerows(stats)
+        return stats
+
+
+SAMPLE_HEADER = ["timestamp", "gpu", "card", "busy %", "power (W)", "sclk (MHz)", "mclk (MHz)"]
+
+
+def sample_row(timestamp: float, sample: dict) -> List[str]:
+    def fmt(value, spec=""):
+        return "N/A" if value is None else format(value, spec)
+    return [time.strftime("%H:%M:%S", time.localtime(timestamp)), str(sample["gpu"]), str(sample["card"]),
+            fmt(sample["busy"]), fmt(sample["power_w"], ".1f"), fmt(sample["sclk_mhz"]), fmt(sample["mclk_mhz"])]
+
+
+# --------------------------
+# Monitor thread (prints a status line per second, writes log once)
+# --------------------------
+def monitor_thread_func(sampler, recorder: UtilizationRecorder, stop_time: float, warmup: float = 3.0,
+                        sample_rate: float = SAMPLE_RATE, print_interval: float = 1.0,
+                        saturation_window: float = 0.0, stop_file: Optional[str] = None):
     # small warmup to let workers start
     time.sleep(warmup)
+    period = 1.0 / min(sample_rate, sampler.max_rate)
+    next_print = 0.0
+    next_tick = time.monotonic()
+    saturated_since = None
     while time.time() < stop_time:
-        header, rows = parse_rocm_smi_csv()
-        if header is None or rows is None:
-            # parsing failed — print a message and retry
-            print("[monitor] rocm-smi returned no usable output, retrying...")
-            time.sleep(poll_interval)
+        samples = sampler.read()
+        now = time.time()
+        if not samples:
+            # sampling failed — print a message and retry
+            print("[monitor] no usable GPU utilization sample, retrying...")
+            time.sleep(1.0)
+            next_tick = time.monotonic()
             continue
+        recorder.record(now, samples)
 
-        # build and print table
-        table_text = build_table_text(["timestamp"] + header, [[time.strftime("%H:%M:%S")] + r for r in rows])
-        print("\033c", end="")  # clear (may not be supported everywhere)
-        print(table_text)
+        if now >= next_print:
+            status = " ".join(f"{s['gpu']}:{s['busy'] if s['busy'] is not None else 'N/A'}%" for s in samples)
+            print(f"[monitor] {time.strftime('%H:%M:%S', time.localtime(now))} util {status}", flush=True)
+            next_print = now + print_interval
 
         # check threshold
+        saturated = all(s["busy"] is not None and s["busy"] >= recorder.threshold for s in samples)
         if not WROTE_EVENT.is_set():
-            # pass header and rows as-is (header has column names without timestamp)
-            if all_gpus_at_threshold(header, rows, UTIL_THRESHOLD):
+            if saturated:
+                table_text = build_table_text(SAMPLE_HEADER, [sample_row(now, s) for s in samples])
                 try:
                     with open(LOG_FILE, "w") as f:
                         f.write(table_text)
+                    print(table_text)
                     print(f"\n*** Max utilization detected — snapshot saved to {LOG_FILE} ***")
                     WROTE_EVENT.set()
                 except Exception as e:
                     print(f"[monitor] failed to write log: {e}")
-        time.sleep(poll_interval)
+
+        # early exit once every GPU stayed saturated for the whole window
+        saturated_since = (saturated_since or now) if saturated else None
+        if saturation_window > 0 and saturated_since is not None and now - saturated_since >= saturation_window:
+            print(f"[monitor] all GPUs held {recorder.threshold}% for {saturation_window}s, stopping the workers")
+            recorder.stopped_at = now
+            if stop_file:
+                open(stop_file, "w").close()
+            return
+
+        next_tick += period
+        time.sleep(max(0.0, next_tick - time.monotonic()))
+
+
+# --------------------------
+# Launch context: torchrun, Slurm or standalone
+# --------------------------
+def launch_context() -> Tuple[int, int, int, int]:
+    """Returns (rank, world_size, local_rank, local_world_size) of this process."""
+    env = os.environ
+    if "LOCAL_RANK" in env:
+        # torchrun
+        return (int(env.get("RANK", 0)), int(env.get("WORLD_SIZE", 1)),
+                int(env["LOCAL_RANK"]), int(env.get("LOCAL_WORLD_SIZE", 1)))
+    if int(env.get("SLURM_NTASKS", "1")) > 1 and "SLURM_LOCALID" in env:
+        # srun with several tasks, "4" or "4(x2)"
+        match = re.match(r"\d+", env.get("SLURM_NTASKS_PER_NODE", ""))
+        local_world_size = int(match.group(0)) if match else int(env["SLURM_NTASKS"])
+        return int(env["SLURM_PROCID"]), int(env["SLURM_NTASKS"]), int(env["SLURM_LOCALID"]), local_world_size
+    return 0, 1, 0, 1
+
+
+def gpus_of_rank(local_rank: int, local_world_size: int, ngpus: int) -> List[int]:
+    """Returns the GPUs driven by a local rank, the node's GPUs are spread over its ranks.
+
+    With fewer visible GPUs than local ranks, a single GPU is the one bound to the
+    task (e.g. srun --gpus-per-task=1), any other count leaves GPUs without a rank.
+    """
+    if ngpus >= local_world_size:
+        return list(range(local_rank, ngpus, local_world_size))
+    if ngpus == 1:
+        return [0]
+    raise RuntimeError(f"{local_world_size} ranks on the node but only {ngpus} GPUs visible to each rank, "
+                       f"run at most one rank per GPU or bind one GPU per task")
+
+
+def gather_records(record: dict, rank: int, world_size: int, timeout: float = 300) -> Optional[List[dict]]:
+    """Gathers the record of every rank, returns them on rank 0 and None elsewhere.
+
+    torch.distributed (gloo) is used when a rendezvous is available (torchrun),
+    otherwise the ranks exchange files in the working directory.
+    """
+    if world_size == 1:
+        return [record]
+    if os.environ.get("MASTER_ADDR") and dist.is_available():
+        dist.init_process_group("gloo", rank=rank, world_size=world_size, timeout=timedelta(seconds=timeout))
+        records = [None] * world_size
+        dist.all_gather_object(records, record)
+        dist.destroy_process_group()
+        return records if rank == 0 else None
+
+    path = f"gpu_stress_rank{rank}.json"
+    with open(path + ".tmp", "w") as f:
+        json.dump(record, f)
+    os.replace(path + ".tmp", path)
+    if rank != 0:
+        return None
+    paths = [f"gpu_stress_rank{r}.json" for r in range(world_size)]
+    deadline = time.time() + timeout
+    while not all(os.path.exists(p) for p in paths) and time.time() < deadline:
+        time.sleep(0.5)
+    records = []
+    for p in paths:
+        if os.path.exists(p):
+            with open(p) as f:
+                records.append(json.load(f))
+            os.remove(p)
+    return records
+
+
+def write_report(records: List[dict]) -> dict:
+    workers = [dict(w, rank=r["rank"], host=r["host"]) for r in records for w in r["workers"]]
+    report = {
+        "world_size": len(records),
+        "total_tflops": sum(w["tflops"] for w in workers),
+        "workers": sorted(workers, key=lambda w: (w["host"], w["gpu"])),
+        # Utilization statistics of every node, from its monitor rank
+        "utilization": {r["host"]: r["utilization"] for r in records if r["utilization"] is not None},
+        "ranks": [{k: r[k] for k in ("rank", "local_rank", "host", "gpus")} for r in records],
+    }
+    with open(REPORT_FILE, "w") as f:
+        json.dump(report, f, indent=4)
+    return report
 
 
 # --------------------------
 # Main
 # --------------------------
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Stress every GPU and record its utilization")
+    parser.add_argument("--sample-rate", type=float, default=SAMPLE_RATE,
+                        help="Monitor samples per second, 10-100 with sysfs, rocm-smi is capped at 1")
+    parser.add_argument("--sysfs-root", default=SYSFS_DRM, help="DRM sysfs folder, a fake tree can be used for testing")
+    parser.add_argument("--dtype", choices=sorted(DTYPES), default="fp32", help="GEMM data type")
+    parser.add_argument("--size", type=int, default=16384, help="Size N of the NxN matrices")
+    parser.add_argument("--streams", type=int, default=8, help="Streams per GPU")
+    parser.add_argument("--duration", type=float, default=30,
+                        help="Stress duration in seconds, hard limit when --saturation-window is used")
+    parser.add_argument("--saturation-window", type=float, default=0,
+                        help="Stop as soon as every GPU stayed above the threshold for this many seconds, 0 disables")
+    parser.add_argument("--threshold", type=int, default=UTIL_THRESHOLD, help="Utilization percent considered max")
+    parser.add_argument("--device", choices=["auto", "cpu"], default="auto",
+                        help="cpu runs the workload on the host, also used when no GPU is available")
+    return parser.parse_args(argv)
+
+
+def run_cpu(args):
+    config = {"dtype": args.dtype, "size": args.size, "streams": 1, "duration": args.duration}
+    result = dict(GemmWorkload("cpu", **config).run(), gpu=-1)
+    print(f"[CPU] Stress finished: {format_result(result)}")
+    record = {"rank": 0, "local_rank": 0, "host": socket.gethostname(), "gpus": [], "workers": [result],
+              "utilization": None}
+    write_report([record])
+    print(f"Stress report saved → {REPORT_FILE}")
+
+
 def main():
+    args = parse_args()
+    if args.device == "cpu":
+        run_cpu(args)
+        return
     if not torch.cuda.is_available():
-        print("CUDA/ROCm not available to PyTorch (torch.cuda.is_available() is False). Exiting.")
+        print("CUDA/ROCm not available to PyTorch (torch.cuda.is_available() is False). Running on the CPU.")
+        run_cpu(args)
         return
 
     ngpus = torch.cuda.device_count()
-    print(f"Detected {ngpus} GPUs")
+    rank, world_size, local_rank, local_world_size = launch_context()
+    # Every rank of the node drives its own GPUs, local rank 0 also monitors all of them
+    gpus = gpus_of_rank(local_rank, local_world_size, ngpus)
+    is_monitor = local_rank == 0
+    print(f"[rank {rank}/{world_size}] Detected {ngpus} GPUs, local rank {local_rank}/{local_world_size} "
+          f"drives GPUs {gpus}{', monitor' if is_monitor else ''}")
 
     # clear previous log
-    try:
-        open(LOG_FILE, "w").close()
-    except Exception:
-        pass
-
-    duration = 30
-    stop_time = time.time() + duration
-
+    if is_monitor:
+        try:
+            open(LOG_FILE, "w").close()
+        except Exception:
+            pass
+
+    duration = args.duration
+    config = {"dtype": args.dtype, "size": args.size, "streams": args.streams, "duration": duration}
+    start = time.time()
+    stop_time = start + duration
+
+    stop_file = stop_file_path() if args.saturation_window > 0 else None
     mp.set_start_method("spawn", force=True)
+    results = mp.Queue()
 
-    # spawn stress processes (one per GPU)
+    # spawn stress processes (one per GPU of this rank)
     procs = []
-    for gpu in range(ngpus):
-        p = mp.Process(target=stress_gpu, args=(gpu, duration))
+    for gpu in gpus:
+        p = mp.Process(target=stress_gpu, args=(gpu, config, results, stop_file))
         p.start()
         procs.append(p)
 
-    # start monitor thread in main process
-    monitor = threading.Thread(target=monitor_thread_func, args=(stop_time, 3.0, 1.0), daemon=True)
-    monitor.start()
-
-    # join workers
+    # start monitor thread in the main process of the monitor rank
+    if is_monitor:
+        sampler = open_sampler(args.sysfs_root)
+        rate = min(args.sample_rate, sampler.max_rate)
+        recorder = UtilizationRecorder(start, capacity=int((duration + 5) * rate), threshold=args.threshold)
+        monitor = threading.Thread(target=monitor_thread_func,
+                                   args=(sampler, recorder, stop_time, 3.0, args.sample_rate, 1.0,
+                                         args.saturation_window, stop_file),
+                                   daemon=True)
+        monitor.start()
+
+    # collect the worker results before joining, the queue is drained by get()
+    workers = []
+    while len(workers) < len(procs):
+        try:
+            workers.append(results.get(timeout=1.0))
+        except queue.Empty:
+            if not any(p.is_alive() for p in procs):
+                break
     for p in procs:
         p.join()
-
-    # wait until monitor finishes (or until it wrote)
-    monitor.join(timeout=5)
-
-    if WROTE_EVENT.is_set():
-        print(f"\nFinal GPU max-utilization snapshot saved → {LOG_FILE}")
-    else:
-        print(f"\n(No max utilization snapshot written.)")
+    failed = [gpu for gpu, p in zip(gpus, procs) if p.exitcode != 0]
+    if failed:
+        print(f"[rank {rank}] stress workers of GPUs {failed} failed")
+
+    stats = None
+    if is_monitor:
+        # wait until monitor finishes (or until it wrote)
+        monitor.join(timeout=5)
+        sampler.close()
+
+        stats = recorder.write()
+        for gpu in stats:
+            print(f"[GPU {gpu['gpu']}] util min/mean/p50/p95/p99 {gpu['min']:.0f}/{gpu['mean']:.1f}/{gpu['p50']:.0f}/"
+                  f"{gpu['p95']:.0f}/{gpu['p99']:.0f}%, saturated after {gpu['time_to_saturation']}s, "
+                  f"{gpu['time_above_threshold']}s above {recorder.threshold}%")
+        print(f"Utilization statistics saved → {STATS_JSON}, {STATS_CSV}")
+        if recorder.stopped_at is not None:
+            print(f"Stopped early after {recorder.stopped_at - start:.1f}s of the {duration}s limit")
+
+        if WROTE_EVENT.is_set():
+            print(f"\nFinal GPU max-utilization snapshot saved → {LOG_FILE}")
+        else:
+            print("\n(No max utilization snapshot written.)")
+
+    record = {"rank": rank, "local_rank": local_rank, "host": socket.gethostname(), "gpus": gpus,
+              "workers": workers, "utilization": stats}
+    records = gather_records(record, rank, world_size)
+    # every rank of the node is done with the stop file once the records are gathered
+    if is_monitor and stop_file and os.path.exists(stop_file):
+        os.remove(stop_file)
+    if records is not None:
+        report = write_report(records)
+        print(f"Stress report of {report['world_size']} ranks, {report['total_tflops']:.1f} TFLOPS in total "
+              f"saved → {REPORT_FILE}")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -15,10 +15,6 @@
 # limitations under the License.
 
 import logging
-import re 
-import os
-import tenacity
-from pathlib import Path
 
 
 log = logging.getLogger(__name__)
@@ -42,28 +38,22 @@ class HelperLib():
             0 : if the host type is either Ubuntu22 or Ubunut24 or RHEL
             1 : if the host type is neither Ubuntu22 or Ubunut24 or RHEL
         """
-        exit_code, result = self.host.execute_command("cat /etc/os-release")
+        facts = self.host.facts
+        os_release = facts.os_release
         
-        if exit_code == 0:
-            log.debug(f"{result['stdout']}")
-            match = re.search(r"PRETTY_NAME=\"(.*)\"", result["stdout"])
-            if match :
-                log.info(f"Host OS is : {match.group(1)}")
-                if "Ubuntu 22" in match.group(1):
-                    host_type = "Ubuntu22"
-                    return 0, host_type
-                elif "Ubuntu 24" in match.group(1):
-                    host_type = "Ubuntu24"
-                    return 0, host_type
-                elif "Rocky Linux" in match.group(1):
-                    host_type = "RHEL"
-                    return 0, host_type
-                else :
-                    log.info(f"This OS is not supported ! OS : {match.group(1)} ")
-                    return 1 , result
+        if os_release is not None:
+            log.debug(f"{os_release}")
+            os_name = facts.os_pretty_name
+            if os_name :
+                log.info(f"Host OS is : {os_name}")
+                if facts.host_type:
+                    return 0, facts.host_type
+                log.info(f"This OS is not supported ! OS : {os_name} ")
+            return 1 , {'stdout': os_release, 'stderr': f"OS not supported : {os_name}"}
         else :
-            log.info(f"Unable to check the OS Version. Error : {result['stderr']}")
-            return exit_code, result
+            result = facts.result("os_release")
+            log.info(f"Unable to check the OS Version. Error : {facts.stderr('os_release')}")
+            return (result.exit_code if result else 1), {'stdout': result.stdout if result else "", 'stderr': facts.stderr("os_release")}
         
     def get_rocmsmi_version(self):
         """
@@ -73,23 +63,34 @@ class HelperLib():
 
         Return: int, string
         """
-        exit_code, result = self.host.execute_command("sudo update-alternatives --display rocm")
-        if exit_code == 0 :
-            match = re.search(r"link currently points to \/opt\/rocm-(\d+\.\d+)(.*)", result['stdout'])
-            if match:
-                rocm_version = match.group(1)
+        facts = self.host.facts
+        rocm = facts.rocm_alternatives
+        if rocm is not None :
+            rocm_version = facts.rocm_version
+            if rocm_version:
                 if float(rocm_version) < 6.4 :
-                    result['stderr'] = f"Rocm-smi version ({rocm_version}) is lesser than 6.4 ! Please use rocm-verson 6.4 or above for amd-ctk usage !"
-                    return 1, result['stderr']
+                    return 1, f"Rocm-smi version ({rocm_version}) is lesser than 6.4 ! Please use rocm-verson 6.4 or above for amd-ctk usage !"
                 else :
                     return 0, rocm_version
             else :
-                return 2, f"Rocm version couldnt be found in {result['stdout']}"
+                return 2, f"Rocm version couldnt be found in {rocm}"
         else :
-            return exit_code , result['stderr']
+            result = facts.result("rocm")
+            return (result.exit_code if result else 1) , facts.stderr("rocm")
 
-    def run_scripts(self,local_script,remote_script, results_dir,version=None):
+    def run_scripts(self,local_script,remote_script, results_dir,version=None,timeout=150 * 15):
         """
+        This function copies the script to the host and runs it. The function
+        returns as soon as the script exits while its log is streamed to
+        results_dir
+
+        Args : local_script : Path of the script
+               remote_script : name of the script on the host
+               results_dir : Path where the log is written
+               version : optional argument of the script
+               timeout : maximum number of seconds to wait for the script
+
+        Return : int, exit code of the script
         """
         log_file= remote_script.replace(".sh", f"_{self.host.host_ip}.log")
         # Copy script to the host
@@ -100,33 +101,60 @@ class HelperLib():
         # Give exec permission to the script
         exit_code, output = self.host.execute_command(f"chmod +x {remote_script}")
         if exit_code:
-            log.err(f"Error giving exec permission to {remote_script} : {output['stderr']}")
-            return exit_code,output
-        self.host.execute_command_channel(f"sudo nohup ./{remote_script} {version} > {log_file} ")
-        self.wait_for_script_completion(remote_script,log_file)
+            log.error(f"Error giving exec permission to {remote_script} : {output['stderr']}")
+            return exit_code
 
-        # Copy log from the host
+        # Run the script, its log is copied back while it runs
         local_log_file  = results_dir / log_file
-        exit_code = self.host.copy_from_host(log_file,local_log_file)
-        if exit_code:
-            log.info(f"Could not copy {local_script}")
-            return exit_code
+        script_exit_code = self.host.run_with_log(f"sudo nohup ./{remote_script} {version}", log_file,
+                                                  local_log_file, timeout=timeout)
+        if script_exit_code:
+            log.error(f"{remote_script} exited with {script_exit_code} on {self.host.host_ip}, see {local_log_file}")
 
         # Delete the log file and script file on remote host 
         exit_code, output = self.host.execute_command(f"sudo rm -rf {log_file} {remote_script}")
         if exit_code:
-            log.err(f"Error deleting the log: {log_file} : {output['stderr']}")
+            log.error(f"Error deleting the log: {log_file} : {output['stderr']}")
             return exit_code
         log.info("Deleted the script and the log from the host...")
+        return script_exit_code
         
-    @tenacity.retry(wait=tenacity.wait_fixed(15), stop=tenacity.stop_after_attempt(150))
-    def wait_for_script_completion(self,script,log_file):
-        log.info(f"Checking {log_file}...")
-        exit_code, output = self.host.execute_command(f"cat {log_file} ")
-        exit_code, output = self.host.execute_command(f"ps -ef | grep {script} | grep -v grep  ")
-        if f"{script}" in output['stdout']:
-            raise Exception(f'{script} is still running... ')
-        return True
+    async def get_hosttype_async(self):
+        """
+        Async version of get_hosttype
+        """
+        return await self.host.run_in_executor(self.get_hosttype)
+
+    async def get_rocmsmi_version_async(self):
+        """
+        Async version of get_rocmsmi_version
+        """
+        return await self.host.run_in_executor(self.get_rocmsmi_version)
+
+    async def run_scripts_async(self, local_script, remote_script, results_dir, version=None):
+        """
+        Async version of run_scripts
+        """
+        return await self.host.run_in_executor(self.run_scripts, local_script, remote_script, results_dir, version)
+
+    def run_batch(self, commands):
+        """
+        This function runs the commands on the host in one round trip and
+        stops at the first failing command
+
+        Args : commands : list of commands
+
+        Return : (int, dict)
+            0, {} : if all the commands passed
+            exit_code, {'stdout','stderr'} : of the first failing command
+        """
+        results = self.host.execute_batch(commands, stop_on_failure=True)
+        for result in results:
+            if result.exit_code:
+                return result.exit_code, {'stdout': result.stdout, 'stderr': result.stderr}
+        if len(results) != len(commands):
+            return 1, {'stdout': "", 'stderr': f"Only {len(results)} of {len(commands)} commands were run"}
+        return 0, {}
 
     def create_munge_key(self):
         """
@@ -143,10 +171,9 @@ class HelperLib():
         else :
             return exit_code, result
 
-        for cmd in commands:
-            exit_code, result = self.host.execute_command(f"{cmd}") 
-            if exit_code:
-                return exit_code, result
+        exit_code, result = self.run_batch(commands)
+        if exit_code:
+            return exit_code, result
         
         return 0, "munge_create_done"
 
@@ -167,10 +194,9 @@ class HelperLib():
         else :
             return exit_code, result
 
-        for cmd in commands:
-            exit_code, result = self.host.execute_command(f"{cmd}") 
-            if exit_code:
-                return exit_code, result
+        exit_code, result = self.run_batch(commands)
+        if exit_code:
+            return exit_code, result
         
         return 0, "munge_config_done"
     
@@ -191,10 +217,9 @@ class HelperLib():
         else :
             return exit_code, result
 
-        for cmd in commands:
-            exit_code, result = self.host.execute_command(f"{cmd}") 
-            if exit_code:
-                return exit_code, result
+        exit_code, result = self.run_batch(commands)
+        if exit_code:
+            return exit_code, result
         
         return 0, "headnode_config_done"
 
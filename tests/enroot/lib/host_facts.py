@@ -0,0 +1,147 @@
+#! /usr/bin/env python3
+
+# Copyright (c) Advanced Micro Devices, Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the \"License\");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an \"AS IS\" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import re
+
+log = logging.getLogger(__name__)
+
+# Every fact is gathered with one command of a single execute_batch round trip
+FACT_COMMANDS = {
+    "os_release": "cat /etc/os-release",
+    "hostname": "hostname -s",
+    "user": "whoami",
+    "rocm": "sudo update-alternatives --display rocm",
+    "rocm_smi": "sudo rocm-smi",
+    "ib_devices": "ls /sys/class/infiniband",
+}
+
+
+class HostFacts:
+    """
+    This Class holds the facts of a remote host gathered in one round trip
+    """
+    def __init__(self, results, error=None):
+        # CommandResult of every command of FACT_COMMANDS, by fact name
+        self.results = results
+        # Error of the whole batch when the facts could not be gathered
+        self.error = error
+
+    @property
+    def complete(self):
+        """
+        True if every fact of FACT_COMMANDS was gathered
+        """
+        return all(name in self.results for name in FACT_COMMANDS)
+
+    @classmethod
+    def gather(cls, host):
+        """
+        This method gathers all the facts of the host in one round trip
+
+        Parameters:
+            host : RemoteHostHandler
+
+        Returns:
+            HostFacts object
+        """
+        names = list(FACT_COMMANDS)
+        results = host.execute_batch([FACT_COMMANDS[name] for name in names], stop_on_failure=False)
+        if len(results) != len(names):
+            # The batch itself failed, its single result does not belong to any fact
+            error = results[0].stderr if results else "no result"
+            log.error(f"Unable to gather the host facts of {host.host_ip} : {error}")
+            return cls({}, error=error)
+        log.info(f"Gathered the host facts of {host.host_ip}")
+        return cls(dict(zip(names, results)))
+
+    def result(self, name):
+        """
+        This method returns the CommandResult of a fact, None if not gathered
+        """
+        return self.results.get(name)
+
+    def stderr(self, name):
+        """
+        This method returns the error of a fact, or of the whole gather
+        """
+        result = self.result(name)
+        return result.stderr if result is not None else self.error
+
+    def _stdout(self, name):
+        result = self.result(name)
+        if result is None or result.exit_code:
+            return None
+        return result.stdout
+
+    @property
+    def os_release(self):
+        """
+        Raw /etc/os-release of the host
+        """
+        return self._stdout("os_release")
+
+    @property
+    def os_pretty_name(self):
+        match = re.search(r"PRETTY_NAME=\"(.*)\"", self.os_release or "")
+        return match.group(1) if match else None
+
+    @property
+    def host_type(self):
+        """
+        Ubuntu22, Ubuntu24, RHEL or None if the OS is not supported
+        """
+        name = self.os_pretty_name or ""
+        if "Ubuntu 22" in name:
+            return "Ubuntu22"
+        if "Ubuntu 24" in name:
+            return "Ubuntu24"
+        if "Rocky Linux" in name:
+            return "RHEL"
+        return None
+
+    @property
+    def hostname(self):
+        stdout = self._stdout("hostname")
+        return stdout.strip() if stdout is not None else None
+
+    @property
+    def user(self):
+        stdout = self._stdout("user")
+        return stdout.strip() if stdout is not None else None
+
+    @property
+    def rocm_alternatives(self):
+        """
+        Raw update-alternatives output of the rocm link
+        """
+        return self._stdout("rocm")
+
+    @property
+    def rocm_version(self):
+        match = re.search(r"link currently points to \/opt\/rocm-(\d+\.\d+)(.*)", self.rocm_alternatives or "")
+        return match.group(1) if match else None
+
+    @property
+    def rocm_smi(self):
+        """
+        Raw rocm-smi output, the GPU inventory of the host
+        """
+        return self._stdout("rocm_smi")
+
+    @property
+    def ib_devices(self):
+        return (self._stdout("ib_devices") or "").split()
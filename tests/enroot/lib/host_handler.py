@@ -14,33 +14,80 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
+import codecs
 import paramiko
+import select
+import socket
 import subprocess
+import threading
 import time
 import re
 import logging
 import json
-from scp import SCPClient
+import os
+import shlex
+import shutil
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from pathlib import Path
+from typing import NamedTuple
+from lib.host_facts import HostFacts
 
 log = logging.getLogger(__name__)
 
+# sshd allows 10 sessions per connection by default (MaxSessions)
+DEFAULT_MAX_CHANNELS = 8
+# Number of lines per stream kept in memory by execute_command_stream
+DEFAULT_TAIL_LINES = 200
+RECV_CHUNK_SIZE = 32768
+# Block size of the local reads/writes of copy_to_host and copy_from_host
+DEFAULT_SFTP_CHUNK_SIZE = 1024 * 1024
+# Exit code of a command stopped by its timeout, same as coreutils timeout
+TIMEOUT_EXIT_CODE = 124
+
+class CommandResult(NamedTuple):
+    """
+    Immutable result of one command executed on the remote host
+    """
+    command: str
+    exit_code: int
+    stdout: str
+    stderr: str
+    duration: float
+
 class RemoteHostHandler:
     """
     This Class creates handle to the remote host to execute commands on the host
     """
-    def __init__(self, host_ip):
+    def __init__(self, host_ip, max_channels=DEFAULT_MAX_CHANNELS):
         self.host_ip = host_ip
         self.client =  paramiko.SSHClient()
-        self.output = {}
-        self.sftp = ""
+        # Long-lived SFTP session, see get_sftp()
+        self._sftp = None
+        # Held by the transfer using the long-lived SFTP session, see sftp_session()
+        self._sftp_lock = threading.RLock()
+        self.max_channels = max_channels
+        # Caps the number of exec channels open at the same time on this host
+        self._channel_slots = threading.BoundedSemaphore(max_channels)
+        # Threads backing the asyncio API, created on first use
+        self._async_executor = None
+        # Cached host facts, see get_facts()
+        self._facts = None
+        self._facts_lock = threading.Lock()
 
-    def connect(self, username, password, key):
+    def connect(self, username, password, key, port=22):
         """
             This method performs connect to the Node
     
             Parameters:
                 username: string 
                 password: string
+                key: path to the ssh key, used when no password is given
+                port: ssh port of the node
       
             Returns:
                 SSH Client object
@@ -48,13 +95,14 @@ class RemoteHostHandler:
         self.username = username
         self.password = password
         self.key = key
+        self.port = port
         try:
             log.info(f"SSH to Node: {self.host_ip} using password")
             self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
             if not password :
-                self.client.connect(hostname=self.host_ip, username=username, key_filename=key)
+                self.client.connect(hostname=self.host_ip, port=port, username=username, key_filename=key)
             else:
-                self.client.connect(hostname=self.host_ip, username=username, password=password)
+                self.client.connect(hostname=self.host_ip, port=port, username=username, password=password)
 
         except Exception as e:
             log.error(f"Failed SSH connection to Device {self.host_ip}")
@@ -72,23 +120,370 @@ class RemoteHostHandler:
               command : command to execute on the device
            Returns:
               exit_code : int 
-              output[] : output[] object having output['stdout'],output['stderr'],output['stdin']
+              output{} : new dict per call having output['stdout'],output['stderr']
 
         """
-        try :
-            
-            log.info(f"Command to be executed on {self.host_ip}: {command} ")
-            self.output['stdin'], self.output['stdout'], self.output['stderr'] = self.client.exec_command(command)
-            exit_code = self.output['stdout'].channel.recv_exit_status()
-            self.output['stdout'] = self.output['stdout'].read().decode()
-            self.output['stderr'] = self.output['stderr'].read().decode()
+        result = self.run_command(command)
+        output = {'stdout': result.stdout, 'stderr': result.stderr}
+        return result.exit_code, output
 
-        except Exception as e:
-            log.error(f"Command failed : {command} on the Device: {self.host_ip}")
-            log.exception(e)
-            exit_code = 1
-        
-        return exit_code, self.output
+    def run_command(self, command, timeout=None):
+        """
+           This method executes the given command on its own exec channel of the
+           existing SSH transport. It is safe to call from several threads at
+           once, at most max_channels commands run at the same time on the node.
+           Parameters:
+              command : command to execute on the device
+              timeout : optional maximum number of seconds, the channel is
+                        closed once it expires
+           Returns:
+              CommandResult(command, exit_code, stdout, stderr, duration), the
+              exit code is TIMEOUT_EXIT_CODE if the timeout expired
+        """
+        log.info(f"Command to be executed on {self.host_ip}: {command} ")
+        with self._channel_slots:
+            start = time.monotonic()
+            deadline = start + timeout if timeout is not None else None
+            channel = None
+            data = {"stdout": [], "stderr": []}
+            try:
+                channel = self.client.get_transport().open_session()
+                channel.settimeout(timeout)
+                channel.exec_command(command)
+                for stream, chunk in self._drain_channel(channel, deadline=deadline):
+                    data[stream].append(chunk)
+                exit_code = self._recv_exit_status(channel, deadline)
+            except socket.timeout:
+                log.error(f"Command : {command} on {self.host_ip} timed out after {timeout}s")
+                data["stderr"].append(f"\nCommand timed out after {timeout}s".encode())
+                exit_code = TIMEOUT_EXIT_CODE
+            except Exception as e:
+                log.error(f"Command failed : {command} on the Device: {self.host_ip}")
+                log.exception(e)
+                return CommandResult(command, 1, "", str(e), time.monotonic() - start)
+            finally:
+                if channel:
+                    channel.close()
+        out = b"".join(data["stdout"]).decode(errors="replace")
+        err = b"".join(data["stderr"]).decode(errors="replace")
+        return CommandResult(command, exit_code, out, err, time.monotonic() - start)
+
+    @staticmethod
+    def _drain_channel(channel, stop_event=None, deadline=None):
+        """
+        Reads stdout and stderr of the channel as the data arrives, so the
+        remote side never blocks on a full channel window
+
+        Yields:
+            ("stdout" | "stderr", bytes)
+
+        Raises:
+            socket.timeout once time.monotonic() passed the optional deadline
+        """
+        while True:
+            if stop_event is not None and stop_event.is_set():
+                return
+            if deadline is not None and time.monotonic() >= deadline:
+                raise socket.timeout("channel output deadline expired")
+            received = False
+            if channel.recv_ready():
+                received = True
+                yield "stdout", channel.recv(RECV_CHUNK_SIZE)
+            if channel.recv_stderr_ready():
+                received = True
+                yield "stderr", channel.recv_stderr(RECV_CHUNK_SIZE)
+            if received:
+                continue
+            # The exit status may arrive before the last data, only EOF ends the output
+            if channel.eof_received or channel.closed:
+                if not channel.recv_ready() and not channel.recv_stderr_ready():
+                    return
+                continue
+            # Wakes up as soon as data arrives on either stream
+            wait = 0.1 if deadline is None else max(0.0, min(0.1, deadline - time.monotonic()))
+            select.select([channel], [], [], wait)
+
+    @staticmethod
+    def _recv_exit_status(channel, deadline=None):
+        """
+        Waits for the exit status of the channel, until the optional deadline
+
+        Raises:
+            socket.timeout if the exit status did not arrive in time
+        """
+        if deadline is not None and not channel.status_event.wait(max(0.0, deadline - time.monotonic())):
+            raise socket.timeout("exit status deadline expired")
+        return channel.recv_exit_status()
+
+    def _iter_channel_lines(self, channel, stop_event=None, deadline=None):
+        decoders = {name: codecs.getincrementaldecoder("utf-8")(errors="replace") for name in ("stdout", "stderr")}
+        partial_lines = {"stdout": "", "stderr": ""}
+        for stream, chunk in self._drain_channel(channel, stop_event, deadline):
+            text = partial_lines[stream] + decoders[stream].decode(chunk)
+            lines = text.split("\n")
+            partial_lines[stream] = lines.pop()
+            for line in lines:
+                yield stream, line
+        for stream, text in partial_lines.items():
+            text += decoders[stream].decode(b"", final=True)
+            if text:
+                yield stream, text
+
+    def iter_command_lines(self, command, stop_event=None):
+        """
+           This method executes the given command on the node and yields its
+           output line by line while it is running, nothing is buffered apart
+           from the current line
+           Parameters:
+              command : command to execute on the device
+              stop_event : optional threading.Event, closes the channel when set
+           Yields:
+              ("stdout" | "stderr", line)
+        """
+        log.info(f"Command to be streamed on {self.host_ip}: {command} ")
+        with self._channel_slots:
+            channel = self.client.get_transport().open_session()
+            try:
+                channel.exec_command(command)
+                yield from self._iter_channel_lines(channel, stop_event)
+            finally:
+                channel.close()
+
+    def execute_command_stream(self, command, on_line=None, tee_path=None, tail_lines=DEFAULT_TAIL_LINES,
+                               stop_event=None, timeout=None):
+        """
+           This method executes the given command on the node and drains
+           stdout and stderr while the command runs, with bounded memory
+           Parameters:
+              command : command to execute on the device
+              on_line : optional callable(stream, line) called for every line
+              tee_path : optional local path, every line is also written there
+              tail_lines : number of last lines per stream kept in the result
+              stop_event : optional threading.Event, closes the channel when set
+              timeout : optional maximum number of seconds, the channel is
+                        closed once it expires
+           Returns:
+              CommandResult(command, exit_code, stdout, stderr, duration), where
+              stdout and stderr only hold the last tail_lines lines, the exit
+              code is TIMEOUT_EXIT_CODE if the timeout expired
+        """
+        log.info(f"Command to be streamed on {self.host_ip}: {command} ")
+        tails = {"stdout": deque(maxlen=tail_lines), "stderr": deque(maxlen=tail_lines)}
+        with self._channel_slots:
+            start = time.monotonic()
+            deadline = start + timeout if timeout is not None else None
+            channel = None
+            tee = None
+            try:
+                if tee_path is not None:
+                    tee = open(tee_path, "w")
+                channel = self.client.get_transport().open_session()
+                channel.settimeout(timeout)
+                channel.exec_command(command)
+                for stream, line in self._iter_channel_lines(channel, stop_event, deadline):
+                    tails[stream].append(line)
+                    if tee is not None:
+                        tee.write(line + "\n")
+                    if on_line is not None:
+                        on_line(stream, line)
+                if stop_event is not None and stop_event.is_set() and not channel.exit_status_ready():
+                    log.info(f"Streaming of {command} on {self.host_ip} stopped")
+                    exit_code = -1
+                else:
+                    exit_code = self._recv_exit_status(channel, deadline)
+            except socket.timeout:
+                log.error(f"Command : {command} on {self.host_ip} timed out after {timeout}s")
+                tails["stderr"].append(f"Command timed out after {timeout}s")
+                exit_code = TIMEOUT_EXIT_CODE
+            except Exception as e:
+                log.error(f"Command failed : {command} on the Device: {self.host_ip}")
+                log.exception(e)
+                tails["stderr"].append(str(e))
+                exit_code = 1
+            finally:
+                if channel:
+                    channel.close()
+                if tee is not None:
+                    tee.close()
+        return CommandResult(command, exit_code, "\n".join(tails["stdout"]), "\n".join(tails["stderr"]),
+                             time.monotonic() - start)
+
+    def run_commands(self, commands, timeout=None):
+        """
+           This method executes several commands on the node at the same time,
+           each on its own exec channel, capped by max_channels
+           Parameters:
+              commands : list of commands to execute on the device
+              timeout : optional maximum number of seconds per command
+           Returns:
+              list of CommandResult, in the same order as commands
+        """
+        commands = list(commands)
+        if not commands:
+            return []
+        workers = min(len(commands), self.max_channels)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(lambda cmd: self.run_command(cmd, timeout), commands))
+
+    def execute_batch(self, commands, stop_on_failure=True, timeout=None):
+        """
+           This method executes a list of commands in one exec round trip,
+           every command runs in its own subshell and its stdout, stderr and
+           exit code are reported separately
+           Parameters:
+              commands : list of commands to execute on the device
+              stop_on_failure : do not run the remaining commands once one fails
+              timeout : optional maximum number of seconds for the whole batch
+           Returns:
+              list of CommandResult, one per executed command in order. With
+              stop_on_failure the list ends with the first failing command.
+              If the timeout expires the list ends with the running command,
+              with TIMEOUT_EXIT_CODE.
+        """
+        commands = list(commands)
+        if not commands:
+            return []
+        marker = f"__BATCH_{uuid.uuid4().hex}__"
+        lines = ['__b=$(mktemp -d) || exit 1', 'trap \'rm -rf "$__b"\' EXIT']
+        for index, command in enumerate(commands):
+            lines += [
+                '__s=$(date +%s%N)',
+                f'(\n{command}\n) >"$__b/o" 2>"$__b/e" </dev/null',
+                '__rc=$?',
+                '__t=$(( $(date +%s%N) - __s ))',
+                f'printf \'%s %d %d %d %d %d\\n\' {marker} {index} "$__rc" "$__t" "$(wc -c <"$__b/o")" "$(wc -c <"$__b/e")"',
+                'cat "$__b/o" "$__b/e"',
+            ]
+            if stop_on_failure:
+                lines.append('[ "$__rc" -eq 0 ] || exit 0')
+        script = "\n".join(lines)
+
+        log.info(f"Batch of {len(commands)} commands to be executed on {self.host_ip}: {commands}")
+        with self._channel_slots:
+            start = time.monotonic()
+            deadline = start + timeout if timeout is not None else None
+            channel = None
+            data = {"stdout": [], "stderr": []}
+            timed_out = False
+            try:
+                channel = self.client.get_transport().open_session()
+                channel.settimeout(timeout)
+                channel.exec_command(f"bash -c {shlex.quote(script)}")
+                for stream, chunk in self._drain_channel(channel, deadline=deadline):
+                    data[stream].append(chunk)
+                exit_code = self._recv_exit_status(channel, deadline)
+            except socket.timeout:
+                log.error(f"Batch on {self.host_ip} timed out after {timeout}s")
+                timed_out = True
+                exit_code = TIMEOUT_EXIT_CODE
+            except Exception as e:
+                log.error(f"Batch failed on the Device: {self.host_ip}")
+                log.exception(e)
+                return [CommandResult(commands[0], 1, "", str(e), time.monotonic() - start)]
+            finally:
+                if channel:
+                    channel.close()
+
+        raw = b"".join(data["stdout"])
+        results = []
+        pos = 0
+        header_start = marker.encode() + b" "
+        while pos < len(raw):
+            newline = raw.find(b"\n", pos)
+            header = raw[pos:newline] if newline >= 0 else b""
+            if not header.startswith(header_start):
+                break
+            index, rc, elapsed_ns, out_len, err_len = (int(field) for field in header.split()[1:])
+            pos = newline + 1
+            if pos + out_len + err_len > len(raw):
+                # Output cut short, e.g. by the timeout
+                break
+            out = raw[pos:pos + out_len].decode(errors="replace")
+            pos += out_len
+            err = raw[pos:pos + err_len].decode(errors="replace")
+            pos += err_len
+            results.append(CommandResult(commands[index], rc, out, err, elapsed_ns / 1e9))
+
+        if timed_out:
+            # The results of the finished commands are kept, the running one timed out
+            if len(results) < len(commands):
+                elapsed = time.monotonic() - start - sum(result.duration for result in results)
+                results.append(CommandResult(commands[len(results)], TIMEOUT_EXIT_CODE, "",
+                                             f"Command timed out after {timeout}s", elapsed))
+        elif exit_code and not results:
+            # The batch wrapper itself failed, e.g. mktemp
+            err = b"".join(data["stderr"]).decode(errors="replace")
+            log.error(f"Batch failed on the Device: {self.host_ip} : {err}")
+            return [CommandResult(commands[0], exit_code, "", err, time.monotonic() - start)]
+        for result in results:
+            if result.exit_code:
+                log.error(f"Command failed : {result.command} on the Device: {self.host_ip} : {result.stderr}")
+        return results
+
+    def run_in_executor(self, func, *args):
+        """
+        This method runs a blocking callable on the per-host executor, so
+        that one event loop can drive many hosts without blocking
+
+        Returns:
+            asyncio Future with the return value of func
+        """
+        if self._async_executor is None:
+            self._async_executor = ThreadPoolExecutor(max_workers=self.max_channels,
+                                                      thread_name_prefix=f"ssh-{self.host_ip}")
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self._async_executor, partial(func, *args))
+
+    async def run(self, command, timeout=None):
+        """
+           Async version of run_command
+           Returns:
+              CommandResult(command, exit_code, stdout, stderr, duration)
+        """
+        return await self.run_in_executor(self.run_command, command, timeout)
+
+    async def run_many(self, commands, timeout=None):
+        """
+           Async version of run_commands, the commands run at the same time
+           Returns:
+              list of CommandResult, in the same order as commands
+        """
+        return list(await asyncio.gather(*(self.run(cmd, timeout) for cmd in commands)))
+
+    async def copy_to_host_async(self, localpath, remotepath):
+        """
+            Async version of copy_to_host
+        """
+        return await self.run_in_executor(self.copy_to_host, localpath, remotepath)
+
+    async def copy_from_host_async(self, remotepath, localpath):
+        """
+            Async version of copy_from_host
+        """
+        return await self.run_in_executor(self.copy_from_host, remotepath, localpath)
+
+    async def wait_for(self, command, predicate, interval=5, timeout=None):
+        """
+           This method runs the command every interval seconds until
+           predicate(CommandResult) is true, without blocking the event loop
+           Parameters:
+              command : command to execute on the device
+              predicate : callable taking a CommandResult and returning bool
+              interval : seconds between two attempts
+              timeout : optional maximum number of seconds to wait
+           Returns:
+              CommandResult of the last attempt
+
+           Raises:
+              asyncio.TimeoutError if the timeout expires
+        """
+        async def poll():
+            while True:
+                result = await self.run(command)
+                if predicate(result):
+                    return result
+                await asyncio.sleep(interval)
+        return await asyncio.wait_for(poll(), timeout)
 
     def execute_command_channel(self,command):
         """
@@ -111,30 +506,204 @@ class RemoteHostHandler:
                 channel.close()
         return 0
 
-    def copy_to_host(self,localpath,remotepath):
+    def get_sftp(self):
+        """
+            This method returns the long-lived SFTP session of the handler,
+            it is opened on first use and reopened if the channel was closed
+        """
+        with self._sftp_lock:
+            if self._sftp is None or self._sftp.get_channel() is None or self._sftp.get_channel().closed:
+                log.debug(f"Opening SFTP session on {self.host_ip}")
+                self._sftp = self.client.open_sftp()
+            return self._sftp
+
+    def close_sftp(self):
+        """
+            This method closes the SFTP session of the handler, if any
+        """
+        with self._sftp_lock:
+            if self._sftp is not None:
+                try:
+                    self._sftp.close()
+                except Exception as e:
+                    log.debug(f"Unable to close the SFTP session on {self.host_ip} : {e}")
+                self._sftp = None
+
+    @contextmanager
+    def sftp_session(self):
+        """
+            This method yields an SFTP session for one transfer. An SFTP
+            session cannot carry two transfers at once (the responses of
+            pipelined writes are read by whichever thread waits), so the
+            long-lived session is used by one transfer at a time. A transfer
+            started meanwhile opens its own session under a channel slot and
+            closes it at the end, at most max_channels + 1 channels are open.
+        """
+        if self._sftp_lock.acquire(blocking=False):
+            try:
+                yield self.get_sftp()
+            finally:
+                self._sftp_lock.release()
+            return
+        with self._channel_slots:
+            log.debug(f"Opening a transfer SFTP session on {self.host_ip}")
+            sftp = self.client.open_sftp()
+            try:
+                yield sftp
+            finally:
+                sftp.close()
+
+    def read_remote_from(self, remotepath, offset, out):
+        """
+            This method appends the bytes of the remote file after offset to
+            the local file object out
+
+            Returns:
+                new offset
+        """
+        with self.sftp_session() as sftp:
+            try:
+                size = sftp.stat(remotepath).st_size
+            except FileNotFoundError:
+                return offset
+            if size < offset:
+                # The file was truncated, start again from its beginning
+                offset = 0
+            if size == offset:
+                return offset
+            with sftp.open(remotepath, "rb") as src:
+                src.seek(offset)
+                src.prefetch(size)
+                remaining = size - offset
+                while remaining > 0:
+                    data = src.read(min(remaining, DEFAULT_SFTP_CHUNK_SIZE))
+                    if not data:
+                        break
+                    out.write(data)
+                    remaining -= len(data)
+                    offset += len(data)
+        out.flush()
+        return offset
+
+    def run_with_log(self, command, remote_log, local_log, poll_interval=1.0, timeout=None):
+        """
+            This method runs a long command on the node with its output
+            redirected to remote_log. The channel stays open and the call
+            returns as soon as the command exits. Meanwhile the new bytes of
+            remote_log are appended to local_log every poll_interval seconds.
+
+            Parameters:
+                command : command to execute on the device
+                remote_log : path of the log file on the device
+                local_log : local path the log is streamed to
+                poll_interval : maximum seconds between two log reads
+                timeout : optional maximum number of seconds to wait
+
+            Returns:
+                exit code of the command, 1 on error or timeout
+        """
+        log.info(f"Command to be executed on {self.host_ip} : {command} ")
+        channel = None
+        start = time.monotonic()
+        try:
+            channel = self.client.get_transport().open_session()
+            channel.get_pty()
+            # Subshell, so every part of a compound command goes to the log
+            channel.exec_command(f"({command}) > {remote_log} 2>&1")
+            offset = 0
+            with open(local_log, "wb") as out:
+                while True:
+                    # Set by paramiko as soon as the exit status arrives
+                    done = channel.status_event.wait(poll_interval)
+                    while channel.recv_ready():
+                        log.debug(channel.recv(RECV_CHUNK_SIZE).decode(errors="replace"))
+                    offset = self.read_remote_from(remote_log, offset, out)
+                    if done:
+                        break
+                    if timeout is not None and time.monotonic() - start > timeout:
+                        log.error(f"Command : {command} on {self.host_ip} still running after {timeout}s")
+                        return 1
+            exit_code = channel.recv_exit_status()
+        except Exception as e:
+            log.error(f"Command failed : {command} on the Device: {self.host_ip}")
+            log.exception(e)
+            return 1
+        finally:
+            if channel:
+                channel.close()
+        log.info(f"Command : {command} on {self.host_ip} exited with {exit_code} after {time.monotonic() - start:.1f}s")
+        return exit_code
+
+    def copy_to_host(self,localpath,remotepath,chunk_size=DEFAULT_SFTP_CHUNK_SIZE,resume=False):
         """
             This method copies the file from local host to the remote host 
+
+            Parameters:
+                chunk_size : size of the blocks read from the local file
+                resume : continue from the size of a partial remote file
         """
         try:
-            ftp_client = self.client.open_sftp()
-            ftp_client.put(localpath,remotepath)
-            ftp_client.close()
+            local_size = os.path.getsize(localpath)
+            with self.sftp_session() as sftp:
+                offset = 0
+                if resume:
+                    try:
+                        offset = sftp.stat(remotepath).st_size
+                    except FileNotFoundError:
+                        offset = 0
+                    if offset > local_size:
+                        offset = 0
+                with open(localpath, "rb") as src, sftp.open(remotepath, "r+b" if offset else "wb") as dst:
+                    # Writes are sent without waiting for each server ack
+                    dst.set_pipelined(True)
+                    src.seek(offset)
+                    dst.seek(offset)
+                    while True:
+                        data = src.read(chunk_size)
+                        if not data:
+                            break
+                        dst.write(data)
+                remote_size = sftp.stat(remotepath).st_size
+            if remote_size != local_size:
+                raise IOError(f"size mismatch! {remote_size} != {local_size}")
         except Exception as e:
             log.error(f"Unable to copy the package to host Error: {e}")
             return 1
         else:
-            log.info(f"Copied {localpath} to {remotepath} successfully !")
+            if offset:
+                log.info(f"Copied {localpath} to {remotepath} successfully, resumed from offset {offset} !")
+            else:
+                log.info(f"Copied {localpath} to {remotepath} successfully !")
             return 0
 
-    def copy_from_host(self,remotepath,localpath):
+    def copy_from_host(self,remotepath,localpath,chunk_size=DEFAULT_SFTP_CHUNK_SIZE,resume=False):
         """
             This method copies the file from remote host to the local host 
+
+            Parameters:
+                chunk_size : size of the blocks written to the local file
+                resume : continue from the size of a partial local file
         """
         try:
-            ftp_client = self.client.open_sftp()
-            ftp_client.stat(remotepath) 
-            ftp_client.get(remotepath,localpath)
-            ftp_client.close()
+            with self.sftp_session() as sftp:
+                remote_size = sftp.stat(remotepath).st_size
+                offset = 0
+                if resume and os.path.exists(localpath):
+                    offset = os.path.getsize(localpath)
+                    if offset > remote_size:
+                        offset = 0
+                with sftp.open(remotepath, "rb") as src, open(localpath, "ab" if offset else "wb") as dst:
+                    src.seek(offset)
+                    # Read requests for the whole remaining file are sent up front
+                    src.prefetch(remote_size)
+                    while True:
+                        data = src.read(chunk_size)
+                        if not data:
+                            break
+                        dst.write(data)
+            local_size = os.path.getsize(localpath)
+            if local_size != remote_size:
+                raise IOError(f"size mismatch! {local_size} != {remote_size}")
         except FileNotFoundError as f:
             log.error(f"{remotepath} file not found : {f}")
             return 1
@@ -151,9 +720,7 @@ class RemoteHostHandler:
         This method creates file on the remote host
         """
         try:
-            if self.sftp == "":
-                self.sftp = self.client.open_sftp()
-            with self.sftp.open(remote_file_path, 'w') as f:
+            with self.sftp_session() as sftp, sftp.open(remote_file_path, 'w') as f:
                 if is_json :
                     json.dump(remote_file_content,f,indent=4)
                 else :
@@ -164,18 +731,13 @@ class RemoteHostHandler:
         else:
             log.info(f"Created the file {remote_file_path} on {self.host_ip} successfully ! ")
             return 0
-        finally :
-            if self.sftp:
-                self.sftp.close()
-                self.sftp = ""
         
     def open_file(self,remote_file_path):
         """
         This method opens file on the remote host
         """
         try:
-            self.sftp = self.client.open_sftp()
-            with self.sftp.open(remote_file_path, 'r') as f:
+            with self.sftp_session() as sftp, sftp.open(remote_file_path, 'r') as f:
                 file_config = json.load(f)
         except Exception as e:
             log.error(f"Unable to open the file : {e}")
@@ -187,16 +749,16 @@ class RemoteHostHandler:
     def copy_munge_to_hosts(self,dest_hosts, file_path):
 
         try:
-            if self.sftp == "":
-                self.sftp = self.client.open_sftp()
-                self.sftp.get(file_path, "munge.key")
-            
+            exit_code = self.copy_from_host(file_path, "munge.key")
+            if exit_code:
+                return exit_code
+
             dest_path = "munge.key"
             for host in dest_hosts:
                 log.info(f"Copying {file_path} to {host.host_ip}...")
-                scp = SCPClient(host.client.get_transport())
-                scp.put("munge.key", dest_path)
-                scp.close()
+                exit_code = host.copy_to_host("munge.key", dest_path)
+                if exit_code:
+                    return exit_code
 
         except Exception as e:
             log.error(f"Unable to copy the file : {e}")
@@ -204,11 +766,33 @@ class RemoteHostHandler:
         else:
             log.info(f"Copied the file {file_path} on all hosts successfully !")
             return 0
-        finally :
-            if self.sftp:
-                self.sftp.close()
-                self.sftp = ""
         
+    def get_facts(self, refresh=False):
+        """
+        This method returns the facts of the host (OS, hostname, user, ROCm
+        version, GPU inventory, IB devices). They are gathered in one round
+        trip on first use and cached until refresh or reconnect(). Facts of a
+        failed gather are not cached, the next use gathers them again
+        """
+        with self._facts_lock:
+            if self._facts is None or refresh:
+                facts = HostFacts.gather(self)
+                if not facts.complete:
+                    return facts
+                self._facts = facts
+            return self._facts
+
+    @property
+    def facts(self):
+        return self.get_facts()
+
+    def invalidate_facts(self):
+        """
+        This method drops the cached facts, they are gathered again on next use
+        """
+        with self._facts_lock:
+            self._facts = None
+
     def get_ip(self):
         """
         This method retrieves the IP Address of the remote host
@@ -226,6 +810,10 @@ class RemoteHostHandler:
             This method closes the connection from the Node
         """
         log.info(f"Attempting to Disconnect from Node: {self.host_ip}")
+        if self._async_executor is not None:
+            self._async_executor.shutdown(wait=False)
+            self._async_executor = None
+        self.close_sftp()
         try:
             self.client.close()
         except Exception as e:
@@ -235,6 +823,99 @@ class RemoteHostHandler:
     
     def reconnect(self):
         """
+        This method reconnects to the Node, the cached facts are invalidated
         """
+        self.invalidate_facts()
         self.close()
-        self.connect(self.username,self.password,self.key)
\ No newline at end of file
+        self.connect(self.username,self.password,self.key,self.port)
+
+
+class LocalHostHandler:
+    """
+    This Class runs the commands on the local machine with the command and copy
+    interface of RemoteHostHandler, e.g. to drive Slurm jobs from the head node
+    itself or against stub sbatch/sacct scripts found first in the PATH.
+    Relative paths are relative to workdir.
+    """
+    def __init__(self, workdir=None, gpu_num=0):
+        self.host_ip = "localhost"
+        self.workdir = Path(workdir) if workdir else Path.cwd()
+        self.gpu_num = gpu_num
+
+    def execute_command(self, command):
+        """
+           This method executes the given command locally
+           Returns:
+              exit_code : int
+              output{} : new dict per call having output['stdout'],output['stderr']
+        """
+        result = self.run_command(command)
+        output = {'stdout': result.stdout, 'stderr': result.stderr}
+        return result.exit_code, output
+
+    def run_command(self, command, timeout=None):
+        """
+           This method executes the given command with bash in workdir
+           Returns:
+              CommandResult(command, exit_code, stdout, stderr, duration)
+        """
+        log.info(f"Command to be executed on {self.host_ip}: {command} ")
+        start = time.monotonic()
+        try:
+            proc = subprocess.run(["bash", "-c", command], cwd=str(self.workdir), stdin=subprocess.DEVNULL,
+                                  stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            log.error(f"Command : {command} on {self.host_ip} timed out after {timeout}s")
+            return CommandResult(command, TIMEOUT_EXIT_CODE, "", f"Command timed out after {timeout}s",
+                                 time.monotonic() - start)
+        except Exception as e:
+            log.error(f"Command failed : {command} on the Device: {self.host_ip}")
+            log.exception(e)
+            return CommandResult(command, 1, "", str(e), time.monotonic() - start)
+        return CommandResult(command, proc.returncode, proc.stdout.decode(errors="replace"),
+                             proc.stderr.decode(errors="replace"), time.monotonic() - start)
+
+    def run_commands(self, commands, timeout=None):
+        return [self.run_command(command, timeout) for command in commands]
+
+    def execute_batch(self, commands, stop_on_failure=True, timeout=None):
+        """
+           This method executes a list of commands one after the other, same
+           results as RemoteHostHandler.execute_batch
+        """
+        results = []
+        for command in commands:
+            results.append(self.run_command(command, timeout))
+            if results[-1].exit_code:
+                log.error(f"Command failed : {command} on the Device: {self.host_ip} : {results[-1].stderr}")
+                if stop_on_failure:
+                    break
+        return results
+
+    def _copy(self, src, dst):
+        try:
+            Path(dst).parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(str(src), str(dst))
+        except Exception as e:
+            log.error(f"Failed to copy {src} to {dst} : {e}")
+            return 1
+        return 0
+
+    def copy_to_host(self, localpath, remotepath, **kwargs):
+        return self._copy(localpath, self.workdir / remotepath)
+
+    def copy_from_host(self, remotepath, localpath, **kwargs):
+        return self._copy(self.workdir / remotepath, localpath)
+
+    def close(self):
+        pass
+
+
+async def run_on_hosts(hosts, command, timeout=None):
+    """
+    This function runs the same command on all the hosts from one event loop
+
+    Returns:
+        list of CommandResult, in the same order as hosts
+    """
+    return list(await asyncio.gather(*(host.run(command, timeout) for host in hosts)))
@@ -0,0 +1,310 @@
+#! /usr/bin/env python3
+
+# Copyright (c) Advanced Micro Devices, Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the \"License\");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an \"AS IS\" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import csv
+import json
+import logging
+import re
+import threading
+from typing import NamedTuple
+
+from lib.host_handler import run_on_hosts
+
+log = logging.getLogger(__name__)
+
+IB_SYSFS = "/sys/class/infiniband"
+
+# Timestamp, every device port and every hw_counter of every port in one command
+SNAPSHOT_CMD = (
+    f"date +%s.%N; echo {IB_SYSFS}/*/ports/*; "
+    f"grep -H . {IB_SYSFS}/*/ports/*/hw_counters/* 2>/dev/null; true"
+)
+
+COUNTER_LINE_REGEX = re.compile(r"^" + re.escape(IB_SYSFS) + r"/([^/]+)/ports/(\d+)/hw_counters/([^:]+):(.*)$")
+PORT_REGEX = re.compile(re.escape(IB_SYSFS) + r"/([^/\s]+)/ports/(\d+)")
+
+
+class IbSnapshot(NamedTuple):
+    """
+    hw_counters of every IB device port of one host at one point in time
+    """
+    host: str
+    timestamp: float
+    # (device, port) -> {counter name: value}
+    counters: dict
+
+    @property
+    def devices(self):
+        return sorted(self.counters)
+
+    def rows(self):
+        """
+        Flat table of the snapshot, one row per device/port/counter
+        """
+        return [
+            {"host": self.host, "timestamp": self.timestamp, "device": dev, "port": port,
+             "counter": name, "value": value}
+            for (dev, port), values in sorted(self.counters.items())
+            for name, value in sorted(values.items())
+        ]
+
+
+def parse_ib_snapshot(host, output):
+    """
+    This function parses the output of SNAPSHOT_CMD
+
+    Return : IbSnapshot
+    """
+    lines = output.splitlines()
+    try:
+        timestamp = float(lines[0])
+    except (IndexError, ValueError):
+        timestamp = 0.0
+    counters = {}
+    for line in lines[1:]:
+        match = COUNTER_LINE_REGEX.match(line)
+        if match:
+            dev, port, name, value = match.groups()
+            try:
+                counters.setdefault((dev, int(port)), {})[name] = int(value.strip())
+            except ValueError:
+                # Non numeric counter files are skipped
+                continue
+            continue
+        # Ports without readable hw_counters are still listed
+        for dev, port in PORT_REGEX.findall(line):
+            counters.setdefault((dev, int(port)), {})
+    return IbSnapshot(host, timestamp, counters)
+
+
+def snapshot_ib_counters(amd_host):
+    """
+    This function reads every hw_counter of every IB device/port of the host
+    in one round trip
+
+    Return : (exit_code, IbSnapshot)
+    """
+    result = amd_host.run_command(SNAPSHOT_CMD)
+    if result.exit_code:
+        log.error(f"Error reading IB counters on {amd_host.host_ip}: {result.stderr}")
+        return result.exit_code, None
+    return 0, parse_ib_snapshot(amd_host.host_ip, result.stdout)
+
+
+def snapshot_ib_counters_all(hosts):
+    """
+    This function takes an IB counter snapshot of all the hosts at the same time
+
+    Return : (exit_code, {host_ip: IbSnapshot})
+    """
+    results = asyncio.run(run_on_hosts(hosts, SNAPSHOT_CMD))
+    snapshots = {}
+    for host, result in zip(hosts, results):
+        if result.exit_code:
+            log.error(f"Error reading IB counters on {host.host_ip}: {result.stderr}")
+            return result.exit_code, snapshots
+        snapshots[host.host_ip] = parse_ib_snapshot(host.host_ip, result.stdout)
+    return 0, snapshots
+
+
+def snapshot_delta(before, after):
+    """
+    This function computes the counter deltas between two snapshots of a host
+
+    Return : {(device, port): {counter name: after - before}}
+    """
+    deltas = {}
+    for dev, values in after.counters.items():
+        previous = before.counters.get(dev, {})
+        deltas[dev] = {name: value - previous.get(name, 0) for name, value in values.items()}
+    return deltas
+
+
+# Counters streamed by RdmaSampler
+SAMPLED_COUNTERS = (
+    "tx_rdma_ucast_bytes",
+    "rx_rdma_ucast_bytes",
+    "tx_rdma_ucast_pkts",
+    "rx_rdma_ucast_pkts",
+)
+SAMPLE_MARKER = "__RDMA_SAMPLE__"
+
+
+def sampler_cmd(interval, max_duration):
+    """
+    Remote loop printing a timestamped block of the sampled counters of every
+    port each interval seconds, it ends by itself after max_duration seconds
+    """
+    files = " ".join(f"{IB_SYSFS}/*/ports/*/hw_counters/{name}" for name in SAMPLED_COUNTERS)
+    return (
+        f"end=$(( $(date +%s) + {int(max_duration)} )); "
+        f"while [ $(date +%s) -lt $end ]; do "
+        f"echo {SAMPLE_MARKER} $(date +%s.%N); grep -H . {files} 2>/dev/null; sleep {interval}; "
+        f"done"
+    )
+
+
+class RdmaSampler:
+    """
+    This Class samples the RDMA counters of every port of the hosts at a
+    fixed interval while a job runs. The samples are streamed back over one
+    channel per host and turned into per-port throughput time series.
+    """
+    def __init__(self, hosts, interval=1.0, max_duration=4 * 3600):
+        self.hosts = hosts
+        self.interval = interval
+        self.max_duration = max_duration
+        # host_ip -> list of (timestamp, {(device, port): {counter: value}})
+        self.samples = {host.host_ip: [] for host in hosts}
+        self._stop = threading.Event()
+        self._threads = []
+
+    def _sample_host(self, host):
+        samples = self.samples[host.host_ip]
+        current = {}
+
+        def on_line(stream, line):
+            if stream != "stdout":
+                return
+            if line.startswith(SAMPLE_MARKER):
+                # A new block starts, the previous one is complete
+                if current.get("timestamp") is not None:
+                    samples.append((current["timestamp"], current["counters"]))
+                try:
+                    timestamp = float(line.split()[1])
+                except (IndexError, ValueError):
+                    timestamp = None
+                current.clear()
+                current.update(timestamp=timestamp, counters={})
+                return
+            match = COUNTER_LINE_REGEX.match(line)
+            if match and current.get("timestamp") is not None:
+                dev, port, name, value = match.groups()
+                try:
+                    current["counters"].setdefault((dev, int(port)), {})[name] = int(value.strip())
+                except ValueError:
+                    pass
+
+        result = host.execute_command_stream(sampler_cmd(self.interval, self.max_duration), on_line=on_line,
+                                             tail_lines=10, stop_event=self._stop)
+        if result.exit_code not in (0, -1):
+            log.error(f"RDMA sampler on {host.host_ip} failed : {result.stderr}")
+
+    def start(self):
+        """
+        This method starts sampling on every host
+        """
+        log.info(f"Starting RDMA sampler on {[host.host_ip for host in self.hosts]} every {self.interval}s")
+        for host in self.hosts:
+            thread = threading.Thread(target=self._sample_host, args=(host,), name=f"rdma-{host.host_ip}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        """
+        This method stops sampling, the last incomplete block is dropped
+        """
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        log.info(f"RDMA sampler stopped : {({ip: len(s) for ip, s in self.samples.items()})} samples")
+
+    def series(self):
+        """
+        This method computes the throughput between consecutive samples
+
+        Return : {host_ip: {(device, port): [{"timestamp", "tx_gbps", "rx_gbps", "tx_pps", "rx_pps"}]}}
+        """
+        series = {}
+        for host_ip, samples in self.samples.items():
+            ports = series.setdefault(host_ip, {})
+            for (t0, c0), (t1, c1) in zip(samples, samples[1:]):
+                dt = t1 - t0
+                if dt <= 0:
+                    continue
+                for dev, values in c1.items():
+                    previous = c0.get(dev)
+                    if previous is None:
+                        continue
+                    delta = {name: values.get(name, 0) - previous.get(name, 0) for name in SAMPLED_COUNTERS}
+                    if any(value < 0 for value in delta.values()):
+                        # Counter reset, this interval cannot be used
+                        continue
+                    ports.setdefault(dev, []).append({
+                        "timestamp": t1,
+                        "tx_gbps": delta["tx_rdma_ucast_bytes"] * 8 / dt / 1e9,
+                        "rx_gbps": delta["rx_rdma_ucast_bytes"] * 8 / dt / 1e9,
+                        "tx_pps": delta["tx_rdma_ucast_pkts"] / dt,
+                        "rx_pps": delta["rx_rdma_ucast_pkts"] / dt,
+                    })
+        return series
+
+    def summary(self):
+        """
+        This method returns the peak and average Gb/s of every port
+
+        Return : {host_ip: {"device:port": {"tx_peak_gbps", "tx_avg_gbps", "rx_peak_gbps", "rx_avg_gbps", "samples"}}}
+        """
+        summary = {}
+        for host_ip, ports in self.series().items():
+            host_summary = summary.setdefault(host_ip, {})
+            for (dev, port), points in sorted(ports.items()):
+                if not points:
+                    continue
+                host_summary[f"{dev}:{port}"] = {
+                    "tx_peak_gbps": max(p["tx_gbps"] for p in points),
+                    "tx_avg_gbps": sum(p["tx_gbps"] for p in points) / len(points),
+                    "rx_peak_gbps": max(p["rx_gbps"] for p in points),
+                    "rx_avg_gbps": sum(p["rx_gbps"] for p in points) / len(points),
+                    "samples": len(points),
+                }
+        return summary
+
+    def peak_gbps(self, devices=None):
+        """
+        This method returns the highest tx or rx Gb/s seen on any port, or only
+        on the given (device, port) list
+        """
+        names = None if devices is None else {f"{dev}:{port}" for dev, port in devices}
+        peaks = [max(values["tx_peak_gbps"], values["rx_peak_gbps"])
+                 for ports in self.summary().values()
+                 for name, values in ports.items()
+                 if names is None or name in names]
+        return max(peaks, default=0.0)
+
+    def write(self, results_dir, prefix="rdma"):
+        """
+        This method writes the time series as CSV and the summary as JSON
+
+        Return : (csv Path, json Path)
+        """
+        csv_file = results_dir / f"{prefix}_samples.csv"
+        json_file = results_dir / f"{prefix}_summary.json"
+        with open(csv_file, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["host", "timestamp", "device", "port", "tx_gbps", "rx_gbps", "tx_pps", "rx_pps"])
+            for host_ip, ports in self.series().items():
+                for (dev, port), points in sorted(ports.items()):
+                    for p in points:
+                        writer.writerow([host_ip, f"{p['timestamp']:.3f}", dev, port, f"{p['tx_gbps']:.6f}",
+                                         f"{p['rx_gbps']:.6f}", f"{p['tx_pps']:.1f}", f"{p['rx_pps']:.1f}"])
+        with open(json_file, "w") as f:
+            json.dump({"interval": self.interval, "ports": self.summary()}, f, indent=4)
+        log.info(f"RDMA samples written to {csv_file} and {json_file}")
+        return csv_file, json_file
@@ -0,0 +1,226 @@
+#! /usr/bin/env python3
+
+# Copyright (c) Advanced Micro Devices, Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the \"License\");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an \"AS IS\" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+from typing import NamedTuple
+
+log = logging.getLogger(__name__)
+
+TERMINAL_STATES = (
+    "COMPLETED", "FAILED", "CANCELLED", "TIMEOUT", "OUT_OF_MEMORY",
+    "NODE_FAIL", "PREEMPTED", "BOOT_FAIL", "DEADLINE",
+)
+
+
+class JobStatus(NamedTuple):
+    """
+    Final state of a Slurm job
+    """
+    job_id: str
+    state: str
+    exit_code: str
+    elapsed: str
+    # State of every job step (batch, extern, 0, 1, ...) by step name
+    steps: dict
+    sacct_output: str
+
+
+def parse_sacct(output):
+    """
+    This function parses `sacct --parsable2 --noheader` output with the
+    JobID,State,ExitCode,Elapsed columns
+
+    Return : dict job_id -> {"state", "exit_code", "elapsed", "steps", "lines"}
+    """
+    jobs = {}
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        cols = line.split("|")
+        job_field = cols[0].strip()
+        # "CANCELLED by 1000" -> "CANCELLED"
+        state = cols[1].split()[0] if len(cols) > 1 and cols[1].strip() else None
+        job_id, _, step = job_field.partition(".")
+        job = jobs.setdefault(job_id, {"state": None, "exit_code": "", "elapsed": "", "steps": {}, "lines": []})
+        job["lines"].append(line)
+        if step:
+            job["steps"][step] = state
+        else:
+            job["state"] = state
+            job["exit_code"] = cols[2] if len(cols) > 2 else ""
+            job["elapsed"] = cols[3] if len(cols) > 3 else ""
+    return jobs
+
+
+def parse_squeue(output):
+    """
+    This function parses `squeue -h -o %i|%T` output
+
+    Return : dict job_id -> state
+    """
+    states = {}
+    for line in output.splitlines():
+        cols = line.strip().split("|")
+        if len(cols) >= 2:
+            states[cols[0]] = cols[1]
+    return states
+
+
+class JobWatcher:
+    """
+    This Class tracks many Slurm jobs with a single batched sacct/squeue
+    query per tick on the head node.
+
+    Polling is fast right after a job is submitted or finishes and backs off
+    while nothing changes, up to max_interval for long jobs.
+    """
+    def __init__(self, headnode, min_interval=2.0, max_interval=30.0, backoff=1.5, timeout=20 * 60):
+        self.headnode = headnode
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.timeout = timeout
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def watch(self, job_id, callback=None, timeout=None):
+        """
+        This method starts watching a job
+
+        Args : job_id : Slurm job id
+               callback : optional callable(JobStatus) called once the job ended
+               timeout : optional seconds to wait for this job, default self.timeout
+
+        Return : concurrent.futures.Future resolved with the JobStatus of the
+                 job, or failing with TimeoutError
+        """
+        job_id = str(job_id).strip()
+        future = Future()
+        if callback is not None:
+            future.add_done_callback(lambda f: f.exception() is None and callback(f.result()))
+        deadline = time.monotonic() + (timeout if timeout is not None else self.timeout)
+        with self._lock:
+            self._jobs[job_id] = (future, deadline)
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="job-watcher", daemon=True)
+                self._thread.start()
+        log.info(f"Watching sbatch job - {job_id}")
+        self._wakeup.set()
+        return future
+
+    def wait(self, futures, timeout=None):
+        """
+        This method waits for all the given futures of watch()
+
+        Return : dict job_id -> JobStatus (or the exception of the job)
+        """
+        results = {}
+        for job_id, future in futures.items():
+            try:
+                results[job_id] = future.result(timeout)
+            except Exception as e:
+                results[job_id] = e
+        return results
+
+    def stop(self):
+        """
+        This method stops the watcher thread, pending jobs fail with TimeoutError
+        """
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+        with self._lock:
+            pending = list(self._jobs.items())
+            self._jobs.clear()
+        for job_id, (future, _) in pending:
+            future.set_exception(TimeoutError(f"Job watcher stopped before job {job_id} ended"))
+
+    def poll_once(self):
+        """
+        This method queries the state of all watched jobs in one round trip
+        and resolves the futures of the jobs which ended
+
+        Return : True if any watched job changed state
+        """
+        with self._lock:
+            job_ids = list(self._jobs)
+        if not job_ids:
+            return False
+
+        ids = ",".join(job_ids)
+        results = self.headnode.execute_batch([
+            f"sacct -j {ids} --format=JobID,State,ExitCode,Elapsed --noheader --parsable2",
+            f"squeue -h -j {ids} -o '%i|%T'",
+        ], stop_on_failure=False)
+        sacct = parse_sacct(results[0].stdout) if results and not results[0].exit_code else {}
+        if results and results[0].exit_code:
+            log.info(f"Error getting the sacct job status : {results[0].stderr}")
+        squeue = parse_squeue(results[1].stdout) if len(results) > 1 else {}
+
+        changed = False
+        now = time.monotonic()
+        for job_id in job_ids:
+            job = sacct.get(job_id)
+            state = job["state"] if job else squeue.get(job_id)
+            log.info(f"Current job state of {job_id}: {state}")
+            with self._lock:
+                entry = self._jobs.get(job_id)
+                if entry is None:
+                    continue
+                future, deadline = entry
+                if job and state in TERMINAL_STATES:
+                    del self._jobs[job_id]
+                elif now > deadline:
+                    del self._jobs[job_id]
+                    state = None
+                else:
+                    continue
+            changed = True
+            if state is None:
+                future.set_exception(TimeoutError(f"Job {job_id} did not end in time"))
+            else:
+                future.set_result(JobStatus(job_id, state, job["exit_code"], job["elapsed"], job["steps"],
+                                            "\n".join(job["lines"])))
+        return changed
+
+    def _run(self):
+        interval = self.min_interval
+        while not self._stop.is_set():
+            with self._lock:
+                idle = not self._jobs
+            if idle:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                interval = self.min_interval
+                continue
+            try:
+                changed = self.poll_once()
+            except Exception as e:
+                log.error(f"Job watcher poll failed : {e}")
+                changed = False
+            interval = self.min_interval if changed else min(interval * self.backoff, self.max_interval)
+            # A newly watched job wakes the thread up and resets the backoff
+            if self._wakeup.wait(interval):
+                self._wakeup.clear()
+                interval = self.min_interval
@@ -0,0 +1,230 @@
+#! /usr/bin/env python3
+
+# Copyright (c) Advanced Micro Devices, Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the \"License\");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an \"AS IS\" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+import mmap
+import re
+
+log = logging.getLogger(__name__)
+
+# host:pid:tid [cudaDev] NCCL INFO|WARN message
+LINE_REGEX = re.compile(r"(?P<host>[\w.-]+):(?P<pid>\d+):(?P<tid>\d+) \[(?P<dev>\d+)\] NCCL (?P<level>INFO|WARN) ?(?P<msg>.*)")
+NET_IB_REGEX = re.compile(r"\[\d+\]([a-zA-Z0-9_]+):(\d+)/(RoCE|IB)", re.IGNORECASE)
+# Channel 00/0 : 0[0] -> 1[1] via P2P/IPC
+CONNECTION_REGEX = re.compile(r"Channel (\d+)/\d+ : (\d+)\[\w+\] -> (\d+)\[\w+\](?: \[\w+\])? via (\S+)")
+# Channel 00/24 :    0   1   2   3
+RING_REGEX = re.compile(r"Channel (\d+)/(\d+) :((?:\s+\d+)+)\s*$")
+TREES_REGEX = re.compile(r"Trees((?: \[\d+\] \S+)+)")
+CHANNELS_REGEX = re.compile(r"(\d+) coll channels,.* (\d+) p2p channels")
+INIT_COMPLETE_REGEX = re.compile(r"comm (0x[0-9a-f]+) rank (\d+) nranks (\d+) cudaDev (\d+).* Init COMPLETE")
+INIT_TIMINGS_REGEX = re.compile(r"Init timings.*?: rank (\d+) nranks (\d+) total ([\d.]+)(?: \((.*)\))?")
+ENV_REGEX = re.compile(r"NCCL_(PROTO|ALGO) set by environment to (\S+)")
+NETWORK_REGEX = re.compile(r"Using network (\S+)")
+
+
+def transport_of(via):
+    """
+    This function maps the "via" field of a channel connection to a transport
+
+    P2P/IPC -> P2P, SHM/direct/direct -> SHM, NET/IB/0/GDRDMA -> NET/IB
+    """
+    parts = via.split("/")
+    if parts[0] == "NET" and len(parts) > 1:
+        return f"NET/{parts[1]}"
+    return parts[0]
+
+
+class NcclLogAnalyzer:
+    """
+    This Class analyzes a NCCL/RCCL debug log (NCCL_DEBUG=INFO) line by line,
+    so it can consume a log while it is being written or a multi GB file
+    through mmap.
+
+    The report holds the NIC selection, transports, channels, rings/trees
+    and init timings of every rank.
+    """
+    def __init__(self, on_socket_fallback=None):
+        # Called once with the first line showing a fallback to sockets
+        self.on_socket_fallback = on_socket_fallback
+        self.net_ib_lines = []
+        self.socket_lines = []
+        self.warnings = []
+        self.devices = set()
+        self.settings = {}
+        self.lines = 0
+        # "host:pid" -> per process state, the rank is known once init completed
+        self._procs = {}
+
+    @classmethod
+    def from_file(cls, log_path, **kwargs):
+        """
+        This method analyzes a whole local log file through mmap
+        """
+        analyzer = cls(**kwargs)
+        with open(log_path, "rb") as f:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty file
+                return analyzer
+            with mm:
+                for line in iter(mm.readline, b""):
+                    analyzer.feed(line.decode(errors="ignore"))
+        return analyzer
+
+    @property
+    def socket_fallback(self):
+        return bool(self.socket_lines)
+
+    def _proc(self, match):
+        key = f"{match.group('host')}:{match.group('pid')}"
+        proc = self._procs.get(key)
+        if proc is None:
+            proc = self._procs[key] = {
+                "host": match.group("host"), "pid": int(match.group("pid")), "cuda_dev": int(match.group("dev")),
+                "rank": None, "nranks": None, "nics": [], "network": None, "transports": {},
+                "coll_channels": None, "p2p_channels": None, "rings": set(), "trees": 0,
+                "init_time": None, "init_breakdown": {},
+            }
+        return proc
+
+    def _fallback(self, line):
+        self.socket_lines.append(line)
+        if len(self.socket_lines) == 1 and self.on_socket_fallback is not None:
+            self.on_socket_fallback(line)
+
+    def feed(self, line):
+        """
+        This method analyzes one line of the log
+        """
+        line = line.strip()
+        if not line:
+            return
+        self.lines += 1
+        if "NET/Socket" in line:
+            self._fallback(line)
+        match = LINE_REGEX.search(line)
+        proc = self._proc(match) if match else None
+        if "NET/IB" in line:
+            self.net_ib_lines.append(line)
+            for dev, port, kind in NET_IB_REGEX.findall(line):
+                self.devices.add((dev, int(port)))
+                nic = {"device": dev, "port": int(port), "type": "RoCE" if kind.lower() == "roce" else "IB"}
+                if proc is not None and nic not in proc["nics"]:
+                    proc["nics"].append(nic)
+        if match is None:
+            return
+        msg = match.group("msg")
+        if match.group("level") == "WARN":
+            self.warnings.append(line)
+            return
+
+        m = NETWORK_REGEX.search(msg)
+        if m:
+            proc["network"] = m.group(1)
+            if m.group(1) == "Socket" and line not in self.socket_lines:
+                self._fallback(line)
+            return
+        m = CONNECTION_REGEX.search(msg)
+        if m:
+            transport = transport_of(m.group(4))
+            proc["transports"][transport] = proc["transports"].get(transport, 0) + 1
+            return
+        m = RING_REGEX.search(msg)
+        if m:
+            proc["rings"].add(int(m.group(1)))
+            return
+        m = TREES_REGEX.search(msg)
+        if m:
+            proc["trees"] = max(proc["trees"], len(re.findall(r"\[\d+\]", m.group(1))))
+            return
+        m = CHANNELS_REGEX.search(msg)
+        if m:
+            proc["coll_channels"], proc["p2p_channels"] = int(m.group(1)), int(m.group(2))
+            return
+        m = INIT_COMPLETE_REGEX.search(msg)
+        if m:
+            proc["rank"], proc["nranks"] = int(m.group(2)), int(m.group(3))
+            return
+        m = INIT_TIMINGS_REGEX.search(msg)
+        if m:
+            proc["rank"], proc["nranks"] = int(m.group(1)), int(m.group(2))
+            proc["init_time"] = float(m.group(3))
+            for name, value in re.findall(r"(\w+) ([\d.]+)", m.group(4) or ""):
+                proc["init_breakdown"][name] = float(value)
+            return
+        m = ENV_REGEX.search(msg)
+        if m:
+            self.settings[m.group(1).lower()] = m.group(2)
+
+    def report(self):
+        """
+        This method returns the structured report of everything seen so far
+        """
+        ranks = {}
+        transports = {}
+        # Ranks in order, processes which never completed init at the end
+        procs = sorted(self._procs.items(), key=lambda item: (item[1]["rank"] is None, item[1]["rank"] or 0, item[0]))
+        for key, proc in procs:
+            ranks[str(proc["rank"]) if proc["rank"] is not None else key] = dict(proc, rings=len(proc["rings"]))
+            for transport, count in proc["transports"].items():
+                transports[transport] = transports.get(transport, 0) + count
+        init_times = [proc["init_time"] for proc in self._procs.values() if proc["init_time"] is not None]
+        return {
+            "lines": self.lines,
+            "ranks": ranks,
+            "devices": [f"{dev}:{port}" for dev, port in sorted(self.devices)],
+            "transports": transports,
+            "protocol": self.settings.get("proto"),
+            "algorithm": self.settings.get("algo"),
+            "max_init_time": max(init_times, default=None),
+            "socket_fallback": self.socket_fallback,
+            "socket_lines": self.socket_lines[:10],
+            "warnings": self.warnings[:50],
+        }
+
+    def write_report(self, report_file):
+        """
+        This method writes the report as JSON
+        """
+        with open(report_file, "w") as f:
+            json.dump(self.report(), f, indent=4)
+        log.info(f"NCCL log report written to {report_file}")
+
+
+def follow_remote_log(amd_host, remote_path, analyzer, stop_event, job_id=None, max_duration=4 * 3600):
+    """
+    This function feeds a remote log to the analyzer while it is being written,
+    until stop_event is set. The file does not need to exist yet.
+
+    When job_id is given the remote tail ends by itself once the Slurm job
+    left the queue, it never runs longer than max_duration seconds.
+
+    Return : CommandResult of the tail command
+    """
+    def on_line(stream, line):
+        if stream == "stdout":
+            analyzer.feed(line)
+
+    command = f"timeout {int(max_duration)} tail -n +1 -F {remote_path}"
+    if job_id is not None:
+        command = (
+            f"{command} & pid=$!; "
+            f"while squeue -h -j {job_id} 2>/dev/null | grep -q .; do sleep 2; done; "
+            f"sleep 1; kill $pid 2>/dev/null; wait $pid; true"
+        )
+    return amd_host.execute_command_stream(command, on_line=on_line, tail_lines=10, stop_event=stop_event)
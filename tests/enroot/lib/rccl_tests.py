@@ -0,0 +1,171 @@
+#! /usr/bin/env python3
+
+# Copyright (c) Advanced Micro Devices, Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the \"License\");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an \"AS IS\" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+import re
+from typing import NamedTuple
+
+log = logging.getLogger(__name__)
+
+COLLECTIVE_REGEX = re.compile(r"(\w+)_perf")
+AVG_BUSBW_REGEX = re.compile(r"#\s*Avg bus bandwidth\s*:\s*([\d.]+)")
+OUT_OF_BOUNDS_REGEX = re.compile(r"#\s*Out of bounds values\s*:\s*(\d+)")
+
+
+class RcclTestRow(NamedTuple):
+    """
+    One message size of a rccl-tests run, out-of-place (oop) and in-place (ip)
+    """
+    size: int
+    count: int
+    type: str
+    redop: str
+    root: int
+    oop_time: float
+    oop_algbw: float
+    oop_busbw: float
+    oop_wrong: int
+    ip_time: float
+    ip_algbw: float
+    ip_busbw: float
+    ip_wrong: int
+
+
+def _number(value, cast=float):
+    # "N/A" is printed for #wrong when the data check is disabled
+    try:
+        return cast(value)
+    except ValueError:
+        return None
+
+
+def parse_rccl_row(line):
+    """
+    This function parses one result line of a rccl-tests table
+
+    Return : RcclTestRow or None if the line is not a result line
+    """
+    cols = line.split()
+    # size count [type [redop [root]]] + 4 out-of-place + 4 in-place columns
+    if len(cols) < 10 or not cols[0].isdigit() or not cols[1].isdigit():
+        return None
+    head, oop, ip = cols[:-8], cols[-8:-4], cols[-4:]
+    head += ["", "", "", "", ""][len(head):]
+    try:
+        return RcclTestRow(
+            int(head[0]), int(head[1]), head[2], head[3], _number(head[4], int) if head[4] else -1,
+            float(oop[0]), float(oop[1]), float(oop[2]), _number(oop[3], int),
+            float(ip[0]), float(ip[1]), float(ip[2]), _number(ip[3], int),
+        )
+    except ValueError:
+        return None
+
+
+def parse_rccl_tests(output, collective=None):
+    """
+    This function parses the output of a rccl-tests binary (all_reduce_perf, ...)
+
+    Args : output : text printed by the binary
+           collective : name of the collective, e.g. "all_reduce". The binary
+                        does not print its own name, by default it is looked
+                        up as "<collective>_perf" in the output (the command line)
+
+    Return : dict with "collective", "rows" (list of RcclTestRow),
+             "avg_busbw" and "out_of_bounds"
+    """
+    results = {"collective": collective, "rows": [], "avg_busbw": None, "out_of_bounds": None}
+    for line in output.splitlines():
+        line = line.strip()
+        match = COLLECTIVE_REGEX.search(line)
+        if match and results["collective"] is None:
+            results["collective"] = match.group(1)
+        if line.startswith("#"):
+            match = AVG_BUSBW_REGEX.match(line)
+            if match:
+                results["avg_busbw"] = float(match.group(1))
+            match = OUT_OF_BOUNDS_REGEX.match(line)
+            if match:
+                results["out_of_bounds"] = int(match.group(1))
+            continue
+        row = parse_rccl_row(line)
+        if row is not None:
+            results["rows"].append(row)
+    return results
+
+
+def wrong_rows(results):
+    """
+    This function returns the rows with data errors
+    """
+    return [row for row in results["rows"] if row.oop_wrong or row.ip_wrong]
+
+
+def results_to_json(results):
+    """
+    This function converts parsed results to a JSON serializable dict
+    """
+    return dict(results, rows=[row._asdict() for row in results["rows"]])
+
+
+def write_results(results, results_file):
+    """
+    This function writes parsed results as JSON
+    """
+    with open(results_file, "w") as f:
+        json.dump(results_to_json(results), f, indent=4)
+    log.info(f"rccl-tests results written to {results_file}")
+
+
+def load_baseline(baseline_file):
+    """
+    This function reads a baseline written by write_results
+
+    Return : {size: {"oop_busbw", "ip_busbw"}} or None if there is no baseline
+    """
+    try:
+        with open(baseline_file) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        return None
+    return {int(row["size"]): {"oop_busbw": row["oop_busbw"], "ip_busbw": row["ip_busbw"]}
+            for row in baseline["rows"]}
+
+
+def compare_to_baseline(results, baseline, threshold=0.1):
+    """
+    This function compares the busbw of every message size to the baseline
+
+    Args : results : parsed results of parse_rccl_tests
+           baseline : {size: {"oop_busbw", "ip_busbw"}} of load_baseline
+           threshold : allowed busbw drop, 0.1 fails below 90% of the baseline
+
+    Return : list of regression messages, empty if none
+    """
+    regressions = []
+    rows = {row.size: row for row in results["rows"]}
+    for size, expected in sorted(baseline.items()):
+        row = rows.get(size)
+        if row is None:
+            regressions.append(f"size {size}: missing from the results")
+            continue
+        for name in ("oop_busbw", "ip_busbw"):
+            reference = expected[name]
+            current = getattr(row, name)
+            if reference and current < reference * (1 - threshold):
+                regressions.append(f"size {size}: {name} {current:.2f} GB/s is {(1 - current / reference) * 100:.1f}% "
+                                   f"below the baseline {reference:.2f} GB/s")
+    return regressions
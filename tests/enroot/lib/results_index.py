@@ -0,0 +1,334 @@
+#! /usr/bin/env python3
+
+# Copyright (c) Advanced Micro Devices, Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the \"License\");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an \"AS IS\" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import fnmatch
+import gzip
+import json
+import logging
+import shutil
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+RUN_INFO_FILE = "run_info.json"
+RUN_DIR_PATTERN = "results-*"
+# Raw logs compressed once a run is ingested
+COMPRESS_PATTERNS = ("*.log", "*.out", "*.err", "*.csv", "*.txt")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run TEXT PRIMARY KEY,
+    testbed TEXT,
+    started TEXT,
+    finished TEXT,
+    path TEXT,
+    ingested TEXT
+);
+CREATE TABLE IF NOT EXISTS outcomes (
+    run TEXT,
+    test TEXT,
+    outcome TEXT,
+    duration REAL,
+    PRIMARY KEY (run, test)
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    run TEXT,
+    testbed TEXT,
+    host TEXT,
+    test TEXT,
+    metric TEXT,
+    value REAL,
+    source TEXT
+);
+CREATE INDEX IF NOT EXISTS metrics_lookup ON metrics (testbed, test, metric, host, run);
+CREATE INDEX IF NOT EXISTS metrics_run ON metrics (run);
+"""
+
+# (file name pattern, test name, parser function)
+PARSERS = []
+
+
+def register_parser(pattern, test):
+    """
+    This decorator registers an artifact parser
+
+    The parser is called as func(path) for every file of a run matching the
+    pattern and yields (host, metric, value) tuples, host may be "" for
+    cluster wide metrics.
+    """
+    def decorator(func):
+        PARSERS.append((pattern, test, func))
+        return func
+    return decorator
+
+
+def open_artifact(path, mode="rt"):
+    """
+    This function opens a plain or gzip compressed artifact
+    """
+    path = Path(path)
+    if path.suffix == ".gz":
+        return gzip.open(path, mode, errors="ignore") if "t" in mode else gzip.open(path, mode)
+    return open(path, mode, errors="ignore") if "t" in mode else open(path, mode)
+
+
+def _load_json(path):
+    with open_artifact(path) as f:
+        return json.load(f)
+
+
+@register_parser("rccl_results_*.json", "test_multi_node_rccl")
+def parse_rccl_results(path):
+    results = _load_json(path)
+    if results.get("avg_busbw") is not None:
+        yield "", "avg_busbw", results["avg_busbw"]
+    for row in results.get("rows", []):
+        yield "", f"oop_busbw.{row['size']}", row["oop_busbw"]
+        yield "", f"ip_busbw.{row['size']}", row["ip_busbw"]
+
+
+@register_parser("rdma_*_summary.json", "test_multi_node_distributed_pytorch")
+def parse_rdma_summary(path):
+    for host, ports in _load_json(path).get("ports", {}).items():
+        for port, values in ports.items():
+            for name in ("tx_peak_gbps", "tx_avg_gbps", "rx_peak_gbps", "rx_avg_gbps"):
+                yield host, f"{port}.{name}", values[name]
+
+
+@register_parser("nccl_report_*.json", "test_multi_node_distributed_pytorch")
+def parse_nccl_report(path):
+    report = _load_json(path)
+    if report.get("max_init_time") is not None:
+        yield "", "nccl_max_init_time", report["max_init_time"]
+    yield "", "nccl_socket_fallback", int(bool(report.get("socket_fallback")))
+    for transport, count in report.get("transports", {}).items():
+        yield "", f"nccl_connections.{transport}", count
+
+
+@register_parser("collective_sweep_*.json", "test_multi_node_distributed_pytorch")
+def parse_collective_sweep(path):
+    for row in _load_json(path).get("results", []):
+        yield "", f"{row['collective']}_busbw.{row['size']}", row["busbw"]
+
+
+@register_parser("phase_timings_*.json", "test_multi_node_distributed_pytorch")
+def parse_phase_timings(path):
+    for name, phase in _load_json(path).get("phases", {}).items():
+        yield "", f"phase.{name}.mean", phase["mean"]
+        yield "", f"phase.{name}.max", phase["max"]
+
+
+@register_parser("ddp_throughput_*.json", "test_multi_node_distributed_pytorch")
+def parse_ddp_throughput(path):
+    report = _load_json(path)
+    yield "", "ddp_samples_per_sec", report["samples_per_sec"]
+    yield "", "ddp_scaling_efficiency", report["scaling_efficiency"]
+    for name in ("p50", "p99"):
+        yield "", f"ddp_step_time.{name}", report["step_time"][name]
+    for rank in report.get("ranks", []):
+        yield rank["hostname"], f"rank{rank['rank']}.ddp_samples_per_sec", rank["samples_per_sec"]
+
+
+@register_parser("scaling_report.json", "test_multi_node_scaling")
+def parse_scaling_report(path):
+    for row in _load_json(path).get("rows", []):
+        for name in ("samples_per_sec", "throughput_efficiency"):
+            if row.get(name) is not None:
+                yield "", f"scaling.{row['config']}.{name}", row[name]
+        for collective, value in row.get("busbw", {}).items():
+            yield "", f"scaling.{row['config']}.{collective}_busbw", value
+
+
+@register_parser("single_node_pytorch_results.json", "test_single_node_pytorch")
+def parse_single_node_pytorch(path):
+    for host, result in _load_json(path).items():
+        yield host, "passed", int(result == "PASSED")
+
+
+@register_parser("*_gpu_utilization_stats.json", "test_single_node_pytorch")
+def parse_gpu_utilization_stats(path):
+    # <hostname>_gpu_utilization_stats.json
+    host = Path(path).name.split("_gpu_utilization_stats.json")[0]
+    for gpu in _load_json(path).get("gpus", []):
+        for name, metric in (("mean", "util_mean"), ("p50", "util_p50"), ("p95", "util_p95"), ("p99", "util_p99"),
+                             ("time_to_saturation", "time_to_saturation"),
+                             ("time_above_threshold", "time_above_threshold")):
+            if gpu.get(name) is not None:
+                yield host, f"gpu{gpu['gpu']}.{metric}", gpu[name]
+
+
+@register_parser("*_gpu_stress_report.json", "test_single_node_pytorch")
+def parse_gpu_stress_report(path):
+    for worker in _load_json(path).get("workers", []):
+        yield worker["host"], f"gpu{worker['gpu']}.tflops", worker["tflops"]
+        if worker.get("efficiency") is not None:
+            yield worker["host"], f"gpu{worker['gpu']}.tflops_efficiency", worker["efficiency"]
+
+
+@register_parser("setup_timings.json", "setup")
+def parse_setup_timings(path):
+    for step in _load_json(path):
+        if step.get("duration") is not None:
+            yield step.get("host") or "", f"step.{step['step']}", step["duration"]
+
+
+def compress_artifacts(run_dir, patterns=COMPRESS_PATTERNS):
+    """
+    This function gzips the raw logs of a run and removes the originals
+
+    Return : number of compressed files
+    """
+    count = 0
+    for path in sorted(Path(run_dir).iterdir()):
+        if not path.is_file() or not any(fnmatch.fnmatch(path.name, p) for p in patterns):
+            continue
+        with open(path, "rb") as src, gzip.open(f"{path}.gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        path.unlink()
+        count += 1
+    return count
+
+
+class ResultsIndex:
+    """
+    This Class indexes the results folders of the test runs in a SQLite
+    database, keyed by run, testbed, host, test and metric
+    """
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.db = sqlite3.connect(str(self.db_path))
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def runs(self, testbed=None, last=None):
+        """
+        This method returns the indexed runs, oldest first
+        """
+        query = "SELECT * FROM runs" + (" WHERE testbed = ?" if testbed else "") + " ORDER BY run DESC"
+        params = [testbed] if testbed else []
+        if last:
+            query += " LIMIT ?"
+            params.append(last)
+        return list(reversed(self.db.execute(query, params).fetchall()))
+
+    def is_ingested(self, run):
+        return self.db.execute("SELECT 1 FROM runs WHERE run = ?", (run,)).fetchone() is not None
+
+    def ingest_run(self, run_dir, compress=True):
+        """
+        This method parses the artifacts of one run into the index
+
+        Return : number of metrics indexed
+        """
+        run_dir = Path(run_dir)
+        run = run_dir.name
+        info_file = run_dir / RUN_INFO_FILE
+        info = _load_json(info_file) if info_file.exists() else {}
+        testbed = info.get("testbed", "")
+
+        metrics = []
+        for path in sorted(run_dir.iterdir()):
+            name = path.name[:-3] if path.suffix == ".gz" else path.name
+            for pattern, test, parser in PARSERS:
+                if not fnmatch.fnmatch(name, pattern):
+                    continue
+                try:
+                    for host, metric, value in parser(path):
+                        metrics.append((run, testbed, host, test, metric, float(value), path.name))
+                except Exception as e:
+                    log.error(f"Unable to parse {path} : {e}")
+
+        with self.db:
+            self.db.execute("DELETE FROM metrics WHERE run = ?", (run,))
+            self.db.execute("DELETE FROM outcomes WHERE run = ?", (run,))
+            self.db.executemany("INSERT INTO metrics VALUES (?, ?, ?, ?, ?, ?, ?)", metrics)
+            self.db.executemany("INSERT INTO outcomes VALUES (?, ?, ?, ?)",
+                                [(run, test, result.get("outcome"), result.get("duration"))
+                                 for test, result in info.get("tests", {}).items()])
+            self.db.execute("INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?)",
+                            (run, testbed, info.get("started"), info.get("finished"), str(run_dir),
+                             datetime.now().isoformat(timespec="seconds")))
+        if compress:
+            compress_artifacts(run_dir)
+        log.info(f"Indexed {len(metrics)} metrics of {run}")
+        return len(metrics)
+
+    def ingest(self, results_root, compress=True, force=False):
+        """
+        This method indexes every finished run of results_root which is not
+        indexed yet, or all of them with force
+
+        Return : list of the newly indexed run names
+        """
+        ingested = []
+        for run_dir in sorted(Path(results_root).glob(RUN_DIR_PATTERN)):
+            if not run_dir.is_dir() or (not force and self.is_ingested(run_dir.name)):
+                continue
+            info_file = run_dir / RUN_INFO_FILE
+            if info_file.exists() and not _load_json(info_file).get("finished"):
+                log.info(f"Skipping {run_dir.name}, the run is not finished")
+                continue
+            self.ingest_run(run_dir, compress=compress)
+            ingested.append(run_dir.name)
+        return ingested
+
+    def trend(self, metric, test=None, testbed=None, host=None, last=30):
+        """
+        This method returns the values of a metric over the last runs
+
+        Return : list of rows (run, testbed, host, test, metric, value), oldest first
+        """
+        where = "metric = ?"
+        params = [metric]
+        for column, value in (("test", test), ("testbed", testbed), ("host", host)):
+            if value is not None:
+                where += f" AND {column} = ?"
+                params.append(value)
+        # The last runs are picked among the runs matching the same filters
+        query = (f"SELECT run, testbed, host, test, metric, value FROM metrics WHERE {where}"
+                 f" AND run IN (SELECT DISTINCT run FROM metrics WHERE {where} ORDER BY run DESC LIMIT ?)"
+                 " ORDER BY run, host")
+        return self.db.execute(query, params + params + [last]).fetchall()
+
+    def diff(self, run_a, run_b, test=None):
+        """
+        This method compares every metric of two runs
+
+        Return : list of dicts (test, host, metric, a, b, delta, pct), sorted by
+                 the largest relative change first
+        """
+        query = "SELECT run, host, test, metric, value FROM metrics WHERE run IN (?, ?)"
+        params = [run_a, run_b]
+        if test is not None:
+            query += " AND test = ?"
+            params.append(test)
+        values = {}
+        for row in self.db.execute(query, params):
+            key = (row["test"], row["host"], row["metric"])
+            values.setdefault(key, {})[row["run"]] = row["value"]
+        rows = []
+        for (test_name, host, metric), by_run in values.items():
+            a, b = by_run.get(run_a), by_run.get(run_b)
+            delta = b - a if a is not None and b is not None else None
+            pct = delta / a * 100 if delta is not None and a else None
+            rows.append({"test": test_name, "host": host, "metric": metric, "a": a, "b": b, "delta": delta, "pct": pct})
+        rows.sort(key=lambda r: (r["pct"] is None, -abs(r["pct"] or 0), r["test"], r["host"], r["metric"]))
+        return rows
@@ -0,0 +1,285 @@
+#! /usr/bin/env python3
+
+# Copyright (c) Advanced Micro Devices, Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the \"License\");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an \"AS IS\" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import csv
+import json
+import logging
+import shlex
+from pathlib import Path
+from typing import NamedTuple
+
+from lib.job_watcher import JobWatcher
+
+log = logging.getLogger(__name__)
+
+# Folder of distributed_pytorch.py and its result files on the nodes
+RESULTS_DIR = "test_pytorch"
+DEFAULT_DIST_ARGS = "--sweep --ddp"
+JOB_TIMEOUT = 20 * 60
+
+
+class ScalingConfig(NamedTuple):
+    """
+    One point of the scaling matrix
+    """
+    nodes: int
+    ranks_per_node: int
+
+    @property
+    def world_size(self):
+        return self.nodes * self.ranks_per_node
+
+    @property
+    def name(self):
+        return f"{self.nodes}x{self.ranks_per_node}"
+
+
+def powers_of_two(limit):
+    """
+    1, 2, 4, ... up to limit, limit included
+    """
+    values = []
+    value = 1
+    while value < limit:
+        values.append(value)
+        value *= 2
+    return values + [limit]
+
+
+def scaling_matrix(max_nodes, max_ranks_per_node, nodes=None, ranks_per_node=None):
+    """
+    This function builds the nodes x ranks per node matrix, by default 1..max_nodes
+    nodes and powers of two ranks per node up to max_ranks_per_node
+
+    Return : list of ScalingConfig, smallest world size first
+    """
+    nodes = nodes or range(1, max_nodes + 1)
+    ranks_per_node = ranks_per_node or powers_of_two(max_ranks_per_node)
+    configs = [ScalingConfig(n, r) for n in nodes for r in ranks_per_node]
+    return sorted(configs, key=lambda c: (c.world_size, c.nodes))
+
+
+def job_args(config, dist_args=DEFAULT_DIST_ARGS, mode="weak", global_batch=None):
+    """
+    This function returns the distributed_pytorch.py arguments of one config.
+
+    weak scaling keeps the batch of every rank, strong scaling splits global_batch
+    over the ranks
+    """
+    args = shlex.split(dist_args)
+    if mode == "strong":
+        args += ["--ddp-batch", str(max(1, global_batch // config.world_size))]
+    return " ".join(args)
+
+
+def sbatch_command(config, script, args=""):
+    """
+    This function returns the sbatch command of one config, the node and task
+    counts of the command line override the #SBATCH header of the script.
+    The jobs get their nodes exclusively, so the small configs do not share
+    the GPUs and NICs of a node and measure uncontended numbers.
+    """
+    return (f"DIST_PYTORCH_ARGS={shlex.quote(args)} sbatch --parsable --exclusive --nodes={config.nodes} "
+            f"--ntasks-per-node={config.ranks_per_node} --gres=gpu:{config.ranks_per_node} "
+            f"--job-name=scaling-{config.name} {script}")
+
+
+def _largest_size_busbw(sweep):
+    # busbw of the largest message size of every collective
+    busbw = {}
+    for row in sweep.get("results", []):
+        current = busbw.get(row["collective"])
+        if current is None or row["size"] >= current[0]:
+            busbw[row["collective"]] = (row["size"], row["busbw"])
+    return {collective: value[1] for collective, value in busbw.items()}
+
+
+def aggregate(results):
+    """
+    This function turns the per job results into scaling rows
+
+    Efficiencies are relative to the smallest completed config: the throughput
+    efficiency is the samples/s per rank against the reference one, which covers
+    weak scaling (same batch per rank) and strong scaling (same global batch),
+    the busbw efficiency is the busbw against the reference busbw.
+
+    Args : results : list of {"config", "job_id", "state", "sweep", "ddp"}
+
+    Return : list of row dicts, smallest world size first
+    """
+    rows = []
+    for result in sorted(results, key=lambda r: (r["config"].world_size, r["config"].nodes)):
+        config, ddp, sweep = result["config"], result.get("ddp"), result.get("sweep")
+        rows.append({
+            "config": config.name,
+            "nodes": config.nodes,
+            "ranks_per_node": config.ranks_per_node,
+            "world_size": config.world_size,
+            "job_id": result["job_id"],
+            "state": result["state"],
+            "samples_per_sec": ddp["samples_per_sec"] if ddp else None,
+            "step_time_p50": ddp["step_time"]["p50"] if ddp else None,
+            "busbw": _largest_size_busbw(sweep) if sweep else {},
+        })
+
+    reference = next((row for row in rows if row["samples_per_sec"]), None)
+    busbw_reference = next((row for row in rows if row["busbw"]), None)
+    for row in rows:
+        row["speedup"] = row["throughput_efficiency"] = None
+        if reference and row["samples_per_sec"]:
+            row["speedup"] = row["samples_per_sec"] / reference["samples_per_sec"]
+            row["throughput_efficiency"] = row["speedup"] * reference["world_size"] / row["world_size"]
+        row["busbw_efficiency"] = {
+            collective: value / busbw_reference["busbw"][collective]
+            for collective, value in row["busbw"].items()
+            if busbw_reference and busbw_reference["busbw"].get(collective)
+        }
+    return rows
+
+
+def format_table(rows):
+    """
+    This function formats the scaling rows as text lines
+    """
+    collectives = sorted({collective for row in rows for collective in row["busbw"]})
+    fmt = lambda value, spec: "-" if value is None else format(value, spec)
+    pct = lambda value, spec: "-" if value is None else format(value * 100, spec) + "%"
+    lines = [f"{'Config':<8} {'Ranks':>6} {'Job':>10} {'State':<12} {'Samples/s':>12} {'Speedup':>8} {'Eff':>7}"
+             + "".join(f" {c + ' busbw':>20}" for c in collectives)]
+    for row in rows:
+        eff = row["throughput_efficiency"]
+        line = (f"{row['config']:<8} {row['world_size']:>6} {row['job_id'] or '-':>10} {row['state'] or '-':<12} "
+                f"{fmt(row['samples_per_sec'], '.1f'):>12} {fmt(row['speedup'], '.2f'):>8} {pct(eff, '.1f'):>7}")
+        for collective in collectives:
+            busbw = row["busbw"].get(collective)
+            eff = row["busbw_efficiency"].get(collective)
+            cell = "-" if busbw is None else f"{busbw:.2f} ({pct(eff, '.0f')})"
+            line += f" {cell:>20}"
+        lines.append(line)
+    return lines
+
+
+def write_report(rows, results_dir, prefix="scaling", mode="weak"):
+    """
+    This function writes the scaling rows as {prefix}_report.json and {prefix}_report.csv
+    """
+    results_dir = Path(results_dir)
+    with open(results_dir / f"{prefix}_report.json", "w") as f:
+        json.dump({"mode": mode, "rows": rows}, f, indent=4)
+    collectives = sorted({collective for row in rows for collective in row["busbw"]})
+    columns = ["config", "nodes", "ranks_per_node", "world_size", "job_id", "state",
+               "samples_per_sec", "step_time_p50", "speedup", "throughput_efficiency"]
+    with open(results_dir / f"{prefix}_report.csv", "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns + [f"{c}_busbw" for c in collectives] + [f"{c}_busbw_efficiency" for c in collectives])
+        for row in rows:
+            writer.writerow([row[c] for c in columns] + [row["busbw"].get(c) for c in collectives]
+                            + [row["busbw_efficiency"].get(c) for c in collectives])
+    log.info(f"Scaling report written to {results_dir / f'{prefix}_report.json'}")
+
+
+class ScalingSweep:
+    """
+    This Class submits one distributed_pytorch job per config of the scaling
+    matrix at once (Slurm runs them one after the other on exclusive nodes),
+    waits for all of them with a JobWatcher and collects the
+    collective sweep and DDP results of every job.
+
+    headnode runs sbatch/sacct, the result files are looked up on all hosts as
+    rank 0 may run on any node of the allocation.
+    """
+    def __init__(self, headnode, script, configs, hosts=None, dist_args=DEFAULT_DIST_ARGS, mode="weak",
+                 global_batch=None, results_dir=RESULTS_DIR, job_timeout=JOB_TIMEOUT):
+        if mode == "strong" and not global_batch:
+            raise ValueError("strong scaling needs a global batch")
+        self.headnode = headnode
+        self.hosts = hosts or [headnode]
+        self.script = script
+        self.configs = list(configs)
+        self.dist_args = dist_args
+        self.mode = mode
+        self.global_batch = global_batch
+        self.results_dir = results_dir
+        self.job_timeout = job_timeout
+        # config -> job id, None if the submission failed
+        self.jobs = {}
+
+    def submit(self, watcher):
+        """
+        This method submits every config
+
+        Return : dict job_id -> future of watcher.watch
+        """
+        futures = {}
+        for config in self.configs:
+            args = job_args(config, self.dist_args, self.mode, self.global_batch)
+            exit_code, output = self.headnode.execute_command(sbatch_command(config, self.script, args))
+            if exit_code:
+                log.error(f"sbatch of {config.name} failed : {output['stderr']}")
+                self.jobs[config] = None
+                continue
+            # --parsable prints "jobid" or "jobid;cluster"
+            job_id = output["stdout"].strip().split(";")[0]
+            log.info(f"sbatch job - {job_id} submitted for {config.name} !!")
+            self.jobs[config] = job_id
+            # Every job may wait in the queue behind all the others
+            futures[job_id] = watcher.watch(job_id, timeout=self.job_timeout * len(self.configs))
+        return futures
+
+    def _read_json(self, name):
+        path = f"{self.results_dir}/{name}"
+        for host in self.hosts:
+            exit_code, output = host.execute_command(f"cat {path}")
+            if not exit_code and output["stdout"].strip():
+                return json.loads(output["stdout"])
+        return None
+
+    def collect(self, statuses):
+        """
+        This method reads the result files of the completed jobs
+
+        Return : list of {"config", "job_id", "state", "sweep", "ddp"}
+        """
+        results = []
+        for config, job_id in self.jobs.items():
+            status = statuses.get(job_id) if job_id else None
+            if job_id is None:
+                state = "SUBMIT_FAILED"
+            elif isinstance(status, Exception):
+                state = "TIMEOUT"
+            else:
+                state = status.state
+            result = {"config": config, "job_id": job_id, "state": state, "sweep": None, "ddp": None}
+            if state == "COMPLETED":
+                result["sweep"] = self._read_json(f"collective_sweep_{job_id}.json")
+                result["ddp"] = self._read_json(f"ddp_throughput_{job_id}.json")
+            log.info(f"{config.name} : job {job_id} {state}")
+            results.append(result)
+        return results
+
+    def run(self):
+        """
+        This method submits the matrix, waits for all the jobs and aggregates them
+
+        Return : list of scaling rows, see aggregate()
+        """
+        watcher = JobWatcher(self.headnode, timeout=self.job_timeout)
+        try:
+            futures = self.submit(watcher)
+            statuses = watcher.wait(futures)
+        finally:
+            watcher.stop()
+        return aggregate(self.collect(statuses))
@@ -0,0 +1,192 @@
+#! /usr/bin/env python3
+
+# Copyright (c) Advanced Micro Devices, Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the \"License\");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an \"AS IS\" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+log = logging.getLogger(__name__)
+
+
+class Step:
+    """
+    A single unit of work in a DagScheduler graph
+    """
+    def __init__(self, name, func, deps=(), host=None):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.host = host
+        self.status = "pending"
+        self.start = None
+        self.duration = None
+        self.error = None
+
+
+class DagScheduler:
+    """
+    This Class runs a graph of dependent steps with bounded concurrency.
+
+    A step is started as soon as all of its dependencies have succeeded.
+    The first failing step stops the scheduling of new steps (fail-fast);
+    steps that are already running are allowed to finish and every step that
+    never ran is reported as skipped.
+    """
+    def __init__(self, name="setup", max_workers=8):
+        self.name = name
+        self.max_workers = max(1, int(max_workers))
+        self.steps = {}
+
+    def add(self, name, func, deps=(), host=None):
+        """
+        This method adds a step to the graph
+
+        Parameters:
+            name : unique step name
+            func : callable without arguments, raising an exception on failure
+            deps : names of the steps which must succeed before this one starts
+            host : optional host ip, only used for reporting
+
+        Returns:
+            name of the step, so it can be used directly as a dependency
+        """
+        if name in self.steps:
+            raise ValueError(f"Duplicate step name : {name}")
+        self.steps[name] = Step(name, func, deps, host)
+        return name
+
+    def _validate(self):
+        for step in self.steps.values():
+            for dep in step.deps:
+                if dep not in self.steps:
+                    raise ValueError(f"Step {step.name} depends on unknown step {dep}")
+
+        # Kahn's algorithm, only to detect cycles before anything is started
+        indegree = {name: len(step.deps) for name, step in self.steps.items()}
+        ready = [name for name, count in indegree.items() if count == 0]
+        visited = 0
+        while ready:
+            current = ready.pop()
+            visited += 1
+            for step in self.steps.values():
+                if current in step.deps:
+                    indegree[step.name] -= 1
+                    if indegree[step.name] == 0:
+                        ready.append(step.name)
+        if visited != len(self.steps):
+            raise ValueError(f"Dependency cycle detected in {self.name} graph")
+
+    def _run_step(self, step, t0):
+        step.start = time.monotonic() - t0
+        begin = time.monotonic()
+        log.info(f"[{self.name}] Starting step {step.name}")
+        try:
+            step.func()
+        finally:
+            step.duration = time.monotonic() - begin
+
+    def run(self, results_dir=None):
+        """
+        This method runs all the steps of the graph
+
+        Parameters:
+            results_dir : optional Path, the per-step timings are written to
+                          <results_dir>/<name>_timings.json
+
+        Returns:
+            list of per-step timing records
+
+        Raises:
+            The exception of the first failing step
+        """
+        self._validate()
+        t0 = time.monotonic()
+        first_error = None
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name) as executor:
+            while True:
+                if first_error is None:
+                    for step in self.steps.values():
+                        if step.status != "pending":
+                            continue
+                        if all(self.steps[dep].status == "done" for dep in step.deps):
+                            step.status = "running"
+                            running[executor.submit(self._run_step, step, t0)] = step
+
+                if not running:
+                    break
+
+                finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    step = running.pop(future)
+                    error = future.exception()
+                    if error is None:
+                        step.status = "done"
+                        log.info(f"[{self.name}] Step {step.name} done in {step.duration:.1f}s")
+                    else:
+                        step.status = "failed"
+                        step.error = str(error)
+                        log.error(f"[{self.name}] Step {step.name} failed after {step.duration:.1f}s : {error}")
+                        if first_error is None:
+                            first_error = error
+
+        for step in self.steps.values():
+            if step.status == "pending":
+                step.status = "skipped"
+
+        timings = self.timings()
+        log.info(f"[{self.name}] Total wall-clock time : {time.monotonic() - t0:.1f}s")
+        if results_dir is not None:
+            self.write_timings(results_dir, timings)
+
+        if first_error is not None:
+            raise first_error
+        return timings
+
+    def timings(self):
+        """
+        This method returns the per-step timing records ordered by start time
+        """
+        records = []
+        for step in self.steps.values():
+            records.append({
+                "step": step.name,
+                "host": step.host,
+                "deps": step.deps,
+                "status": step.status,
+                "start": round(step.start, 3) if step.start is not None else None,
+                "duration": round(step.duration, 3) if step.duration is not None else None,
+                "error": step.error,
+            })
+        records.sort(key=lambda r: (r["start"] is None, r["start"] or 0))
+        return records
+
+    def write_timings(self, results_dir, timings=None):
+        """
+        This method writes the per-step timing records to results_dir
+        """
+        timings = timings if timings is not None else self.timings()
+        timings_file = results_dir / f"{self.name}_timings.json"
+        try:
+            with open(timings_file, "w") as f:
+                json.dump(timings, f, indent=4)
+        except Exception as e:
+            log.error(f"Unable to write {timings_file} : {e}")
+            return 1
+        log.info(f"Step timings written to {timings_file}")
+        return 0
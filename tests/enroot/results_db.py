@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# Copyright (c) Advanced Micro Devices, Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the \"License\");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an \"AS IS\" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+from lib.results_index import ResultsIndex
+
+RESULTS_ROOT = Path(__file__).resolve().parent / "results"
+DEFAULT_DB = RESULTS_ROOT / "results.db"
+
+
+def fmt(value):
+    return "-" if value is None else f"{value:.3f}"
+
+
+def cmd_ingest(index, args):
+    runs = index.ingest(args.results, compress=not args.no_compress, force=args.force)
+    print(f"Indexed {len(runs)} new run(s)")
+    for run in runs:
+        print(f"  {run}")
+
+
+def cmd_runs(index, args):
+    for run in index.runs(testbed=args.testbed, last=args.last):
+        outcomes = index.db.execute("SELECT outcome, COUNT(*) FROM outcomes WHERE run = ? GROUP BY outcome",
+                                    (run["run"],)).fetchall()
+        summary = ", ".join(f"{count} {outcome}" for outcome, count in outcomes)
+        print(f"{run['run']}  {run['testbed'] or '-':<20} {summary}")
+
+
+def cmd_trend(index, args):
+    rows = index.trend(args.metric, test=args.test, testbed=args.testbed, host=args.host, last=args.last)
+    if not rows:
+        print(f"No values of {args.metric}")
+        return 1
+    for row in rows:
+        print(f"{row['run']}  {row['testbed'] or '-':<20} {row['host'] or '-':<16} {row['test']:<40} {fmt(row['value'])}")
+
+
+def cmd_diff(index, args):
+    rows = index.diff(args.run_a, args.run_b, test=args.test)
+    if not rows:
+        print(f"No metrics for {args.run_a} or {args.run_b}")
+        return 1
+    for row in rows[:args.top] if args.top else rows:
+        pct = "-" if row["pct"] is None else f"{row['pct']:+.1f}%"
+        print(f"{row['test']:<40} {row['host'] or '-':<16} {row['metric']:<40} "
+              f"{fmt(row['a']):>12} {fmt(row['b']):>12} {pct:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index the test results and query trends across runs")
+    parser.add_argument("--db", default=str(DEFAULT_DB), help="SQLite index file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest = subparsers.add_parser("ingest", help="Index the runs which are not indexed yet")
+    ingest.add_argument("--results", default=str(RESULTS_ROOT), help="Folder holding the results-* run folders")
+    ingest.add_argument("--force", action="store_true", help="Index all the runs again")
+    ingest.add_argument("--no-compress", action="store_true", help="Keep the raw logs uncompressed")
+    ingest.set_defaults(func=cmd_ingest)
+
+    runs = subparsers.add_parser("runs", help="List the indexed runs")
+    runs.add_argument("--testbed")
+    runs.add_argument("--last", type=int, default=30)
+    runs.set_defaults(func=cmd_runs)
+
+    trend = subparsers.add_parser("trend", help="Values of a metric over the last runs")
+    trend.add_argument("metric", help="Metric name, e.g. avg_busbw")
+    trend.add_argument("--test")
+    trend.add_argument("--testbed")
+    trend.add_argument("--host")
+    trend.add_argument("--last", type=int, default=30)
+    trend.set_defaults(func=cmd_trend)
+
+    diff = subparsers.add_parser("diff", help="Compare the metrics of two runs")
+    diff.add_argument("run_a")
+    diff.add_argument("run_b")
+    diff.add_argument("--test")
+    diff.add_argument("--top", type=int, default=0, help="Only show the largest changes")
+    diff.set_defaults(func=cmd_diff)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    index = ResultsIndex(args.db)
+    try:
+        return args.func(index, args) or 0
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# Copyright (c) Advanced Micro Devices, Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the \"License\");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an \"AS IS\" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+from lib.host_handler import LocalHostHandler
+from lib.scaling import DEFAULT_DIST_ARGS, RESULTS_DIR, ScalingSweep, format_table, scaling_matrix, write_report
+
+ROOT = Path(__file__).resolve().parent
+BATCH_SCRIPT = ROOT / "batch_scripts" / "distributed_pytorch_sbatch.sh"
+HELPER_SCRIPT = ROOT / "helper_scripts" / "distributed_pytorch.py"
+
+
+def int_list(text):
+    return [int(value) for value in text.split(",") if value.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run distributed_pytorch.py over a nodes x ranks per node matrix "
+                                                 "from the Slurm head node and report the scaling efficiency")
+    parser.add_argument("--max-nodes", type=int, required=True, help="Nodes of the largest config")
+    parser.add_argument("--max-ranks-per-node", type=int, required=True, help="Ranks (GPUs) per node of the largest config")
+    parser.add_argument("--nodes", type=int_list, help="Comma separated node counts, default 1..max-nodes")
+    parser.add_argument("--ranks-per-node", type=int_list, help="Comma separated ranks per node, default powers of two")
+    parser.add_argument("--mode", choices=("weak", "strong"), default="weak", help="Keep the batch per rank or the global batch")
+    parser.add_argument("--global-batch", type=int, default=512, help="Global DDP batch of the strong scaling")
+    parser.add_argument("--dist-args", default=DEFAULT_DIST_ARGS, help="Arguments of distributed_pytorch.py")
+    parser.add_argument("--workdir", default=str(Path.home()), help="Folder the jobs are submitted from")
+    parser.add_argument("--results", default=str(ROOT / "results"), help="Folder of the scaling report")
+    parser.add_argument("--job-timeout", type=int, default=20 * 60, help="Seconds allowed per job")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    headnode = LocalHostHandler(args.workdir)
+    if headnode.copy_to_host(BATCH_SCRIPT, BATCH_SCRIPT.name) or \
+            headnode.copy_to_host(HELPER_SCRIPT, f"{RESULTS_DIR}/{HELPER_SCRIPT.name}"):
+        return 1
+
+    configs = scaling_matrix(args.max_nodes, args.max_ranks_per_node, args.nodes, args.ranks_per_node)
+    sweep = ScalingSweep(headnode, BATCH_SCRIPT.name, configs, dist_args=args.dist_args, mode=args.mode,
+                         global_batch=args.global_batch, job_timeout=args.job_timeout)
+    rows = sweep.run()
+    Path(args.results).mkdir(parents=True, exist_ok=True)
+    write_report(rows, args.results, mode=args.mode)
+    print("\n".join(format_table(rows)))
+    return 1 if any(row["state"] != "COMPLETED" for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
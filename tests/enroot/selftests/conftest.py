@@ -0,0 +1,30 @@
+# Copyright (c) Advanced Micro Devices, Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the \"License\");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an \"AS IS\" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import sys
+from pathlib import Path
+
+import pytest
+
+# lib/ and helper_scripts/ of tests/enroot
+ENROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ENROOT_DIR))
+# The helper scripts are copied to the nodes and run as plain scripts
+sys.path.insert(0, str(ENROOT_DIR / "helper_scripts"))
+
+
+@pytest.fixture(scope="module")
+def loopback_server(tmp_path_factory):
+    from loopback_ssh import LoopbackSshServer
+    with LoopbackSshServer(tmp_path_factory.mktemp("loopback")) as server:
+        yield server
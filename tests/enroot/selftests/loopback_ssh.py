@@ -0,0 +1,211 @@
+#! /usr/bin/env python3
+
+# Copyright (c) Advanced Micro Devices, Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the \"License\");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an \"AS IS\" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import socket
+import subprocess
+import threading
+import time
+
+import paramiko
+
+USER = "enroot"
+PASSWORD = "loopback"
+# Seconds between the exit status and the output with exit_status_first
+EXIT_STATUS_LEAD = 0.2
+
+
+class LoopbackServer(paramiko.ServerInterface):
+    """
+    Stand-in SSH server accepting any password, every exec request runs with
+    bash in root and its output is sent back while the command runs.
+
+    exit_status_first sends the exit status before the whole output, as OpenSSH may do
+    """
+    def __init__(self, root, exit_status_first=False, owner=None):
+        self.root = root
+        self.exit_status_first = exit_status_first
+        # LoopbackSshServer counting the SFTP sessions
+        self.owner = owner
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_auth_password(self, username, password):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_pty_request(self, channel, term, width, height, pixelwidth, pixelheight, modes):
+        # Accepted for run_with_log, the command still runs on pipes
+        return True
+
+    def check_channel_exec_request(self, channel, command):
+        threading.Thread(target=self._exec, args=(channel, command.decode()), daemon=True).start()
+        return True
+
+    def _exec(self, channel, command):
+        proc = subprocess.Popen(["bash", "-c", command], cwd=self.root, stdin=subprocess.DEVNULL,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if self.exit_status_first:
+            out, err = proc.communicate()
+            channel.send_exit_status(proc.returncode)
+            time.sleep(EXIT_STATUS_LEAD)
+            channel.sendall(out)
+            channel.sendall_stderr(err)
+        else:
+            # The output is sent as it is produced, like sshd does
+            pumps = [threading.Thread(target=self._pump, args=(proc, proc.stdout, channel.sendall), daemon=True),
+                     threading.Thread(target=self._pump, args=(proc, proc.stderr, channel.sendall_stderr), daemon=True)]
+            for pump in pumps:
+                pump.start()
+            for pump in pumps:
+                pump.join()
+            returncode = proc.wait()
+            # Killed by a signal : 128 + signal number, as reported by a shell
+            channel.send_exit_status(returncode if returncode >= 0 else 128 - returncode)
+        channel.close()
+
+    @staticmethod
+    def _pump(proc, pipe, send):
+        try:
+            for chunk in iter(lambda: os.read(pipe.fileno(), 32768), b""):
+                send(chunk)
+        except Exception:
+            # The client closed the channel, e.g. on timeout
+            proc.kill()
+
+
+class LoopbackSftpHandle(paramiko.SFTPHandle):
+    def stat(self):
+        return paramiko.SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+
+
+class LoopbackSftp(paramiko.SFTPServerInterface):
+    """
+    SFTP subsystem on the local file system, relative paths are relative to root
+    """
+    def __init__(self, server, *args, **kwargs):
+        super().__init__(server, *args, **kwargs)
+        self.root = server.root
+        self.owner = server.owner
+
+    def session_started(self):
+        if self.owner is not None:
+            self.owner.count_sftp_session(1)
+
+    def session_ended(self):
+        if self.owner is not None:
+            self.owner.count_sftp_session(-1)
+
+    def _path(self, path):
+        return path if os.path.isabs(path) else os.path.join(self.root, path)
+
+    def canonicalize(self, path):
+        return self._path(path)
+
+    def stat(self, path):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.stat(self._path(path)))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    lstat = stat
+
+    def open(self, path, flags, attr):
+        try:
+            fd = os.open(self._path(path), flags | getattr(os, "O_BINARY", 0), 0o644)
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        mode = "rb"
+        if flags & os.O_WRONLY:
+            mode = "ab" if flags & os.O_APPEND else "wb"
+        elif flags & os.O_RDWR:
+            mode = "a+b" if flags & os.O_APPEND else "r+b"
+        handle = LoopbackSftpHandle(flags)
+        handle.readfile = handle.writefile = os.fdopen(fd, mode)
+        return handle
+
+    def remove(self, path):
+        try:
+            os.remove(self._path(path))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+
+class LoopbackSshServer:
+    """
+    This Class runs the stand-in SSH/SFTP server on a free loopback port, so
+    RemoteHostHandler can be exercised without a remote node
+
+        with LoopbackSshServer(tmp_path) as server:
+            host = server.connect()
+    """
+    def __init__(self, root, exit_status_first=False):
+        self.root = str(root)
+        self.exit_status_first = exit_status_first
+        self.host_key = paramiko.RSAKey.generate(2048)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(("127.0.0.1", 0))
+        self.port = self.sock.getsockname()[1]
+        self.transports = []
+        self._thread = None
+        # Open SFTP sessions over all the connections, and their maximum
+        self.sftp_sessions = 0
+        self.sftp_sessions_peak = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self.sock.listen(64)
+        self._thread = threading.Thread(target=self._accept, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.sock.close()
+        for transport in self.transports:
+            transport.close()
+
+    def count_sftp_session(self, delta):
+        with self._lock:
+            self.sftp_sessions += delta
+            self.sftp_sessions_peak = max(self.sftp_sessions_peak, self.sftp_sessions)
+
+    def _accept(self):
+        while True:
+            try:
+                client, _ = self.sock.accept()
+            except OSError:
+                return
+            transport = paramiko.Transport(client)
+            transport.add_server_key(self.host_key)
+            transport.set_subsystem_handler("sftp", paramiko.SFTPServer, LoopbackSftp)
+            transport.start_server(server=LoopbackServer(self.root, self.exit_status_first, self))
+            self.transports.append(transport)
+
+    def connect(self, **kwargs):
+        """
+        This method returns a RemoteHostHandler connected to the server
+        """
+        from lib.host_handler import RemoteHostHandler
+        host = RemoteHostHandler("127.0.0.1", **kwargs)
+        host.connect(USER, PASSWORD, None, port=self.port)
+        return host
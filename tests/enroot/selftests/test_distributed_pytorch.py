@@ -0,0 +1,99 @@
+# Copyright (c) Advanced Micro Devices, Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the \"License\");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an \"AS IS\" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+import os
+import socket
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ENROOT_DIR
+
+pytest.importorskip("torch")
+
+SCRIPT = ENROOT_DIR / "helper_scripts" / "distributed_pytorch.py"
+JOB_ID = "4242"
+NPROC = 2
+
+
+def free_port():
+    """
+    Returns a free port whose next port is free too, for the timing store of the script
+    """
+    while True:
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        try:
+            with socket.socket() as s:
+                s.bind(("127.0.0.1", port + 1))
+            return port
+        except OSError:
+            continue
+
+
+def torchrun(workdir, *args):
+    """
+    Runs distributed_pytorch.py on NPROC CPU ranks of a gloo group in workdir
+    """
+    env = dict(os.environ, SLURM_JOB_ID=JOB_ID, CUDA_VISIBLE_DEVICES="", HIP_VISIBLE_DEVICES="")
+    command = [sys.executable, "-m", "torch.distributed.run", f"--nproc_per_node={NPROC}",
+               f"--master_port={free_port()}", str(SCRIPT), *args]
+    result = subprocess.run(command, cwd=workdir, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            universal_newlines=True, timeout=300)
+    if result.returncode != 0:
+        assert False, f"distributed_pytorch.py exited with {result.returncode} :\n{result.stdout[-4000:]}"
+
+
+def test_collective_sweep(tmp_path):
+    torchrun(tmp_path, "--sweep", "--min-bytes", "1K", "--max-bytes", "4K", "--warmup", "1", "--iters", "2")
+    with open(tmp_path / f"collective_sweep_{JOB_ID}.json") as f:
+        sweep = json.load(f)
+    assert (sweep["job_id"], sweep["world_size"], sweep["backend"]) == (JOB_ID, NPROC, "gloo")
+
+    rows = sweep["results"]
+    collectives = ["all_reduce", "all_gather", "reduce_scatter", "broadcast", "all_to_all"]
+    assert [(row["collective"], row["size"]) for row in rows] == [(c, s) for c in collectives for s in (1024, 2048, 4096)]
+    # rccl-tests bus bandwidth factors for 2 ranks
+    factors = {"all_reduce": 1.0, "all_gather": 0.5, "reduce_scatter": 0.5, "broadcast": 1.0, "all_to_all": 0.5}
+    for row in rows:
+        assert row["count"] == row["size"] // 4 and row["type"] == "float32"
+        assert row["time_us"] > 0 and row["algbw"] == pytest.approx(row["size"] / row["time_us"] / 1e3)
+        assert row["busbw"] == pytest.approx(row["algbw"] * factors[row["collective"]])
+        # gloo has no reduce_scatter, it is run as an all_reduce
+        assert row["emulated"] == (row["collective"] == "reduce_scatter")
+
+
+def test_ddp_throughput(tmp_path):
+    torchrun(tmp_path, "--ddp", "--ddp-hidden", "64", "--ddp-layers", "2", "--ddp-batch", "8", "--ddp-steps", "10",
+             "--ddp-warmup", "2")
+    with open(tmp_path / f"ddp_throughput_{JOB_ID}.json") as f:
+        report = json.load(f)
+    assert (report["job_id"], report["world_size"], report["backend"]) == (JOB_ID, NPROC, "gloo")
+    assert (report["hidden"], report["layers"], report["batch"], report["steps"]) == (64, 2, 8, 10)
+
+    ranks = report["ranks"]
+    assert [rank["rank"] for rank in ranks] == list(range(NPROC))
+    # The slowest rank sets the total throughput
+    assert report["samples_per_sec"] == pytest.approx(NPROC * 8 * 10 / max(rank["elapsed"] for rank in ranks))
+    assert report["baseline_samples_per_sec"] > 0
+    assert report["scaling_efficiency"] == pytest.approx(
+        report["samples_per_sec"] / (NPROC * report["baseline_samples_per_sec"]))
+    step_time = report["step_time"]
+    assert 0 < step_time["p50"] <= step_time["p90"] <= step_time["p99"] <= step_time["max"]
+    for rank in ranks:
+        assert rank["samples_per_sec"] == pytest.approx(8 * 10 / rank["elapsed"])
+        assert 0 < rank["step_time_p50"] <= rank["step_time_p99"]
+        assert "step_times" not in rank and "baseline_samples_per_sec" not in rank
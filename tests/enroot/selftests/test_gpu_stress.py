@@ -0,0 +1,162 @@
+# Copyright (c) Advanced Micro Devices, Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the \"License\");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an \"AS IS\" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+import logging
+import time
+
+import pytest
+
+# gpu_stress_10s.py imports torch at module level
+gpu_stress = pytest.importorskip("gpu_stress_10s")
+
+log = logging.getLogger(__name__)
+
+
+def write_card(root, card, busy, power_uw=None, sclk=None):
+    device = root / card / "device"
+    device.mkdir(parents=True, exist_ok=True)
+    (device / "gpu_busy_percent").write_text(f"{busy}\n")
+    if power_uw is not None:
+        hwmon = device / "hwmon" / "hwmon3"
+        hwmon.mkdir(parents=True, exist_ok=True)
+        (hwmon / "power1_average").write_text(f"{power_uw}\n")
+    if sclk is not None:
+        (device / "pp_dpm_sclk").write_text(f"0: 500Mhz\n1: {sclk}Mhz *\n")
+
+
+@pytest.fixture
+def sysfs(tmp_path):
+    """
+    Fake /sys/class/drm : two GPUs, a connector entry and a card without
+    gpu_busy_percent which are both skipped
+    """
+    root = tmp_path / "drm"
+    write_card(root, "card0", 37, power_uw=250000000, sclk=2100)
+    write_card(root, "card1", 100)
+    (root / "card0-DP-1").mkdir()
+    (root / "card2" / "device").mkdir(parents=True)
+    return root
+
+
+def test_sysfs_sampler(sysfs):
+    sampler = gpu_stress.SysfsGpuSampler(str(sysfs))
+    assert sampler.open()
+    try:
+        samples = sampler.read()
+        assert [(s["card"], s["busy"]) for s in samples] == [("card0", 37), ("card1", 100)]
+        assert samples[0]["power_w"] == 250.0 and samples[0]["sclk_mhz"] == 2100
+        assert samples[1]["power_w"] is None and samples[1]["sclk_mhz"] is None
+
+        # The open fds are re-read, the new values are seen without reopening
+        write_card(sysfs, "card0", 99, power_uw=300000000, sclk=1900)
+        samples = sampler.read()
+        assert (samples[0]["busy"], samples[0]["power_w"], samples[0]["sclk_mhz"]) == (99, 300.0, 1900)
+
+        count = 2000
+        start = time.perf_counter()
+        for _ in range(count):
+            sampler.read()
+        per_sample = (time.perf_counter() - start) / count
+        log.info(f"sysfs sample of {len(samples)} GPUs : {per_sample * 1e6:.1f} us")
+        if per_sample * gpu_stress.SysfsGpuSampler.max_rate > 0.1:
+            assert False, f"a sample takes {per_sample * 1e3:.2f} ms, too slow for {gpu_stress.SysfsGpuSampler.max_rate} Hz"
+    finally:
+        sampler.close()
+
+
+def test_open_sampler_fallback(tmp_path):
+    assert isinstance(gpu_stress.open_sampler(str(tmp_path / "missing")), gpu_stress.RocmSmiSampler)
+
+
+def test_monitor_stops_after_saturation_window(sysfs, tmp_path, monkeypatch):
+    """
+    The monitor samples the fake tree and creates the stop file once every
+    GPU stayed above the threshold for the whole window
+    """
+    monkeypatch.chdir(tmp_path)
+    write_card(sysfs, "card0", 98)
+    sampler = gpu_stress.open_sampler(str(sysfs))
+    recorder = gpu_stress.UtilizationRecorder(time.time(), capacity=1000)
+    stop_file = tmp_path / "stop"
+    try:
+        start = time.time()
+        gpu_stress.monitor_thread_func(sampler, recorder, stop_time=start + 10, warmup=0, sample_rate=100,
+                                       saturation_window=0.5, stop_file=str(stop_file))
+        elapsed = time.time() - start
+    finally:
+        sampler.close()
+        gpu_stress.WROTE_EVENT.clear()
+
+    assert stop_file.exists() and recorder.stopped_at is not None
+    assert elapsed < 2, f"monitor stopped after {elapsed:.2f}s"
+    stats = recorder.summary()
+    assert [s["card"] for s in stats] == ["card0", "card1"]
+    assert all(s["min"] >= 98 and s["time_to_saturation"] is not None for s in stats)
+    # 100 Hz over the 0.5 s window
+    assert stats[0]["samples"] >= 40, f"only {stats[0]['samples']} samples"
+
+
+def test_gemm_workload_cpu():
+    """
+    A short CPU run of the GEMM load, the TFLOPS are computed from the count
+    of N x N GEMMs done in the elapsed time
+    """
+    workload = gpu_stress.GemmWorkload("cpu", dtype="fp32", size=256, streams=8, duration=0.5)
+    result = workload.run()
+    log.info(gpu_stress.format_result(result))
+
+    assert workload.streams == 1, "streams are only used on a GPU"
+    assert result["name"] == "cpu" and result["iterations"] > 0
+    assert result["elapsed"] >= 0.5
+    tflops = 2 * 256 ** 3 * result["iterations"] / result["elapsed"] / 1e12
+    assert result["tflops"] == pytest.approx(tflops, rel=0.01)
+    assert result["expected_tflops"] is None and result["efficiency"] is None
+
+
+def test_gemm_workload_stops_early():
+    calls = []
+
+    def should_stop():
+        calls.append(None)
+        return len(calls) > 3
+
+    start = time.perf_counter()
+    result = gpu_stress.GemmWorkload("cpu", size=64, duration=30).run(should_stop)
+    assert result["iterations"] == 3 and time.perf_counter() - start < 5
+
+
+def test_expected_tflops():
+    assert gpu_stress.expected_tflops("AMD Instinct MI300X", "bf16") == 1307.4
+    assert gpu_stress.expected_tflops("AMD Instinct MI300A", "fp32") == 122.6
+    assert gpu_stress.expected_tflops("cpu", "fp32") is None
+
+
+def test_gpus_of_rank():
+    assert [gpu_stress.gpus_of_rank(rank, 4, 8) for rank in range(4)] == [[0, 4], [1, 5], [2, 6], [3, 7]]
+    assert gpu_stress.gpus_of_rank(7, 8, 8) == [7]
+    # One GPU bound to every task
+    assert gpu_stress.gpus_of_rank(5, 8, 1) == [0]
+    with pytest.raises(RuntimeError, match="8 ranks on the node but only 4 GPUs"):
+        gpu_stress.gpus_of_rank(5, 8, 4)
+
+
+def test_cpu_report(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    gpu_stress.run_cpu(gpu_stress.parse_args(["--device", "cpu", "--size", "128", "--duration", "0.2"]))
+    with open(tmp_path / gpu_stress.REPORT_FILE) as f:
+        report = json.load(f)
+    assert report["world_size"] == 1 and len(report["workers"]) == 1
+    worker = report["workers"][0]
+    assert worker["gpu"] == -1 and worker["size"] == 128 and worker["iterations"] > 0
+    assert report["total_tflops"] == pytest.approx(worker["tflops"])
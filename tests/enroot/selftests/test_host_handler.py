@@ -0,0 +1,210 @@
+# Copyright (c) Advanced Micro Devices, Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the \"License\");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an \"AS IS\" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+import logging
+import os
+import threading
+import time
+
+from lib.host_handler import TIMEOUT_EXIT_CODE, LocalHostHandler, run_on_hosts
+from loopback_ssh import LoopbackSshServer
+
+log = logging.getLogger(__name__)
+
+COMMAND_SECONDS = 0.3
+
+
+def test_fan_out_latency(loopback_server):
+    """
+    One event loop drives all the hosts, the fan-out latency stays close to
+    a single command while the sequential loop grows with the host count
+    """
+    hosts = [loopback_server.connect() for _ in range(8)]
+    try:
+        for count in (1, 2, 4, 8):
+            start = time.monotonic()
+            for host in hosts[:count]:
+                assert host.run_command(f"sleep {COMMAND_SECONDS}").exit_code == 0
+            sequential = time.monotonic() - start
+
+            start = time.monotonic()
+            results = asyncio.run(run_on_hosts(hosts[:count], f"sleep {COMMAND_SECONDS}; hostname"))
+            fan_out = time.monotonic() - start
+            log.info(f"{count} hosts : sequential {sequential:.2f}s, fan-out {fan_out:.2f}s")
+
+            assert all(result.exit_code == 0 and result.stdout.strip() for result in results)
+            assert fan_out < 2 * COMMAND_SECONDS, f"fan-out over {count} hosts took {fan_out:.2f}s"
+            # At least count / 2 times faster than one host after the other
+            if count > 1:
+                assert fan_out * count / 2 < sequential, f"fan-out {fan_out:.2f}s against sequential {sequential:.2f}s"
+    finally:
+        for host in hosts:
+            host.close()
+
+
+def test_run_many_on_one_host(loopback_server):
+    host = loopback_server.connect()
+    try:
+        start = time.monotonic()
+        results = asyncio.run(host.run_many([f"sleep {COMMAND_SECONDS}; echo {i}" for i in range(4)]))
+        elapsed = time.monotonic() - start
+        assert [result.stdout.strip() for result in results] == ["0", "1", "2", "3"]
+        assert elapsed < 2 * COMMAND_SECONDS, f"4 commands on one host took {elapsed:.2f}s"
+    finally:
+        host.close()
+
+
+def test_output_after_exit_status(tmp_path):
+    """
+    The server sends the exit status before the output, no output is lost
+    """
+    with LoopbackSshServer(tmp_path, exit_status_first=True) as server:
+        host = server.connect()
+        try:
+            result = host.run_command("seq 1 20000; echo done >&2; exit 3")
+            assert result.exit_code == 3
+            assert result.stdout.split() == [str(i) for i in range(1, 20001)]
+            assert result.stderr == "done\n"
+
+            exit_code, output = host.execute_command("echo last")
+            assert (exit_code, output["stdout"]) == (0, "last\n")
+
+            lines = []
+            result = host.execute_command_stream("echo one; echo two", on_line=lambda stream, line: lines.append(line))
+            assert result.exit_code == 0 and lines == ["one", "two"]
+
+            results = host.execute_batch(["echo a", "echo b"])
+            assert [(r.exit_code, r.stdout) for r in results] == [(0, "a\n"), (0, "b\n")]
+        finally:
+            host.close()
+
+
+def test_command_timeout(loopback_server):
+    """
+    A hung command returns once its timeout expired, with the output received so far
+    """
+    host = loopback_server.connect()
+    try:
+        result = host.run_command("echo started; sleep 5", timeout=0.5)
+        assert (result.exit_code, result.stdout) == (TIMEOUT_EXIT_CODE, "started\n")
+        assert result.duration < 2, f"run_command returned after {result.duration:.2f}s"
+
+        result = host.execute_command_stream("echo started; sleep 5", timeout=0.5)
+        assert (result.exit_code, result.stdout) == (TIMEOUT_EXIT_CODE, "started")
+        assert result.duration < 2, f"execute_command_stream returned after {result.duration:.2f}s"
+
+        start = time.monotonic()
+        results = host.execute_batch(["echo a", "sleep 5", "echo c"], timeout=1)
+        elapsed = time.monotonic() - start
+        assert [(r.command, r.exit_code, r.stdout) for r in results] == [
+            ("echo a", 0, "a\n"), ("sleep 5", TIMEOUT_EXIT_CODE, "")]
+        assert elapsed < 3, f"execute_batch returned after {elapsed:.2f}s"
+
+        # The connection is still usable
+        assert host.run_command("echo ok", timeout=5).stdout == "ok\n"
+    finally:
+        host.close()
+
+
+def test_local_command_timeout(tmp_path):
+    result = LocalHostHandler(tmp_path).run_command("sleep 5", timeout=0.5)
+    assert result.exit_code == TIMEOUT_EXIT_CODE and result.duration < 2
+
+
+def test_execute_batch(loopback_server, tmp_path):
+    """
+    Every command of a batch gets its own exit code, stdout and stderr, whatever they contain
+    """
+    host = loopback_server.connect()
+    try:
+        commands = [
+            "true",
+            "echo out; echo err >&2; exit 3",
+            # Output looking like the batch headers, without a trailing newline
+            "printf '__BATCH_0123456789abcdef__ 0 0 0 0 0\\n__BATCH_ 1 2 3 4 5'",
+            "printf 'caf\\303\\251\\n'; cat",
+            "false",
+        ]
+        results = host.execute_batch(commands, stop_on_failure=False)
+        assert [(r.command, r.exit_code, r.stdout, r.stderr) for r in results] == [
+            ("true", 0, "", ""),
+            (commands[1], 3, "out\n", "err\n"),
+            (commands[2], 0, "__BATCH_0123456789abcdef__ 0 0 0 0 0\n__BATCH_ 1 2 3 4 5", ""),
+            # Lengths are in bytes, stdin is /dev/null
+            (commands[3], 0, "café\n", ""),
+            ("false", 1, "", ""),
+        ]
+        assert all(r.duration >= 0 for r in results)
+
+        marker = tmp_path / "not_run"
+        results = host.execute_batch(["echo a", "exit 2", f"touch {marker}"])
+        assert [(r.command, r.exit_code) for r in results] == [("echo a", 0), ("exit 2", 2)]
+        assert not marker.exists(), "the batch went on after the failing command"
+
+        assert host.execute_batch([]) == []
+    finally:
+        host.close()
+
+
+def test_read_remote_from(loopback_server, tmp_path):
+    host = loopback_server.connect()
+    remote = os.path.join(loopback_server.root, "growing.log")
+    try:
+        with open(tmp_path / "local.log", "wb") as out:
+            assert host.read_remote_from(remote, 0, out) == 0, "missing file"
+            with open(remote, "wb") as f:
+                f.write(b"first\n")
+            offset = host.read_remote_from(remote, 0, out)
+            assert offset == 6
+            assert host.read_remote_from(remote, offset, out) == 6, "nothing new"
+            with open(remote, "ab") as f:
+                f.write(b"second\n")
+            offset = host.read_remote_from(remote, offset, out)
+            assert offset == 13
+            # Truncated and written again
+            with open(remote, "wb") as f:
+                f.write(b"new\n")
+            assert host.read_remote_from(remote, offset, out) == 4
+        assert (tmp_path / "local.log").read_bytes() == b"first\nsecond\nnew\n"
+    finally:
+        host.close()
+
+
+def test_run_with_log(loopback_server, tmp_path):
+    """
+    The log is copied while the command runs and the call returns its exit code
+    """
+    host = loopback_server.connect()
+    remote = os.path.join(loopback_server.root, "run.log")
+    local = tmp_path / "run.log"
+    result = {}
+    command = "echo first; sleep 1.5; echo second >&2; exit 4"
+    runner = threading.Thread(target=lambda: result.update(
+        exit_code=host.run_with_log(command, remote, local, poll_interval=0.1)))
+    try:
+        runner.start()
+        deadline = time.monotonic() + 5
+        while not (local.exists() and local.read_bytes()):
+            assert time.monotonic() < deadline, "the log was not copied while the command ran"
+            time.sleep(0.05)
+        assert runner.is_alive() and local.read_bytes() == b"first\n"
+        runner.join(10)
+        assert result["exit_code"] == 4
+        assert local.read_bytes() == b"first\nsecond\n"
+
+        start = time.monotonic()
+        assert host.run_with_log("sleep 5", remote, local, poll_interval=0.1, timeout=0.5) == 1
+        assert time.monotonic() - start < 2
+    finally:
+        host.close()
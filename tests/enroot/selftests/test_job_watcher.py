@@ -0,0 +1,143 @@
+# Copyright (c) Advanced Micro Devices, Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the \"License\");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an \"AS IS\" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import threading
+from concurrent.futures import TimeoutError
+
+import pytest
+
+from lib.host_handler import CommandResult
+from lib.job_watcher import JobStatus, JobWatcher, parse_sacct, parse_squeue
+
+
+class FakeHeadnode:
+    """
+    Head node answering the batched sacct/squeue query of JobWatcher.poll_once,
+    a job is RUNNING until the poll number given in end_at, COMPLETED afterwards
+    """
+    def __init__(self, end_at, on_poll=None):
+        self.end_at = end_at
+        self.on_poll = on_poll
+        self.polls = 0
+
+    def execute_batch(self, commands, stop_on_failure=True, timeout=None):
+        self.polls += 1
+        if self.on_poll is not None:
+            self.on_poll(self.polls)
+        sacct, squeue = [], []
+        for job_id, end_at in self.end_at.items():
+            if end_at is not None and self.polls >= end_at:
+                sacct += [f"{job_id}|COMPLETED|0:0|00:01:40", f"{job_id}.batch|COMPLETED|0:0|00:01:40"]
+            elif end_at is not None:
+                sacct.append(f"{job_id}|RUNNING|0:0|00:00:10")
+                squeue.append(f"{job_id}|RUNNING")
+            else:
+                # Not known to sacct yet
+                squeue.append(f"{job_id}|PENDING")
+        return [CommandResult(commands[0], 0, "\n".join(sacct) + "\n", "", 0.01),
+                CommandResult(commands[1], 0, "\n".join(squeue) + "\n", "", 0.01)]
+
+
+class RecordingEvent(threading.Event):
+    """
+    Wakeup event of the watcher thread recording the poll intervals instead of
+    sleeping, the thread stops once it has no job left
+    """
+    def __init__(self, watcher):
+        super().__init__()
+        self.watcher = watcher
+        self.intervals = []
+
+    def wait(self, timeout=None):
+        if timeout is None:
+            self.watcher._stop.set()
+            return True
+        self.intervals.append(timeout)
+        return self.is_set()
+
+
+def test_parse_sacct():
+    output = ("101|COMPLETED|0:0|00:01:40\n"
+              "101.batch|COMPLETED|0:0|00:01:40\n"
+              "101.extern|COMPLETED|0:0|00:01:40\n"
+              "101.0|FAILED|1:0|00:01:30\n"
+              "\n"
+              "102|CANCELLED by 1000|0:15|00:00:07\n"
+              "103|PENDING|0:0|00:00:00\n")
+    jobs = parse_sacct(output)
+    assert sorted(jobs) == ["101", "102", "103"]
+    assert (jobs["101"]["state"], jobs["101"]["exit_code"], jobs["101"]["elapsed"]) == ("COMPLETED", "0:0", "00:01:40")
+    assert jobs["101"]["steps"] == {"batch": "COMPLETED", "extern": "COMPLETED", "0": "FAILED"}
+    assert len(jobs["101"]["lines"]) == 4
+    assert (jobs["102"]["state"], jobs["102"]["exit_code"]) == ("CANCELLED", "0:15")
+    assert jobs["103"]["state"] == "PENDING" and jobs["103"]["steps"] == {}
+
+
+def test_parse_squeue():
+    assert parse_squeue("101|RUNNING\n 102|PENDING \n\nsqueue: error: invalid job id\n") == {
+        "101": "RUNNING", "102": "PENDING"}
+
+
+def test_poll_backoff():
+    """
+    The poll interval grows by 1.5 from 2 s up to 30 s while nothing changes,
+    a job ending or a new job brings it back to 2 s
+    """
+    headnode = FakeHeadnode({"101": 3, "102": 12})
+    watcher = JobWatcher(headnode)
+    watcher._wakeup = RecordingEvent(watcher)
+    # The first poll waits until both jobs are watched
+    watched = threading.Event()
+    headnode.on_poll = lambda poll: poll == 1 and watched.wait(5)
+    futures = {job_id: watcher.watch(job_id) for job_id in ("101", "102")}
+    watched.set()
+    watcher._thread.join(5)
+    assert not watcher._thread.is_alive()
+
+    assert watcher._wakeup.intervals == [
+        # Woken up by watch(), the next interval starts again at 2 s
+        3,
+        3,
+        # 101 ended
+        2,
+        3, 4.5, 6.75, 10.125, 15.1875, 22.78125, 30, 30,
+        # 102 ended
+        2,
+    ]
+    results = watcher.wait(futures, timeout=0)
+    assert results["101"] == JobStatus("101", "COMPLETED", "0:0", "00:01:40", {"batch": "COMPLETED"},
+                                       "101|COMPLETED|0:0|00:01:40\n101.batch|COMPLETED|0:0|00:01:40")
+    assert results["102"].state == "COMPLETED"
+
+
+def test_job_timeout():
+    """
+    A job which does not end in time fails with TimeoutError, stop() fails the jobs still watched
+    """
+    watcher = JobWatcher(FakeHeadnode({"201": 2, "202": None, "203": None}), min_interval=0.01, max_interval=0.05)
+    ended = []
+    futures = {
+        "201": watcher.watch("201", callback=ended.append),
+        "202": watcher.watch("202", callback=ended.append, timeout=0),
+    }
+    assert futures["201"].result(5).state == "COMPLETED"
+    with pytest.raises(TimeoutError):
+        futures["202"].result(5)
+    # The callback only runs for the jobs which ended
+    assert [status.job_id for status in ended] == ["201"]
+
+    future = watcher.watch("203")
+    watcher.stop()
+    with pytest.raises(TimeoutError, match="stopped"):
+        future.result(0)
+    assert not watcher._thread.is_alive()
@@ -0,0 +1,171 @@
+# Copyright (c) Advanced Micro Devices, Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the \"License\");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an \"AS IS\" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+import os
+import threading
+import time
+
+from lib.nccl_log import NcclLogAnalyzer, follow_remote_log, transport_of
+
+# RCCL debug log of two ranks on node1 and a rank of node2 falling back to sockets
+LOG = """\
+node1:1234:1234 [0] NCCL INFO NCCL_PROTO set by environment to Simple
+node1:1234:1234 [0] NCCL INFO NET/IB : Using [0]mlx5_0:1/RoCE [1]mlx5_1:1/RoCE ; OOB eth0:10.0.0.1<0>
+node1:1234:1234 [0] NCCL INFO Using network IB
+node1:1235:1235 [1] NCCL INFO NET/IB : Using [0]mlx5_2:1/RoCE ; OOB eth0:10.0.0.1<0>
+node1:1235:1235 [1] NCCL INFO Using network IB
+node1:1234:1300 [0] NCCL INFO Channel 00/24 :    0   1   2
+node1:1234:1300 [0] NCCL INFO Channel 01/24 :    0   1   2
+node1:1234:1300 [0] NCCL INFO Trees [0] 1/-1/-1->0->-1 [1] 1/-1/-1->0->-1
+node1:1234:1300 [0] NCCL INFO 24 coll channels, 0 collnet channels, 0 nvls channels, 32 p2p channels, 32 p2p channels per peer
+node1:1234:1300 [0] NCCL INFO Channel 00/0 : 0[0] -> 1[1] via P2P/IPC
+node1:1234:1300 [0] NCCL INFO Channel 01/0 : 0[0] -> 1[1] via P2P/IPC
+node1:1235:1301 [1] NCCL INFO Channel 00/0 : 1[1] -> 2[0] [send] via NET/IB/0/GDRDMA
+node1:1234:1300 [0] NCCL INFO comm 0x55d0 rank 0 nranks 3 cudaDev 0 busId c000 commId 0x1a - Init COMPLETE
+node1:1235:1301 [1] NCCL INFO comm 0x55d1 rank 1 nranks 3 cudaDev 1 busId 22000 commId 0x1a - Init COMPLETE
+node1:1234:1300 [0] NCCL INFO Init timings - ncclCommInitRank: rank 0 nranks 3 total 0.52 (kernels 0.10, alloc 0.01, bootstrap 0.20)
+node2:2000:2000 [0] NCCL INFO NET/Socket : Using [0]eth0:10.0.0.2<0>
+node2:2000:2000 [0] NCCL INFO Using network Socket
+node2:2000:2000 [0] NCCL WARN NET/IB : No device found.
+node2:2000:2100 [0] NCCL INFO Init timings - ncclCommInitRank: rank 2 nranks 3 total 1.75 (kernels 0.12)
+"""
+
+
+def analyze(text, **kwargs):
+    analyzer = NcclLogAnalyzer(**kwargs)
+    for line in text.splitlines():
+        analyzer.feed(line)
+    return analyzer
+
+
+def test_transport_of():
+    assert transport_of("P2P/IPC") == "P2P"
+    assert transport_of("SHM/direct/direct") == "SHM"
+    assert transport_of("NET/IB/0/GDRDMA") == "NET/IB"
+    assert transport_of("NET/Socket/1") == "NET/Socket"
+
+
+def test_report():
+    report = analyze(LOG).report()
+    assert report["lines"] == len(LOG.splitlines())
+    assert list(report["ranks"]) == ["0", "1", "2"]
+    rank0, rank1, rank2 = (report["ranks"][rank] for rank in ("0", "1", "2"))
+
+    # NICs of every rank
+    assert rank0["nics"] == [{"device": "mlx5_0", "port": 1, "type": "RoCE"}, {"device": "mlx5_1", "port": 1, "type": "RoCE"}]
+    assert rank1["nics"] == [{"device": "mlx5_2", "port": 1, "type": "RoCE"}]
+    assert rank2["nics"] == []
+    assert report["devices"] == ["mlx5_0:1", "mlx5_1:1", "mlx5_2:1"]
+    assert [rank["network"] for rank in (rank0, rank1, rank2)] == ["IB", "IB", "Socket"]
+    assert [(rank["host"], rank["pid"], rank["cuda_dev"]) for rank in (rank0, rank1, rank2)] == [
+        ("node1", 1234, 0), ("node1", 1235, 1), ("node2", 2000, 0)]
+
+    assert (rank0["rings"], rank0["trees"], rank0["coll_channels"], rank0["p2p_channels"]) == (2, 2, 24, 32)
+    assert rank0["transports"] == {"P2P": 2} and rank1["transports"] == {"NET/IB": 1}
+    assert report["transports"] == {"P2P": 2, "NET/IB": 1}
+    assert rank0["init_time"] == 0.52
+    assert rank0["init_breakdown"] == {"kernels": 0.10, "alloc": 0.01, "bootstrap": 0.20}
+    assert report["max_init_time"] == 1.75
+    assert (report["protocol"], report["algorithm"]) == ("Simple", None)
+    assert report["warnings"] == ["node2:2000:2000 [0] NCCL WARN NET/IB : No device found."]
+
+
+def test_socket_fallback_callback():
+    calls = []
+    analyzer = analyze(LOG, on_socket_fallback=calls.append)
+    # Called once, with the first line of the fallback
+    assert calls == ["node2:2000:2000 [0] NCCL INFO NET/Socket : Using [0]eth0:10.0.0.2<0>"]
+    assert analyzer.socket_fallback
+    assert analyzer.report()["socket_lines"] == [
+        "node2:2000:2000 [0] NCCL INFO NET/Socket : Using [0]eth0:10.0.0.2<0>",
+        "node2:2000:2000 [0] NCCL INFO Using network Socket",
+    ]
+
+    calls = []
+    analyzer = analyze("\n".join(LOG.splitlines()[:15]), on_socket_fallback=calls.append)
+    assert calls == [] and not analyzer.socket_fallback
+
+
+def test_from_file(tmp_path):
+    log_file = tmp_path / "rccl.log"
+    log_file.write_text(LOG)
+    assert NcclLogAnalyzer.from_file(log_file).report() == analyze(LOG).report()
+
+    empty = tmp_path / "empty.log"
+    empty.write_text("")
+    assert NcclLogAnalyzer.from_file(empty).report()["lines"] == 0
+
+    analyzer = NcclLogAnalyzer.from_file(log_file)
+    analyzer.write_report(tmp_path / "report.json")
+    with open(tmp_path / "report.json") as f:
+        assert json.load(f)["ranks"]["1"]["rings"] == 0
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            assert False, "condition not met in time"
+        time.sleep(0.05)
+
+
+def test_follow_remote_log(loopback_server):
+    """
+    The log is analyzed while it is written, the file does not exist when the follow starts
+    """
+    host = loopback_server.connect()
+    remote = os.path.join(loopback_server.root, "follow.log")
+    lines = LOG.splitlines(keepends=True)
+    calls = []
+    analyzer = NcclLogAnalyzer(on_socket_fallback=calls.append)
+    stop = threading.Event()
+    follower = threading.Thread(target=follow_remote_log, args=(host, remote, analyzer, stop))
+    follower.start()
+    try:
+        time.sleep(0.5)
+        with open(remote, "w") as f:
+            f.writelines(lines[:10])
+            f.flush()
+            wait_for(lambda: analyzer.lines == 10)
+            assert calls == []
+            f.writelines(lines[10:])
+        wait_for(lambda: analyzer.lines == len(lines))
+        assert len(calls) == 1
+        stop.set()
+        follower.join(10)
+        assert not follower.is_alive(), "follow_remote_log did not return once stopped"
+        assert analyzer.report() == analyze(LOG).report()
+    finally:
+        stop.set()
+        host.close()
+
+
+def test_follow_remote_log_job_ended(loopback_server):
+    """
+    With a job id the follow returns by itself once the job left the queue
+    """
+    host = loopback_server.connect()
+    remote = os.path.join(loopback_server.root, "job.log")
+    with open(remote, "w") as f:
+        f.write(LOG)
+    analyzer = NcclLogAnalyzer()
+    try:
+        # No squeue here, the job is gone at the first check
+        start = time.monotonic()
+        result = follow_remote_log(host, remote, analyzer, threading.Event(), job_id="301")
+        assert time.monotonic() - start < 10
+        assert result.exit_code == 0
+        assert analyzer.lines == len(LOG.splitlines())
+    finally:
+        host.close()
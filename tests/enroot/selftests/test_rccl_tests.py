@@ -0,0 +1,96 @@
+# Copyright (c) Advanced Micro Devices, Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the \"License\");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an \"AS IS\" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import pytest
+
+from lib.rccl_tests import (compare_to_baseline, load_baseline, parse_rccl_row, parse_rccl_tests, wrong_rows,
+                            write_results)
+
+# all_reduce_perf output as written by rccl_tests_sbatch.sh, the binary name is not printed
+OUTPUT = """\
+# nThread 1 nGpus 8 minBytes 16 maxBytes 8589934592 step: 2(factor) warmup iters: 5 iters: 20 agg iters: 1 validation: 1 graph: 0
+#
+# Using devices
+#  Rank  0 Group  0 Pid  41234 on      node1 device  0 [0000:0c:00] AMD Instinct MI300X
+#  Rank  1 Group  0 Pid  41234 on      node1 device  1 [0000:22:00] AMD Instinct MI300X
+#
+#                                                              out-of-place                       in-place
+#       size         count      type   redop    root     time   algbw   busbw #wrong     time   algbw   busbw #wrong
+#        (B)    (elements)                               (us)  (GB/s)  (GB/s)            (us)  (GB/s)  (GB/s)
+          16             4     float     sum      -1    31.12    0.00    0.00      0    30.81    0.00    0.00      0
+     1048576        262144     float     sum      -1    58.40   17.95   31.42      0    57.90   18.11   31.69      0
+  1073741824     268435456     float     sum      -1   6821.2  157.41  275.47      0   6810.4  157.66  275.91    N/A
+  8589934592    2147483648     float     sum      -1  54211.3  158.45  277.29      3  54200.1  158.48  277.34      0
+# Out of bounds values : 0 OK
+# Avg bus bandwidth    : 107.6425
+#
+"""
+
+
+def test_parse_rccl_row():
+    row = parse_rccl_row("     1048576        262144     float     sum      -1    58.40   17.95   31.42      0    57.90   18.11   31.69      0")
+    assert (row.size, row.count, row.type, row.redop, row.root) == (1048576, 262144, "float", "sum", -1)
+    assert (row.oop_time, row.oop_algbw, row.oop_busbw, row.oop_wrong) == (58.40, 17.95, 31.42, 0)
+    assert (row.ip_time, row.ip_algbw, row.ip_busbw, row.ip_wrong) == (57.90, 18.11, 31.69, 0)
+    # alltoall style table without redop and root
+    row = parse_rccl_row("  1024  256  float  12.1  0.08  0.07  0  12.0  0.09  0.07  0")
+    assert (row.size, row.type, row.redop, row.root, row.ip_busbw) == (1024, "float", "", -1, 0.07)
+    for line in ("#       size         count      type", "# Avg bus bandwidth    : 107.6425", "",
+                 "srun: error: node2: task 3: Exited with exit code 1", "16 4 float sum -1 x y z 0 1 2 3 0"):
+        assert parse_rccl_row(line) is None, line
+
+
+def test_parse_rccl_tests():
+    results = parse_rccl_tests(OUTPUT, collective="all_reduce")
+    assert results["collective"] == "all_reduce"
+    assert [row.size for row in results["rows"]] == [16, 1048576, 1073741824, 8589934592]
+    assert results["avg_busbw"] == pytest.approx(107.6425)
+    assert results["out_of_bounds"] == 0
+    # #wrong is N/A when the data check is disabled
+    assert results["rows"][2].ip_wrong is None
+
+
+def test_collective_name():
+    # Not printed by the binary, only found when the command line is in the log
+    assert parse_rccl_tests(OUTPUT)["collective"] is None
+    echoed = "+ /root/rccl-tests/build/all_gather_perf -b 16 -e 8G -f 2 -g 8\n" + OUTPUT
+    assert parse_rccl_tests(echoed)["collective"] == "all_gather"
+    assert parse_rccl_tests(echoed, collective="all_reduce")["collective"] == "all_reduce"
+
+
+def test_wrong_rows():
+    results = parse_rccl_tests(OUTPUT, collective="all_reduce")
+    assert [row.size for row in wrong_rows(results)] == [8589934592]
+
+
+def test_compare_to_baseline(tmp_path):
+    results = parse_rccl_tests(OUTPUT, collective="all_reduce")
+    baseline_file = tmp_path / "testbed_all_reduce.json"
+    write_results(results, baseline_file)
+    baseline = load_baseline(baseline_file)
+    assert baseline[1073741824] == {"oop_busbw": 275.47, "ip_busbw": 275.91}
+    assert compare_to_baseline(results, baseline) == []
+
+    # 20% lower in-place busbw at 1 GB, 5% lower out-of-place busbw at 8 GB and a missing size
+    baseline[1073741824]["ip_busbw"] = 275.91 / 0.8
+    baseline[8589934592]["oop_busbw"] = 277.29 / 0.95
+    baseline[4096] = {"oop_busbw": 1.0, "ip_busbw": 1.0}
+    regressions = compare_to_baseline(results, baseline, threshold=0.1)
+    assert len(regressions) == 2
+    assert regressions[0] == "size 4096: missing from the results"
+    assert regressions[1].startswith("size 1073741824: ip_busbw 275.91 GB/s is 20.0% below")
+    assert len(compare_to_baseline(results, baseline, threshold=0.01)) == 3
+
+    # A zero busbw in the baseline (small sizes) is not compared
+    assert compare_to_baseline(results, {16: {"oop_busbw": 0.0, "ip_busbw": 0.0}}) == []
+    assert load_baseline(tmp_path / "missing.json") is None
@@ -0,0 +1,49 @@
+# Copyright (c) Advanced Micro Devices, Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the \"License\");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an \"AS IS\" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import pytest
+
+from lib.results_index import ResultsIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = ResultsIndex(tmp_path / "results.db")
+    # tb-a ran on days 1-3, tb-b on days 4-6, every run on two hosts
+    rows = []
+    for day in range(1, 7):
+        testbed = "tb-a" if day <= 3 else "tb-b"
+        for host in ("node1", "node2"):
+            rows.append((f"results-2026-01-0{day}_10-00-00", testbed, host, "test_multi_node_rccl",
+                         "avg_busbw", float(day), "rccl_results.json"))
+    with index.db:
+        index.db.executemany("INSERT INTO metrics VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+    yield index
+    index.close()
+
+
+def test_trend_last_runs_of_the_testbed(index):
+    """
+    The last runs are the last runs of the filtered testbed, not the last
+    runs of any testbed
+    """
+    rows = index.trend("avg_busbw", testbed="tb-a", last=2)
+    assert [(row["run"][:18], row["host"]) for row in rows] == [
+        ("results-2026-01-02", "node1"), ("results-2026-01-02", "node2"),
+        ("results-2026-01-03", "node1"), ("results-2026-01-03", "node2")]
+
+
+def test_trend_host_filter(index):
+    rows = index.trend("avg_busbw", host="node2", last=3)
+    assert [row["value"] for row in rows] == [4.0, 5.0, 6.0]
+    assert index.trend("avg_busbw", testbed="tb-c") == []
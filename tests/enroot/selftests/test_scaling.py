@@ -0,0 +1,118 @@
+# Copyright (c) Advanced Micro Devices, Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the \"License\");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an \"AS IS\" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+import os
+import sys
+
+import pytest
+
+from lib.host_handler import LocalHostHandler
+from lib.scaling import RESULTS_DIR, ScalingSweep, format_table, scaling_matrix, write_report
+
+# Stand-in sbatch : every job ends at once, the 2x2 job fails, the others write
+# the result files of distributed_pytorch.py with a 10% loss per extra node
+SBATCH = """#!{python}
+import json, os, sys
+
+args = dict(a[2:].split("=", 1) for a in sys.argv[1:] if a.startswith("--") and "=" in a)
+nodes, ranks = int(args["nodes"]), int(args["ntasks-per-node"])
+job_id = str(101 + sum(1 for _ in open("jobs.txt")) if os.path.exists("jobs.txt") else 101)
+dist_args = os.environ.get("DIST_PYTORCH_ARGS", "").split()
+state = "FAILED" if (nodes, ranks) == (2, 2) else "COMPLETED"
+with open("jobs.txt", "a") as f:
+    f.write(json.dumps({{"job_id": job_id, "state": state, "argv": sys.argv[1:], "dist_args": dist_args}}) + "\\n")
+if state == "COMPLETED":
+    world = nodes * ranks
+    batch = int(dist_args[dist_args.index("--ddp-batch") + 1]) if "--ddp-batch" in dist_args else 64
+    eff = 0.9 ** (nodes - 1)
+    with open(f"{results}/collective_sweep_{{job_id}}.json", "w") as f:
+        json.dump({{"results": [{{"collective": "all_reduce", "size": 1 << 20, "busbw": 1.0}},
+                               {{"collective": "all_reduce", "size": 1 << 30, "busbw": 100.0 * eff}}]}}, f)
+    with open(f"{results}/ddp_throughput_{{job_id}}.json", "w") as f:
+        json.dump({{"samples_per_sec": 10.0 * world * batch * eff, "step_time": {{"p50": 0.1}}}}, f)
+print(job_id)
+"""
+
+# Stand-in sacct : every submitted job with its final state
+SACCT = """#!/bin/bash
+python3 -c '
+import json
+for line in open("jobs.txt"):
+    job = json.loads(line)
+    print("|".join([job["job_id"], job["state"], "0:0" if job["state"] == "COMPLETED" else "1:0", "00:00:05"]))
+'
+"""
+
+
+@pytest.fixture
+def slurm(tmp_path, monkeypatch):
+    """
+    Work directory of LocalHostHandler with stub sbatch, sacct and squeue first in the PATH
+    """
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    stubs = {"sbatch": SBATCH.format(python=sys.executable, results=RESULTS_DIR), "sacct": SACCT,
+             "squeue": "#!/bin/bash\ntrue\n"}
+    for name, text in stubs.items():
+        (bin_dir / name).write_text(text)
+        (bin_dir / name).chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    workdir = tmp_path / "work"
+    (workdir / RESULTS_DIR).mkdir(parents=True)
+    return workdir
+
+
+def submitted(workdir):
+    with open(workdir / "jobs.txt") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_weak_scaling_sweep(slurm, tmp_path):
+    configs = scaling_matrix(2, 2)
+    sweep = ScalingSweep(LocalHostHandler(slurm), "distributed_pytorch_sbatch.sh", configs, job_timeout=60)
+    rows = sweep.run()
+
+    jobs = submitted(slurm)
+    assert len(jobs) == 4
+    for job in jobs:
+        if "--exclusive" not in job["argv"]:
+            assert False, f"job {job['job_id']} not submitted on exclusive nodes : {job['argv']}"
+        assert job["dist_args"] == ["--sweep", "--ddp"]
+
+    assert [row["config"] for row in rows] == ["1x1", "1x2", "2x1", "2x2"]
+    assert [row["state"] for row in rows] == ["COMPLETED", "COMPLETED", "COMPLETED", "FAILED"]
+    by_config = {row["config"]: row for row in rows}
+    assert by_config["1x2"]["speedup"] == pytest.approx(2.0)
+    assert by_config["1x2"]["throughput_efficiency"] == pytest.approx(1.0)
+    assert by_config["2x1"]["throughput_efficiency"] == pytest.approx(0.9)
+    assert by_config["2x1"]["busbw_efficiency"]["all_reduce"] == pytest.approx(0.9)
+    assert by_config["2x2"]["samples_per_sec"] is None and by_config["2x2"]["speedup"] is None
+
+    write_report(rows, tmp_path)
+    with open(tmp_path / "scaling_report.json") as f:
+        assert len(json.load(f)["rows"]) == 4
+    assert len(format_table(rows)) == 5
+
+
+def test_strong_scaling_splits_the_global_batch(slurm):
+    configs = scaling_matrix(2, 1)
+    sweep = ScalingSweep(LocalHostHandler(slurm), "distributed_pytorch_sbatch.sh", configs, mode="strong",
+                         global_batch=256, job_timeout=60)
+    rows = sweep.run()
+
+    assert [job["dist_args"][-2:] for job in submitted(slurm)] == [["--ddp-batch", "256"], ["--ddp-batch", "128"]]
+    # The stub throughput follows the global batch, which is the same for both jobs,
+    # so only the 10% loss of the second node is left
+    assert rows[1]["speedup"] == pytest.approx(0.9)
+    assert rows[1]["throughput_efficiency"] == pytest.approx(0.45)
@@ -0,0 +1,119 @@
+# Copyright (c) Advanced Micro Devices, Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the \"License\");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an \"AS IS\" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import filecmp
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from loopback_ssh import LoopbackSshServer
+
+log = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+SIZE = 64 * MB
+
+
+@pytest.fixture(scope="module")
+def host(loopback_server):
+    host = loopback_server.connect()
+    yield host
+    host.close()
+
+
+@pytest.fixture(scope="module")
+def payload(tmp_path_factory):
+    path = tmp_path_factory.mktemp("payload") / "payload.bin"
+    with open(path, "wb") as f:
+        f.write(os.urandom(SIZE))
+    return path
+
+
+def test_sftp_throughput(host, payload, loopback_server, tmp_path):
+    """
+    Round trip of a 64 MB file, the throughput of both directions is logged
+    """
+    remote = os.path.join(loopback_server.root, "throughput.bin")
+    start = time.monotonic()
+    assert host.copy_to_host(str(payload), remote) == 0
+    upload = time.monotonic() - start
+
+    local = tmp_path / "throughput.bin"
+    start = time.monotonic()
+    assert host.copy_from_host(remote, str(local)) == 0
+    download = time.monotonic() - start
+
+    log.info(f"copy_to_host : {SIZE / MB / upload:.1f} MB/s, copy_from_host : {SIZE / MB / download:.1f} MB/s")
+    if not filecmp.cmp(payload, local, shallow=False):
+        assert False, "copied file differs from the original"
+
+
+def test_sftp_transfers_not_serialized(host, payload, loopback_server, tmp_path):
+    """
+    A small copy started while a large one is running finishes first, the
+    transfers share the SFTP session without waiting for each other
+    """
+    remote = os.path.join(loopback_server.root, "large.bin")
+    small = tmp_path / "small.txt"
+    small.write_text("small file\n")
+    done = {}
+
+    def large_copy():
+        done["large_exit"] = host.copy_to_host(str(payload), remote)
+        done["large"] = time.monotonic()
+
+    thread = threading.Thread(target=large_copy)
+    thread.start()
+    # Wait for the large transfer to be under way
+    while not os.path.exists(remote) or os.path.getsize(remote) < MB:
+        if not thread.is_alive():
+            break
+        time.sleep(0.01)
+    assert host.copy_to_host(str(small), os.path.join(loopback_server.root, "small.txt")) == 0
+    done["small"] = time.monotonic()
+    thread.join()
+
+    assert done["large_exit"] == 0
+    if done["small"] >= done["large"]:
+        assert False, "small copy waited for the large copy to finish"
+
+
+def test_sftp_sessions_bounded(tmp_path):
+    """
+    Many concurrent transfers share the long-lived session and short-lived
+    sessions taken from the channel slots, no session is left behind
+    """
+    payload = tmp_path / "payload.bin"
+    payload.write_bytes(os.urandom(4 * MB))
+    with LoopbackSshServer(tmp_path) as server:
+        host = server.connect(max_channels=4)
+        try:
+            with ThreadPoolExecutor(max_workers=12) as executor:
+                exits = list(executor.map(lambda i: host.copy_to_host(str(payload), f"copy{i}.bin"), range(24)))
+            assert exits == [0] * 24
+            assert all(os.path.getsize(tmp_path / f"copy{i}.bin") == 4 * MB for i in range(24))
+
+            # The server ends a session shortly after the client closed it
+            deadline = time.monotonic() + 5
+            while server.sftp_sessions > 1 and time.monotonic() < deadline:
+                time.sleep(0.05)
+            log.info(f"SFTP sessions : peak {server.sftp_sessions_peak}, left open {server.sftp_sessions}")
+            assert server.sftp_sessions == 1, "only the long-lived session stays open"
+            if server.sftp_sessions_peak > host.max_channels + 1:
+                assert False, f"{server.sftp_sessions_peak} SFTP sessions open at once"
+        finally:
+            host.close()
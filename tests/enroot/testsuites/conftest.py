@@ -12,6 +12,7 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import json
 import logging
 import pytest
 import os
@@ -35,6 +36,7 @@ class testcache(object):
     host_type = {}
     testbed = {}
     results_dir = ""
+    run_info = {}
     slurm_version = ""
     enroot_version = ""
     slurm_ip = ""
@@ -45,13 +47,63 @@ def pytest_configure(config):
     pytest.testbed_dir = config.getoption("--testbed")
     pytest.no_install = config.getoption("--no-install")
     pytest.no_uninstall = config.getoption("--no-uninstall")
+    pytest.setup_workers = config.getoption("--setup-workers")
+    pytest.rdma_sample_interval = config.getoption("--rdma-sample-interval")
+    pytest.rdma_min_gbps = config.getoption("--rdma-min-gbps")
+    pytest.rccl_baseline = config.getoption("--rccl-baseline")
+    pytest.rccl_threshold = config.getoption("--rccl-threshold")
+    pytest.rccl_update_baseline = config.getoption("--rccl-update-baseline")
+    pytest.dist_pytorch_args = config.getoption("--dist-pytorch-args")
+    pytest.ddp_min_samples_per_sec = config.getoption("--ddp-min-samples-per-sec")
+    pytest.scaling_sweep = config.getoption("--scaling-sweep")
+    pytest.scaling_mode = config.getoption("--scaling-mode")
+    pytest.scaling_global_batch = config.getoption("--scaling-global-batch")
+    pytest.scaling_min_efficiency = config.getoption("--scaling-min-efficiency")
     testdata.results_dir = results_dir()
     config.option.log_file = str(testdata.results_dir / "pytest.log")
+    testdata.run_info = {
+        "run": testdata.results_dir.name,
+        "testbed": Path(pytest.testbed_dir).stem if pytest.testbed_dir else "",
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "finished": None,
+        "tests": {},
+    }
+    write_run_info()
+
+def pytest_runtest_logreport(report):
+    # Keep the worst outcome of the setup/call/teardown phases of every test
+    tests = testdata.run_info["tests"]
+    result = tests.setdefault(report.nodeid.split("::")[-1], {"outcome": "passed", "duration": 0.0})
+    result["duration"] += report.duration
+    if report.outcome != "passed" and result["outcome"] != "failed":
+        result["outcome"] = report.outcome
+
+def pytest_sessionfinish(session, exitstatus):
+    testdata.run_info["hosts"] = [host.get('host') for host in testdata.testbed.values()]
+    testdata.run_info["exitstatus"] = int(exitstatus)
+    testdata.run_info["finished"] = datetime.now().isoformat(timespec="seconds")
+    write_run_info()
+
+def write_run_info():
+    with open(testdata.results_dir / "run_info.json", "w") as f:
+        json.dump(testdata.run_info, f, indent=4)
 
 def pytest_addoption(parser):
     parser.addoption("--testbed", action="store", default=None, help="Testbed yaml file for remote host details")    
     parser.addoption("--no-install", action="store_true", help="Skip installation steps (enabled by default)")
     parser.addoption("--no-uninstall", action="store_true",help="Skip uninstallation steps (enabled by default)")
+    parser.addoption("--setup-workers", action="store", type=int, default=8, help="Maximum number of testbed setup steps run in parallel")
+    parser.addoption("--rdma-sample-interval", action="store", type=float, default=1.0, help="Seconds between two RDMA counter samples during the multi node pytorch test")
+    parser.addoption("--rdma-min-gbps", action="store", type=float, default=None, help="Minimum peak RDMA throughput (Gb/s) expected on the used IB devices")
+    parser.addoption("--rccl-baseline", action="store", default=None, help="rccl-tests baseline json, default baselines/<testbed>_<collective>.json next to the testbed file")
+    parser.addoption("--rccl-threshold", action="store", type=float, default=0.1, help="Allowed busbw drop against the rccl-tests baseline at any message size (0.1 = 10%%)")
+    parser.addoption("--rccl-update-baseline", action="store_true", help="Save the rccl-tests results as the new baseline")
+    parser.addoption("--dist-pytorch-args", action="store", default="", help="Extra arguments of distributed_pytorch.py in the multi node pytorch test, e.g. \"--sweep\"")
+    parser.addoption("--ddp-min-samples-per-sec", action="store", type=float, default=None, help="Minimum total DDP training throughput of the multi node pytorch test, enables --ddp")
+    parser.addoption("--scaling-sweep", action="store_true", help="Run test_multi_node_scaling over the nodes x ranks per node matrix")
+    parser.addoption("--scaling-mode", action="store", choices=("weak", "strong"), default="weak", help="Keep the DDP batch per rank (weak) or the global batch (strong) in the scaling sweep")
+    parser.addoption("--scaling-global-batch", action="store", type=int, default=512, help="Global DDP batch of the strong scaling sweep")
+    parser.addoption("--scaling-min-efficiency", action="store", type=float, default=None, help="Minimum DDP throughput scaling efficiency of every config (0.8 = 80%%)")
     
 @pytest.fixture(scope="session", autouse=True)
 def testbed_initialize():
@@ -76,7 +128,7 @@ def connect_handles():
     for host in testdata.testbed.values():
         amd_host = RemoteHostHandler(host['host'])
         rsa_key = Path.home() / ".ssh" / "id_rsa"
-        amd_host.connect(host['user'], host.get('password',None),key=host.get('key',str(rsa_key)))
+        amd_host.connect(host['user'], host.get('password',None),key=host.get('key',str(rsa_key)),port=host.get('port',22))
         testdata.slurm_version = host.get('slurm_version',"")
         testdata.enroot_version = host.get('enroot_version',"")
         testdata.slurm_ip = host.get('slurm_ip',"")
@@ -12,19 +12,30 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import asyncio
+import json
 import logging
-import re
 import pytest
-import time
-from lib.helper_lib import HelperLib
-from lib.host_handler import RemoteHostHandler
-from utils import *
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from lib.ib_counters import RdmaSampler, snapshot_ib_counters_all, snapshot_delta
+from lib.job_watcher import JobWatcher
+from lib.nccl_log import NcclLogAnalyzer, follow_remote_log
+from lib.rccl_tests import parse_rccl_tests, wrong_rows, write_results, load_baseline, compare_to_baseline
+from lib.scaling import DEFAULT_DIST_ARGS, ScalingSweep, format_table, scaling_matrix, write_report
+from lib.scheduler import DagScheduler
+from utils import (create_batch_script, create_cgroup_conf_file, create_conf_file, create_gres_conf_file,
+                   create_helper_script, get_node_name, parse_rocm_smi_result, parse_used_ib_devices_from_log,
+                   remove_remote_files, wait_for_job_completion)
 from pathlib import Path
 
 repo_root = Path(__file__).resolve().parent.parent
 config_folder = repo_root/"config"
 batch_scripts_folder = repo_root/"batch_scripts"
 helper_scripts_folder = repo_root/"helper_scripts"
+# Collective of the rccl-tests binary run by batch_scripts/rccl_tests_sbatch.sh (all_reduce_perf)
+RCCL_COLLECTIVE = "all_reduce"
 
 log = logging.getLogger(__name__)
 
@@ -46,207 +57,245 @@ def setup_test():
         1. Install slurm
         2. Install enroot
         3. Install Pyxis
+        The steps are run as a dependency graph, independent hosts are set up
+        in parallel (see --setup-workers) and the per-step wall-clock times are
+        written to setup_timings.json in the results directory
     Validation:
         1. Verify if slurm, enroot and pyxis are correctly installed
     Raises:
         AssertionError: Above validation points are failed
     """
 
-    # Check rocm version 
-    log.info("Getting rocm version installed on the host..")
-    for amd_host in  pytest.testdata.amd_host:
-        exit_code , output = amd_host.helper_obj.get_rocmsmi_version()
-        if exit_code :
-            log.error(f"Rocm version couldnt be determined, Error : {output}")
-            assert False, f"Rocm Version couldnt be determined, Error : {output}"
-        else :
-            log.info(f"Rocm Version is {output}")
+    hosts = pytest.testdata.amd_host
+    head = hosts[0]
+    results_dir = pytest.testdata.results_dir
+    # Values produced by one step and consumed by the steps depending on it
+    ctx = {"node_name": {}, "hostname": {}, "host_entries": {}}
+    scheduler = DagScheduler("setup", max_workers=pytest.setup_workers)
 
-    # Run rocm-smi
-    for amd_host in  pytest.testdata.amd_host:
-        log.info(f"Listing the GPUs on the host {amd_host.host_ip} using rocm-smi")
-        exit_code, output = amd_host.execute_command(f"sudo rocm-smi")
-        if exit_code :
-            assert False , f" rocm-smi command execution failed !! , {output['stderr']}"
-        log.debug(f"{output['stdout']}")
-        amd_host.gpu_info = parse_rocm_smi_result(output['stdout'])
-        amd_host.gpu_num = len(amd_host.gpu_info)
-        exit_code, output = amd_host.execute_command(f"sudo rocm-smi --showuniqueid ")
-        if exit_code :
-            assert False , f" rocm-smi command execution failed !! , {output['stderr']}"
-        log.debug(f"GPU info : {amd_host.gpu_info}, pytest.testdata.gpu_num : {amd_host.gpu_num} ")
-        log.info(f"Total number of AMD GPUS on the device : {amd_host.gpu_num}")
+    # Check rocm version and list the GPUs using rocm-smi
+    for amd_host in hosts:
+        ip = amd_host.host_ip
+        scheduler.add(f"rocm_version[{ip}]", partial(step_rocm_version, amd_host), host=ip)
+        scheduler.add(f"rocm_smi[{ip}]", partial(step_rocm_smi, amd_host), [f"rocm_version[{ip}]"], host=ip)
 
     if pytest.no_install:
         log.info("Setup installation skipped... ")
+        scheduler.run(results_dir)
         return
 
-    # Uninstall slurm
-    uninstall_script = "uninstall_slurm.sh"
-    local_uninstall_script = config_folder/uninstall_script    
-    for amd_host in  pytest.testdata.amd_host:
-        log.info(f"Uninstalling slurm on {amd_host.host_ip}... ")
-        amd_host.helper_obj.run_scripts(local_uninstall_script, uninstall_script,pytest.testdata.results_dir)
-        log.info(f"Uninstalling slurm on {amd_host.host_ip}... SUCCESSFUL  !!")
-
-    exit_code, output = pytest.testdata.amd_host[0].execute_command(f"sudo hostname -s ")
+    # Uninstall slurm and collect the node information on every host
+    for amd_host in hosts:
+        ip = amd_host.host_ip
+        scheduler.add(f"uninstall_slurm[{ip}]", partial(step_uninstall_slurm, amd_host, results_dir), [f"rocm_smi[{ip}]"], host=ip)
+        scheduler.add(f"node_info[{ip}]", partial(step_node_info, amd_host, ctx), [f"uninstall_slurm[{ip}]"], host=ip)
+    node_info_steps = [f"node_info[{amd_host.host_ip}]" for amd_host in hosts]
+
+    # Config file creation and installation, independent per host
+    for amd_host in hosts:
+        ip = amd_host.host_ip
+        scheduler.add(f"slurm_conf[{ip}]", partial(step_slurm_conf_files, amd_host, hosts, ctx), node_info_steps, host=ip)
+        scheduler.add(f"user_groups[{ip}]", partial(step_user_groups, amd_host), [f"slurm_conf[{ip}]"], host=ip)
+        scheduler.add(f"install_slurm[{ip}]", partial(step_run_script, amd_host, "install_slurm.sh", results_dir, pytest.testdata.slurm_version),
+                      [f"user_groups[{ip}]"], host=ip)
+        scheduler.add(f"install_enroot[{ip}]", partial(step_run_script, amd_host, "install_enroot.sh", results_dir, pytest.testdata.enroot_version),
+                      [f"install_slurm[{ip}]"], host=ip)
+
+    # Configure /etc/hosts file once every host is installed and its entry is known
+    for amd_host in hosts:
+        ip = amd_host.host_ip
+        scheduler.add(f"etc_hosts[{ip}]", partial(step_etc_hosts, amd_host, hosts, ctx), node_info_steps + [f"install_enroot[{ip}]"], host=ip)
+    etc_hosts_steps = [f"etc_hosts[{amd_host.host_ip}]" for amd_host in hosts]
+
+    # Munge key is created on the head node and copied to all the other hosts
+    munge_key = scheduler.add("create_munge_key", partial(step_create_munge_key, head), [f"etc_hosts[{head.host_ip}]"], host=head.host_ip)
+    copy_munge = scheduler.add("copy_munge_key", partial(step_copy_munge_key, head, hosts[1:]), [munge_key] + etc_hosts_steps, host=head.host_ip)
+    head_config = scheduler.add("configure_head_node", partial(step_configure_head_node, head), [copy_munge], host=head.host_ip)
+    for amd_host in hosts[1:]:
+        ip = amd_host.host_ip
+        scheduler.add(f"configure_munge[{ip}]", partial(step_configure_munge, amd_host), [head_config], host=ip)
+
+    # Configure slurmdbd on the head node and restart slurmd everywhere
+    slurmdbd = scheduler.add("configure_slurmdbd", partial(step_configure_slurmdbd, head, results_dir), [head_config], host=head.host_ip)
+    for amd_host in hosts:
+        ip = amd_host.host_ip
+        deps = [slurmdbd] if amd_host is head else [slurmdbd, f"configure_munge[{ip}]"]
+        scheduler.add(f"restart_slurmd[{ip}]", partial(step_restart_slurmd, amd_host), deps, host=ip)
+    sacct_cluster = scheduler.add("sacct_cluster", partial(step_sacct_cluster, head),
+                                  [f"restart_slurmd[{amd_host.host_ip}]" for amd_host in hosts], host=head.host_ip)
+
+    # Install pyxis and check sinfo on every host
+    for amd_host in hosts:
+        ip = amd_host.host_ip
+        scheduler.add(f"install_pyxis[{ip}]", partial(step_run_script, amd_host, "install_pyxis.sh", results_dir), [sacct_cluster], host=ip)
+        scheduler.add(f"sinfo[{ip}]", partial(step_sinfo, amd_host), [f"install_pyxis[{ip}]"], host=ip)
+
+    scheduler.run(results_dir)
+
+def step_rocm_version(amd_host):
+    log.info(f"Getting rocm version installed on the host {amd_host.host_ip}..")
+    exit_code , output = amd_host.helper_obj.get_rocmsmi_version()
     if exit_code :
-        assert False , f" Failed to get the host name !! , {output['stderr']}"  
-    head_node = output['stdout'].strip()
-
-    # Create config files
-    node_name=[]
-    for amd_host in  pytest.testdata.amd_host:
-        exit_code,output = get_node_name(amd_host)
-        if exit_code:
-            assert False , f" Failed to getting the Node name !! , {output['stderr']}"  
-        node_name.append(output)
-        log.info(f"{node_name}")
-    
-    # Installation and config file creation
-    for amd_host in  pytest.testdata.amd_host:
-        # Create /etc/slurm/slurm.conf
-        log.info(f"Creating /etc/slurm/slurm.conf on {amd_host.host_ip}...")
-        local_slurm_conf = config_folder / "slurm.conf"
-        exit_code = create_conf_file(amd_host,local_slurm_conf,head_node,node_name)
-        if exit_code:
-            assert False, f"/etc/slurm/slurm.conf couldnt be created!!"
-        log.info(f"Creating /etc/slurm/slurm.conf on {amd_host.host_ip} - Successfull !!")
+        log.error(f"Rocm version couldnt be determined, Error : {output}")
+        assert False, f"Rocm Version couldnt be determined, Error : {output}"
+    log.info(f"Rocm Version is {output}")
+
+def step_rocm_smi(amd_host):
+    log.info(f"Listing the GPUs on the host {amd_host.host_ip} using rocm-smi")
+    facts = amd_host.facts
+    rocm_smi = facts.rocm_smi
+    if rocm_smi is None :
+        assert False , f" rocm-smi command execution failed !! , {facts.stderr('rocm_smi')}"
+    log.debug(f"{rocm_smi}")
+    amd_host.gpu_info = parse_rocm_smi_result(rocm_smi)
+    amd_host.gpu_num = len(amd_host.gpu_info)
+    exit_code, output = amd_host.execute_command("sudo rocm-smi --showuniqueid ")
+    if exit_code :
+        assert False , f" rocm-smi command execution failed !! , {output['stderr']}"
+    log.debug(f"GPU info : {amd_host.gpu_info}, pytest.testdata.gpu_num : {amd_host.gpu_num} ")
+    log.info(f"Total number of AMD GPUS on {amd_host.host_ip} : {amd_host.gpu_num}")
 
-        # Create /etc/slurm/gres.conf
-        log.info(f"Creating /etc/slurm/gres.conf on {amd_host.host_ip}...")
-        exit_code = create_gres_conf_file(amd_host)
-        if exit_code:
-            assert False, f"/etc/slurm/gres.conf couldnt be created!!"
-        log.info(f"Creating /etc/slurm/gres.conf  on {amd_host.host_ip}- Successfull !!")
+def step_uninstall_slurm(amd_host, results_dir):
+    # Cleanup before the installation, slurm may not be installed yet
+    step_run_script(amd_host, "uninstall_slurm.sh", results_dir, best_effort=True)
 
-        # Create /etc/slurm/cgroup.conf
-        log.info(f"Creating /etc/slurm/cgroup.conf on {amd_host.host_ip}...")
-        exit_code = create_cgroup_conf_file(amd_host)
-        if exit_code:
-            assert False, f"/etc/slurm/cgroup.conf couldnt be created!!"
-        log.info(f"Creating /etc/slurm/cgroup.conf  on {amd_host.host_ip} - Successfull !!")
+def step_node_info(amd_host, ctx):
+    exit_code,output = get_node_name(amd_host)
+    if exit_code:
+        assert False , f" Failed to getting the Node name !! , {output['stderr']}"  
+    ctx["node_name"][amd_host.host_ip] = output
+    log.info(f"{output}")
 
-        # Add the user to render/video groups 
-        exit_code, output = amd_host.execute_command(f"whoami ")
+    # Entry for the /etc/hosts file of every host
+    if not pytest.testdata.slurm_ip:
+        exit_code, ip_address = amd_host.get_ip()
         if exit_code :
-            assert False , f" Failed to get the user name !! , {output['stderr']}"  
-        user_name = output['stdout'].strip() 
-        log.info(f"Adding {user_name} to groups render/video on {amd_host.host_ip} ...")
-        exit_code, output = amd_host.execute_command(f"sudo usermod -aG render,video {user_name}")
-        if exit_code :
-            assert False , f" Failed to add the user to render,video groups !! , {output['stderr']}" 
-        log.info(f"Adding {user_name} to groups render/video on {amd_host.host_ip} Successfull !!")
-        # Reconnecting the host handle after adding the user to render,video groups
-        amd_host.reconnect()
-
-        # Install slurm 
-        install_script = "install_slurm.sh"
-        local_install_script = config_folder/install_script
-        log.info(f"Installing slurm on {amd_host.host_ip}... ")
-        amd_host.helper_obj.run_scripts(local_install_script,install_script,pytest.testdata.results_dir,pytest.testdata.slurm_version)
-        log.info(f"Installing slurm on {amd_host.host_ip}... SUCCESSFUL  !!")
-
-        # Install  enroot 
-        install_enroot = "install_enroot.sh"
-        local_install_enroot = config_folder/install_enroot
-        log.info(f"Installing enroot on {amd_host.host_ip} ...")
-        amd_host.helper_obj.run_scripts(local_install_enroot,install_enroot,pytest.testdata.results_dir,pytest.testdata.enroot_version)
-        log.info(f"Installing enroot on {amd_host.host_ip} ... SUCCESSFUL  !!")
-
-        log.info(f"Setup complete on {amd_host.host_ip}..")
-
-    # # Configure /etc/hosts file 
-    host_entries=[]
-    for amd_host in  pytest.testdata.amd_host:
-        if not pytest.testdata.slurm_ip:
-            exit_code, ip_address = amd_host.get_ip()
-            if exit_code :
-                assert False, f"Could not retrieve the remote server's IP Address !!"
-            exit_code, output = amd_host.execute_command(f"sudo hostname -s ")
-        else:
-            ip_address = pytest.testdata.slurm_ip
-        if exit_code :
-            assert False , f" Failed to get the host name !! , {output['stderr']}"  
-        host_name = output['stdout'].strip()
+            assert False, "Could not retrieve the remote server's IP Address !!"
+    else:
+        ip_address = pytest.testdata.slurm_ip
+    host_name = amd_host.facts.hostname
+    if not host_name :
+        assert False , f" Failed to get the host name !! , {amd_host.facts.stderr('hostname')}"  
+    ctx["hostname"][amd_host.host_ip] = host_name
+    ctx["host_entries"][amd_host.host_ip] = f"{ip_address} {host_name}"
+
+def step_slurm_conf_files(amd_host, hosts, ctx):
+    # Create /etc/slurm/slurm.conf
+    log.info(f"Creating /etc/slurm/slurm.conf on {amd_host.host_ip}...")
+    local_slurm_conf = config_folder / "slurm.conf"
+    head_node = ctx["hostname"][hosts[0].host_ip]
+    node_name = [ctx["node_name"][host.host_ip] for host in hosts]
+    exit_code = create_conf_file(amd_host,local_slurm_conf,head_node,node_name)
+    if exit_code:
+        assert False, "/etc/slurm/slurm.conf couldnt be created!!"
+    log.info(f"Creating /etc/slurm/slurm.conf on {amd_host.host_ip} - Successfull !!")
 
-        host_entries.append(f"{ip_address} {host_name}")
+    # Create /etc/slurm/gres.conf
+    log.info(f"Creating /etc/slurm/gres.conf on {amd_host.host_ip}...")
+    exit_code = create_gres_conf_file(amd_host)
+    if exit_code:
+        assert False, "/etc/slurm/gres.conf couldnt be created!!"
+    log.info(f"Creating /etc/slurm/gres.conf  on {amd_host.host_ip}- Successfull !!")
+
+    # Create /etc/slurm/cgroup.conf
+    log.info(f"Creating /etc/slurm/cgroup.conf on {amd_host.host_ip}...")
+    exit_code = create_cgroup_conf_file(amd_host)
+    if exit_code:
+        assert False, "/etc/slurm/cgroup.conf couldnt be created!!"
+    log.info(f"Creating /etc/slurm/cgroup.conf  on {amd_host.host_ip} - Successfull !!")
+
+def step_user_groups(amd_host):
+    # Add the user to render/video groups 
+    user_name = amd_host.facts.user
+    if not user_name :
+        assert False , f" Failed to get the user name !! , {amd_host.facts.stderr('user')}"  
+    log.info(f"Adding {user_name} to groups render/video on {amd_host.host_ip} ...")
+    exit_code, output = amd_host.execute_command(f"sudo usermod -aG render,video {user_name}")
+    if exit_code :
+        assert False , f" Failed to add the user to render,video groups !! , {output['stderr']}" 
+    log.info(f"Adding {user_name} to groups render/video on {amd_host.host_ip} Successfull !!")
+    # Reconnecting the host handle after adding the user to render,video groups
+    amd_host.reconnect()
 
+def step_run_script(amd_host, script, results_dir, version=None, best_effort=False):
+    """
+    Run a config script on the host, a failure fails the step unless best_effort is set
+    """
+    log.info(f"Running {script} on {amd_host.host_ip}... ")
+    exit_code = amd_host.helper_obj.run_scripts(config_folder/script, script, results_dir, version)
+    if exit_code:
+        if not best_effort:
+            assert False, f"{script} failed on {amd_host.host_ip} with exit code {exit_code}"
+        log.error(f"Running {script} on {amd_host.host_ip} failed with exit code {exit_code}, continuing")
+        return
+    log.info(f"Running {script} on {amd_host.host_ip}... SUCCESSFUL  !!")
+
+def step_etc_hosts(amd_host, hosts, ctx):
     hosts_file = "/etc/hosts"
-    for amd_host in  pytest.testdata.amd_host:
-        for entry in host_entries:
-            #log.info(f"Adding---{entry}--- to {amd_host.host_ip} /etc/hosts file... ")
-            command = f"grep -qF \"{entry}\" {hosts_file} || echo \"{entry}\" | sudo tee -a {hosts_file} > /dev/null"
-            exit_code, output = amd_host.execute_command(command)
-            if exit_code :
-                assert False , f" Failed to update the {hosts_file} !! , {output['stderr']}"  
-            log.info(f"Adding---{entry}--- to {amd_host.host_ip} /etc/hosts file-Successfull !! ")
+    for host in hosts:
+        entry = ctx["host_entries"][host.host_ip]
+        command = f"grep -qF \"{entry}\" {hosts_file} || echo \"{entry}\" | sudo tee -a {hosts_file} > /dev/null"
+        exit_code, output = amd_host.execute_command(command)
+        if exit_code :
+            assert False , f" Failed to update the {hosts_file} !! , {output['stderr']}"  
+        log.info(f"Adding---{entry}--- to {amd_host.host_ip} /etc/hosts file-Successfull !! ")
 
+def step_create_munge_key(head):
     # Create /etc.munge/munge.key and change file permission 
-    exit_code, output = pytest.testdata.amd_host[0].helper_obj.create_munge_key()
+    exit_code, output = head.helper_obj.create_munge_key()
     if exit_code :
-        assert False , f"Munge key creation on {pytest.testdata.amd_host[0].host_ip} failed :{output['stderr']} "  
-    log.info(f"Munge key creation on {pytest.testdata.amd_host[0].host_ip} successful ")
-    
+        assert False , f"Munge key creation on {head.host_ip} failed :{output['stderr']} "  
+    log.info(f"Munge key creation on {head.host_ip} successful ")
+
+def step_copy_munge_key(head, workers):
     # Copy to all the hosts
     munge_path = "/etc/munge/munge.key"
-    exit_code = pytest.testdata.amd_host[0].copy_munge_to_hosts(pytest.testdata.amd_host[1:],munge_path )
+    exit_code = head.copy_munge_to_hosts(workers, munge_path)
     if exit_code:
         assert False, "Munge key copy to all the hosts failed !!"
-    
+
+def step_configure_head_node(head):
     # Change back the permission of all munge keys to 700 and restart munge,slurm and slurmctld
-    exit_code, output = pytest.testdata.amd_host[0].helper_obj.configure_head_node()
+    exit_code, output = head.helper_obj.configure_head_node()
     if exit_code :
-        assert False, f"Head node configuration on {pytest.testdata.amd_host[0].host_ip} failed :{output['stderr']} "  
-    log.info(f"Head node configuration on  {pytest.testdata.amd_host[0].host_ip} successfull ")
+        assert False, f"Head node configuration on {head.host_ip} failed :{output['stderr']} "  
+    log.info(f"Head node configuration on  {head.host_ip} successfull ")
 
-    for amd_host in  pytest.testdata.amd_host[1:]:
-        exit_code, output = amd_host.helper_obj.configure_munge()
-        if exit_code :
-            assert False, f"Munge key configuration on {amd_host.host_ip} failed :{output['stderr']} "  
-        log.info(f"Munge key configuration on {amd_host.host_ip} successfull ")
-    
-    # Configuring slurmdb
-    amd_host=pytest.testdata.amd_host[0]
+def step_configure_munge(amd_host):
+    exit_code, output = amd_host.helper_obj.configure_munge()
+    if exit_code :
+        assert False, f"Munge key configuration on {amd_host.host_ip} failed :{output['stderr']} "  
+    log.info(f"Munge key configuration on {amd_host.host_ip} successfull ")
+
+def step_configure_slurmdbd(head, results_dir):
     local_slurmdbd_file = config_folder / "slurmdbd.conf"
-    log.info(f"Creating /etc/slurm/slurmdbd.conf on {amd_host.host_ip}...")
-    exit_code = create_conf_file(amd_host,local_slurmdbd_file )
+    log.info(f"Creating /etc/slurm/slurmdbd.conf on {head.host_ip}...")
+    exit_code = create_conf_file(head,local_slurmdbd_file )
     if exit_code:
-        assert False, f"/etc/slurm/slurmdbd.conf couldnt be created!!"
-    log.info(f"Creating /etc/slurm/slurmdbd.conf  on {amd_host.host_ip} - Successfull !!")
-    
-    log.info(f"Configuring Slurmdbd ...")
-    slurmdb_config = "slurmdb_config.sh"
-    local_slurmdb_config = config_folder/slurmdb_config
-    amd_host.helper_obj.run_scripts(local_slurmdb_config,slurmdb_config,pytest.testdata.results_dir)  
-    log.info(f"Slurmdbd configuration on {amd_host.host_ip} successfull ")
-    
-    for amd_host in  pytest.testdata.amd_host:
-        exit_code, output = amd_host.execute_command("sudo systemctl restart slurmd")
-        if exit_code :
-            assert False, f"slurmd restart failed on {amd_host.host_ip} : {output['stderr']}"
-        log.info(f"slurmd restart on {amd_host.host_ip} : \n {output['stdout']}")
+        assert False, "/etc/slurm/slurmdbd.conf couldnt be created!!"
+    log.info(f"Creating /etc/slurm/slurmdbd.conf  on {head.host_ip} - Successfull !!")
 
-    amd_host = pytest.testdata.amd_host[0]
-    exit_code, output = amd_host.execute_command("sudo sacctmgr list cluster")
+    log.info("Configuring Slurmdbd ...")
+    step_run_script(head, "slurmdb_config.sh", results_dir)
+
+def step_restart_slurmd(amd_host):
+    exit_code, output = amd_host.execute_command("sudo systemctl restart slurmd")
     if exit_code :
-        assert False, f"failed to get sacct cluster on {amd_host.host_ip} : {output['stderr']}"
-    log.info(f"sacct cluster  : \n {output['stdout']}")    
-    amd_host.execute_command("sudo systemctl restart slurmctld")
+        assert False, f"slurmd restart failed on {amd_host.host_ip} : {output['stderr']}"
+    log.info(f"slurmd restart on {amd_host.host_ip} : \n {output['stdout']}")
 
-    install_pyxis = "install_pyxis.sh"
-    local_install_pyxis = config_folder/install_pyxis
-    for amd_host in  pytest.testdata.amd_host:
-        # Install  pyxis 
-        log.info(f"Installing pyxis on {amd_host.host_ip} ...")
-        amd_host.helper_obj.run_scripts(local_install_pyxis,install_pyxis,pytest.testdata.results_dir)
-        log.info(f"Installing pyxis on {amd_host.host_ip} ... SUCCESSFUL  !!")
+def step_sacct_cluster(head):
+    exit_code, output = head.execute_command("sudo sacctmgr list cluster")
+    if exit_code :
+        assert False, f"failed to get sacct cluster on {head.host_ip} : {output['stderr']}"
+    log.info(f"sacct cluster  : \n {output['stdout']}")    
+    head.execute_command("sudo systemctl restart slurmctld")
 
-    for amd_host in  pytest.testdata.amd_host:
-        exit_code, output = amd_host.execute_command("sinfo")
-        if exit_code :
-            assert False, f"sinfo failed on {amd_host.host_ip} : {output['stderr']}"
-        log.info(f"sinfo on {amd_host.host_ip} : \n {output['stdout']}")
+def step_sinfo(amd_host):
+    exit_code, output = amd_host.execute_command("sinfo")
+    if exit_code :
+        assert False, f"sinfo failed on {amd_host.host_ip} : {output['stderr']}"
+    log.info(f"sinfo on {amd_host.host_ip} : \n {output['stdout']}")
         
 def test_single_node_pytorch():
     """    
@@ -258,50 +307,100 @@ def test_single_node_pytorch():
         1. Create temporary folder /tmp/test_pytorch
         2. Copy gpu stress script to this folder
         3. Run sbatch script 
+        All the nodes are staged in parallel, one job per node is submitted
+        up front and the artifacts of every node are collected as soon as its
+        job ends
     Validation:
         1. Verify if sbatch test is completed
         2. Verify and output the results 
     Raises:
-        AssertionError: Above validation points are failed
+        AssertionError: Above validation points are failed on any node
     """
 
     # Create batch script
     head_node = pytest.testdata.amd_host[0]
+    hosts = pytest.testdata.amd_host
     local_script = batch_scripts_folder / "pytorch_gpu_util_sbatch.sh"
     remote_script = str(local_script.name)
+    parent_dir = "/tmp/test_pytorch"
     log.info(f"Creating {local_script.name} on {head_node.host_ip}...")
     exit_code = create_batch_script(head_node,local_script)
     if exit_code:
         assert False, f"{local_script.name} on {head_node.host_ip} couldnt be created!!"
     log.info(f"Creating {local_script.name} on {head_node.host_ip} - Successfull !!")
 
-    for amd_host in  pytest.testdata.amd_host:
-        # Create /tmp/test_pytorch/gpu_stress_10s.py
-        parent_dir = "/tmp/test_pytorch"
-        copy_file_list =[]
-        local_stress_script = helper_scripts_folder / "gpu_stress_10s.py"
-        log.info(f"Creating {local_stress_script.name} on {amd_host.host_ip}...")
-        exit_code = create_helper_script(amd_host,local_stress_script,parent_dir)
-        if exit_code:
-            assert False, f"{local_stress_script.name} on {amd_host.host_ip} couldnt be created!!"
-        log.info(f"Creating {local_stress_script.name} on {amd_host.host_ip} - Successfull !!")
+    with ThreadPoolExecutor(max_workers=len(hosts)) as executor:
+        # Create /tmp/test_pytorch/gpu_stress_10s.py on all the nodes at once
+        staged = list(executor.map(lambda amd_host: stage_single_node_pytorch(amd_host, parent_dir), hosts))
+
+        # Submit one job per node, then wait for all of them at once
+        watcher = JobWatcher(head_node)
+        jobs = {}
+        node_results = {}
+        for amd_host, error in zip(hosts, staged):
+            if error:
+                node_results[amd_host.host_ip] = error
+                continue
+            node = amd_host.facts.hostname
+            sbatch_cmd = f"sbatch --parsable --nodelist={node}  --gres=gpu:{amd_host.gpu_num} {remote_script} "
+            exit_code, output = head_node.execute_command(sbatch_cmd)
+            if exit_code:
+                node_results[amd_host.host_ip] = f"sbatch command couldnt be launched !! : {output['stderr']}"
+                continue
+            job_id = output['stdout'].strip()
+            log.info(f"sbatch job - {job_id} submitted on {node} !!") 
+            jobs[amd_host.host_ip] = executor.submit(collect_single_node_pytorch, amd_host, watcher.watch(job_id),
+                                                     job_id, parent_dir)
+        try:
+            for host_ip, future in jobs.items():
+                node_results[host_ip] = future.result()
+        finally:
+            watcher.stop()
 
-        #Get host name 
-        exit_code, output = amd_host.execute_command(f"sudo hostname -s ")
-        if exit_code :
-            assert False , f" Failed to get the host name !!, {output['stderr']}"  
-        node = output['stdout'].strip()
+    # Delete the batch script on the remote host 
+    exit_code, output = head_node.execute_command(f"sudo rm -rf {remote_script}")
+    if exit_code :
+        assert False , f" Error deleting the script {remote_script}!, {output['stderr']}"  
+
+    # Report every node separately
+    results_file = pytest.testdata.results_dir / "single_node_pytorch_results.json"
+    with open(results_file, "w") as f:
+        json.dump({host_ip: error or "PASSED" for host_ip, error in node_results.items()}, f, indent=4)
+    for host_ip, error in node_results.items():
+        log.info(f"Single node pytorch on {host_ip} : {error or 'PASSED'}")
+    failed = {host_ip: error for host_ip, error in node_results.items() if error}
+    assert not failed, f"Pytorch_gpu_util test case failed on {len(failed)} node(s).. !! {failed}"
+
+def stage_single_node_pytorch(amd_host, parent_dir):
+    """
+    Copy the gpu stress script to the node
+
+    Return : None if successful, error message otherwise
+    """
+    local_stress_script = helper_scripts_folder / "gpu_stress_10s.py"
+    log.info(f"Creating {local_stress_script.name} on {amd_host.host_ip}...")
+    exit_code = create_helper_script(amd_host,local_stress_script,parent_dir)
+    if exit_code:
+        return f"{local_stress_script.name} on {amd_host.host_ip} couldnt be created!!"
+    log.info(f"Creating {local_stress_script.name} on {amd_host.host_ip} - Successfull !!")
+
+    #Get host name 
+    if not amd_host.facts.hostname :
+        return f" Failed to get the host name !!, {amd_host.facts.stderr('hostname')}"
+    return None
 
-        # Run the batch script -> get jobid 
-        sbatch_cmd = f"sbatch --parsable --nodelist={node}  --gres=gpu:{amd_host.gpu_num} {remote_script} "
-        exit_code, output = head_node.execute_command(sbatch_cmd)
-        assert not exit_code, f"sbatch command couldnt be launched !! : {output['stderr']}"
-        job_id = output['stdout'].strip()
-        log.info(f"sbatch job - {job_id} submitted !!") 
+def collect_single_node_pytorch(amd_host, job_future, job_id, parent_dir):
+    """
+    Wait for the job of the node, validate and copy back its results
 
+    Return : None if successful, error message otherwise
+    """
+    copy_file_list =[]
+    try:
         # Wait for job completion
-        job_state, sacct_output = wait_for_job_completion(head_node,job_id) 
-        log.info(f"Job state of {job_id} : {job_state}")
+        status = job_future.result()
+        job_state, sacct_output = status.state, status.sacct_output
+        log.info(f"Job state of {job_id} on {amd_host.host_ip} : {job_state}")
         log.info(f"sacct output : {sacct_output}")
         err_file = f"pytorch_logs/pytorch-util-{job_id}.err"
         output_file = f"pytorch_logs/pytorch-util-{job_id}.out"
@@ -311,44 +410,56 @@ def test_single_node_pytorch():
         if "COMPLETED" not in job_state:
             exit_code, output = amd_host.execute_command(f"cat {err_file}")
             assert not exit_code, f"{amd_host.host_ip}:Couldnt print the batch error file {err_file} : {output['stderr']}"
-            log.info(f"ERROR file : {output['stdout']}")
-            assert False, "Pytorch_gpu_util test case failed.. !! "
+            log.info(f"ERROR file of {amd_host.host_ip} : {output['stdout']}")
+            assert False, f"Pytorch_gpu_util job {job_id} ended in {job_state} on {amd_host.host_ip}.. !! "
 
         # Print rocm-smi, cuda device_count output
         exit_code, output = amd_host.execute_command(f"cat {output_file} | head -n 20")
         assert not exit_code, f"{amd_host.host_ip}:Couldnt print the batch output file {output_file} : {output['stderr']}"
-        log.info(f"Output : ")
+        log.info(f"Output of {amd_host.host_ip} : ")
         log.info(output['stdout'].encode().decode('unicode_escape'))
 
         # Check for gpu_max_utilization.log in /tmp/test_pytorch and validate
-        log.info(f"Checking {parent_dir}/gpu_max_utilization.log ...")
+        log.info(f"Checking {parent_dir}/gpu_max_utilization.log on {amd_host.host_ip} ...")
         gpu_util_log = f"{parent_dir}/gpu_max_utilization.log"
         copy_file_list.append(gpu_util_log)
-        exit_code, output = amd_host.execute_command(f"cat {parent_dir}/gpu_max_utilization.log ")
+        exit_code, output = amd_host.execute_command(f"cat {gpu_util_log} ")
         if exit_code :
-            assert False , f" Error retrieving the file {parent_dir}/gpu_max_utilization.log !, {output['stderr']}"  
-        log.info(f"Output : ")
+            assert False , f" Error retrieving the file {gpu_util_log} !, {output['stderr']}"  
+        log.info(f"Output of {amd_host.host_ip} : ")
         log.info(output['stdout'].encode().decode('unicode_escape'))
+        # Per GPU utilization statistics of the whole stress run
+        gpu_stats_json = f"{parent_dir}/gpu_utilization_stats.json"
+        copy_file_list.append(gpu_stats_json)
+        copy_file_list.append(f"{parent_dir}/gpu_utilization_stats.csv")
+        # Achieved TFLOPS of every GPU worker, gathered from all the ranks
+        copy_file_list.append(f"{parent_dir}/gpu_stress_report.json")
         # Copy back results and deleted the directory and files
-        log.info(f"Copying all the results to {str(pytest.testdata.results_dir)}...")
+        log.info(f"Copying all the results of {amd_host.host_ip} to {str(pytest.testdata.results_dir)}...")
         
         for file in copy_file_list:
-            local_file = pytest.testdata.results_dir / Path(file).name
+            # Files with the same name on every node are prefixed with the node
+            name = Path(file).name if file.startswith("pytorch_logs") else f"{amd_host.facts.hostname}_{Path(file).name}"
+            local_file = pytest.testdata.results_dir / name
             exit_code = amd_host.copy_from_host(file,local_file)
             assert not exit_code, f" Error copying the file {file} !"
-            exit_code, output = amd_host.execute_command(f"sudo rm -rf {file}")
-            if exit_code :
-                assert False , f" Error deleting the file {file} !, {output['stderr']}"  
 
-        # Remove the parent directory
-        exit_code, output = amd_host.execute_command(f"sudo rm -rf {parent_dir}")
-        if exit_code :
-            assert False , f" Error deleting the folder {parent_dir} !, {output['stderr']}"  
-
-    # Delete the batch script on the remote host 
-    exit_code, output = head_node.execute_command(f"sudo rm -rf {remote_script}")
-    if exit_code :
-        assert False , f" Error deleting the script {remote_script}!, {output['stderr']}"  
+        # Delete the files and the parent directory in one round trip
+        remove_remote_files(amd_host, copy_file_list + [parent_dir])
+
+        # Every GPU must have reached the utilization threshold
+        with open(pytest.testdata.results_dir / f"{amd_host.facts.hostname}_{Path(gpu_stats_json).name}") as f:
+            gpu_stats = json.load(f)
+        for gpu in gpu_stats["gpus"]:
+            log.info(f"{amd_host.host_ip} GPU {gpu['gpu']} : util p50 {gpu['p50']:.0f}% p95 {gpu['p95']:.0f}% "
+                     f"saturated after {gpu['time_to_saturation']}s, {gpu['time_above_threshold']}s above {gpu_stats['threshold']}%")
+        assert gpu_stats["gpus"], f"No GPU utilization samples recorded on {amd_host.host_ip}"
+        lagging = [gpu["gpu"] for gpu in gpu_stats["gpus"] if gpu["time_to_saturation"] is None]
+        assert not lagging, f"GPUs {lagging} of {amd_host.host_ip} never reached {gpu_stats['threshold']}% utilization"
+    except Exception as e:
+        log.error(f"Single node pytorch on {amd_host.host_ip} failed : {e}")
+        return str(e) or repr(e)
+    return None
 
 def test_multi_node_distributed_pytorch():
     """    
@@ -388,31 +499,54 @@ def test_multi_node_distributed_pytorch():
         assert False, f"{local_script.name} on {amd_host.host_ip} couldnt be created!!"
     log.info(f"Creating {local_script.name} on {amd_host.host_ip} - Successfull !!")
 
-    log.info(f"Discovering IB devices on {amd_host.host_ip}...")
-    exit_code, all_devices = list_all_ib_devices_remote(amd_host)
-    assert not exit_code, f" IB devices couldn't be fetched on {amd_host.host_ip}" 
-    assert all_devices, f"No IB device found !!"
-    log.info(f"IB Devices : {all_devices}")
-
-    log.info(f"Reading counters BEFORE test ({len(all_devices)} devices)")
-    counters_before = {
-        dev: read_ib_counters_remote(amd_host, *dev)
-        for dev in all_devices
-    }
+    # One snapshot of all the IB counters of every node, in one round trip per node
+    log.info("Reading counters BEFORE test on all the nodes...")
+    exit_code, counters_before = snapshot_ib_counters_all(pytest.testdata.amd_host)
+    assert not exit_code, " IB counters couldn't be fetched" 
+    for host_ip, snapshot in counters_before.items():
+        assert snapshot.devices, f"No IB device found on {host_ip} !!"
+        log.info(f"IB Devices on {host_ip} : {snapshot.devices}")
     log.info(f"Counters before the test : {counters_before}")
     
+    # Sample the RDMA throughput of every node while the job runs
+    sampler = RdmaSampler(pytest.testdata.amd_host, interval=pytest.rdma_sample_interval).start()
+
+    # The DDP benchmark is needed for the throughput assertion
+    dist_args = pytest.dist_pytorch_args.split()
+    if pytest.ddp_min_samples_per_sec and "--ddp" not in dist_args:
+        dist_args.append("--ddp")
+
     # Run the batch script -> get jobid 
-    exit_code, output = amd_host.execute_command(f"sbatch --parsable --gres=gpu:{amd_host.gpu_num} {remote_script} ")
-    assert not exit_code, f"sbatch command couldnt be launched !! : {output['stderr']}"
+    exit_code, output = amd_host.execute_command(f"DIST_PYTORCH_ARGS='{' '.join(dist_args)}' sbatch --parsable --gres=gpu:{amd_host.gpu_num} {remote_script} ")
+    if exit_code:
+        sampler.stop()
+        assert False, f"sbatch command couldnt be launched !! : {output['stderr']}"
     job_id = output['stdout'].strip()
     log.info(f"sbatch job - {job_id} submitted !!")  
+    err_file = f"pytorch_logs/pytorch-rccl-{job_id}.err"
+    output_file = f"pytorch_logs/pytorch-rccl-{job_id}.out"
+
+    # Follow the NCCL log while the job runs, cancel it as soon as NCCL falls back to sockets
+    fallback_lines = []
+    def cancel_on_fallback(line):
+        fallback_lines.append(line)
+        log.error(f"Socket fallback detected, cancelling job {job_id} : {line}")
+        amd_host.execute_command(f"scancel {job_id}")
+    live_log = NcclLogAnalyzer(on_socket_fallback=cancel_on_fallback)
+    stop_follow = threading.Event()
+    follower = threading.Thread(target=follow_remote_log, args=(amd_host, output_file, live_log, stop_follow, job_id), daemon=True)
+    follower.start()
 
     # Wait for job completion
-    job_state, sacct_output = wait_for_job_completion(amd_host,job_id) 
+    try:
+        job_state, sacct_output = wait_for_job_completion(amd_host,job_id) 
+    finally:
+        stop_follow.set()
+        follower.join()
+        sampler.stop()
+        sampler.write(pytest.testdata.results_dir, prefix=f"rdma_{job_id}")
     log.info(f"Job state of {job_id} : {job_state}")
     log.info(f"sacct output : {sacct_output}")
-    err_file = f"pytorch_logs/pytorch-rccl-{job_id}.err"
-    output_file = f"pytorch_logs/pytorch-rccl-{job_id}.out"
     local_output_file = pytest.testdata.results_dir / Path(output_file).name
     copy_file_list.append(output_file)
     copy_file_list.append(err_file)
@@ -421,16 +555,22 @@ def test_multi_node_distributed_pytorch():
         exit_code, output = amd_host.execute_command(f"cat {err_file}")
         assert not exit_code, f"{amd_host.host_ip}:Couldnt print the batch error file {err_file} : {output['stderr']}"
         log.info(f"ERROR file : {output['stdout']}")
+        assert not fallback_lines, f"Job {job_id} cancelled, socket fallback detected : {fallback_lines[0]}"
         assert False, "Distributed Pytorch test case failed.. !! "
 
     # Check for test_summary.txt in test_pytorch and validate
     log.info(f"Checking {parent_dir}/ ...")
     test_summary_log = f"{parent_dir}/test_summary_{job_id}.txt"
     copy_file_list.append(test_summary_log)
+    copy_file_list.append(f"{parent_dir}/phase_timings_{job_id}.json")
     exit_code, output = amd_host.execute_command(f"cat {test_summary_log} ")
     assert not exit_code, f" Error retrieving the file {test_summary_log}!, {output['stderr']}"  
-    log.info(f"Output : ")
+    log.info("Output : ")
     log.info(output['stdout'].encode().decode('unicode_escape'))
+    if "--sweep" in dist_args:
+        copy_file_list.append(f"{parent_dir}/collective_sweep_{job_id}.json")
+    if "--ddp" in dist_args:
+        copy_file_list.append(f"{parent_dir}/ddp_throughput_{job_id}.json")
  
     # Copy back results and delete the directory and files
     log.info(f"Copying all the results to {str(pytest.testdata.results_dir)}...")
@@ -439,19 +579,14 @@ def test_multi_node_distributed_pytorch():
         local_file = pytest.testdata.results_dir / Path(file).name
         exit_code = amd_host.copy_from_host(file,local_file)
         assert not exit_code, f" Error copying the file {file} !"
-        exit_code, output = amd_host.execute_command(f"sudo rm -rf {file}")
-        assert not exit_code , f" Error deleting the file {file} !, {output['stderr']}"  
 
-    # Remove the parent directory
-    exit_code, output = amd_host.execute_command(f"sudo rm -rf {parent_dir}")
-    assert not exit_code, f" Error deleting the folder {parent_dir} !, {output['stderr']}"  
-
-    # Delete the batch script on the remote host 
-    exit_code, output = amd_host.execute_command(f"sudo rm -rf {remote_script}")
-    assert not exit_code , f" Error deleting the script {remote_script}!, {output['stderr']}"  
+    # Delete the files, the parent directory and the batch script in one round trip
+    remove_remote_files(amd_host, copy_file_list + [parent_dir, remote_script])
 
     log.info("Parsing NCCL log...")
-    used_devices, net_ib_lines = parse_used_ib_devices_from_log(local_output_file)
+    nccl_log = NcclLogAnalyzer.from_file(local_output_file)
+    nccl_log.write_report(pytest.testdata.results_dir / f"nccl_report_{job_id}.json")
+    used_devices, net_ib_lines = parse_used_ib_devices_from_log(local_output_file, nccl_log)
 
     log.info("NET/IB lines:")
     for l in net_ib_lines[:5]:
@@ -462,34 +597,50 @@ def test_multi_node_distributed_pytorch():
         log.info(f"  {d}:{p}")
 
     log.info("Reading counters AFTER test")
-    counters_after = {
-        dev: read_ib_counters_remote(amd_host, *dev)
-        for dev in used_devices
-    }
+    exit_code, counters_after = snapshot_ib_counters_all(pytest.testdata.amd_host)
+    assert not exit_code, " IB counters couldn't be fetched" 
     log.info("RDMA counter deltas:")
     rdma_seen = False
 
-    for dev in used_devices:
-        before = counters_before.get(dev)
-        after = counters_after.get(dev)
-
-        d = counter_delta(before, after)
+    for host_ip, after in counters_after.items():
+        deltas = snapshot_delta(counters_before[host_ip], after)
+        for dev in used_devices:
+            d = deltas.get(dev)
+            if d is None:
+                log.info(f" {host_ip} Device {dev[0]}:{dev[1]} not present")
+                continue
 
-        tx = d["tx_rdma_ucast_bytes"]
-        rx = d["rx_rdma_ucast_bytes"]
+            tx = d.get("tx_rdma_ucast_bytes", 0)
+            rx = d.get("rx_rdma_ucast_bytes", 0)
 
-        log.info(f" Device {dev[0]}:{dev[1]}")
-        log.info(f"  TX delta: {tx}")
-        log.info(f"  RX delta: {rx}")
+            log.info(f" {host_ip} Device {dev[0]}:{dev[1]}")
+            log.info(f"  TX delta: {tx}")
+            log.info(f"  RX delta: {rx}")
 
-        if tx > 0 or rx > 0:
-            rdma_seen = True
-            log.info("  RDMA traffic detected")
-        else:
-            log.info("  No RDMA traffic")
+            if tx > 0 or rx > 0:
+                rdma_seen = True
+                log.info("  RDMA traffic detected")
+            else:
+                log.info("  No RDMA traffic")
 
     assert rdma_seen, "No RDMA traffic detected on used IB devices"
 
+    peak_gbps = sampler.peak_gbps(used_devices)
+    log.info(f"Peak RDMA throughput on used IB devices : {peak_gbps:.2f} Gb/s")
+    if pytest.rdma_min_gbps:
+        assert peak_gbps >= pytest.rdma_min_gbps, \
+            f"Peak RDMA throughput {peak_gbps:.2f} Gb/s is below {pytest.rdma_min_gbps} Gb/s"
+
+    if "--ddp" in dist_args:
+        with open(pytest.testdata.results_dir / f"ddp_throughput_{job_id}.json") as f:
+            ddp = json.load(f)
+        log.info(f"DDP throughput : {ddp['samples_per_sec']:.1f} samples/s on {ddp['world_size']} ranks, "
+                 f"scaling efficiency {ddp['scaling_efficiency'] * 100:.1f}%, step time p50 {ddp['step_time']['p50']:.4f}s "
+                 f"p99 {ddp['step_time']['p99']:.4f}s")
+        if pytest.ddp_min_samples_per_sec:
+            assert ddp["samples_per_sec"] >= pytest.ddp_min_samples_per_sec, \
+                f"DDP throughput {ddp['samples_per_sec']:.1f} samples/s is below {pytest.ddp_min_samples_per_sec} samples/s"
+
     log.info("\n VALIDATION PASSED (REMOTE COUNTERS)")
 
 
@@ -534,7 +685,6 @@ def  test_multi_node_rccl():
     log.info(f"sacct output : {sacct_output}")
     err_file = f"logs/rccl_test_{job_id}.err"
     output_file = f"logs/rccl_test_{job_id}.out"
-    copy_file_list.append(output_file)
     copy_file_list.append(err_file)
 
     if "COMPLETED" not in job_state:
@@ -543,13 +693,14 @@ def  test_multi_node_rccl():
         log.info(f"ERROR file : {output['stdout']}")
         assert False, "RCCL test case failed.. !! "
 
-    # Check for output file and print the results
+    # Stream the output file to the results folder and print the results
     parent_dir="logs"
     log.info(f"Checking {parent_dir}/ ...")
-    exit_code, output = amd_host.execute_command(f"cat {output_file} ")
-    assert not exit_code, f" Error retrieving the file {output_file}!, {output['stderr']}"  
-    log.info(f"Output : ")
-    log.info(output['stdout'].encode().decode('unicode_escape'))
+    local_output_file = pytest.testdata.results_dir / Path(output_file).name
+    log.info("Output : ")
+    result = amd_host.execute_command_stream(f"cat {output_file} ", tee_path=local_output_file,
+                                             on_line=lambda stream, line: log.info(line))
+    assert not result.exit_code, f" Error retrieving the file {output_file}!, {result.stderr}"  
  
     # Copy back results and delete the directory and files
     log.info(f"Copying all the results to {str(pytest.testdata.results_dir)}...")
@@ -558,16 +709,92 @@ def  test_multi_node_rccl():
         local_file = pytest.testdata.results_dir / Path(file).name
         exit_code = amd_host.copy_from_host(file,local_file)
         assert not exit_code, f" Error copying the file {file} !"
-        exit_code, output = amd_host.execute_command(f"sudo rm -rf {file}")
-        assert not exit_code , f" Error deleting the file {file} !, {output['stderr']}"  
 
-    # Remove the parent directory
-    exit_code, output = amd_host.execute_command(f"sudo rm -rf {parent_dir}")
-    assert not exit_code, f" Error deleting the folder {parent_dir} !, {output['stderr']}"  
+    # Delete the files, the parent directory and the batch script in one round trip
+    remove_remote_files(amd_host, copy_file_list + [output_file, parent_dir, remote_script])
+
+    # Parse the bandwidth tables and compare them to the baseline of the testbed
+    with open(local_output_file, errors="ignore") as f:
+        results = parse_rccl_tests(f.read(), collective=RCCL_COLLECTIVE)
+    assert results["rows"], f"No rccl-tests results found in {local_output_file}"
+    write_results(results, pytest.testdata.results_dir / f"rccl_results_{job_id}.json")
+    log.info(f"{results['collective']} average busbw : {results['avg_busbw']} GB/s")
+    wrong = wrong_rows(results)
+    assert not wrong, f"rccl-tests data errors at sizes {[row.size for row in wrong]}"
+
+    testbed = Path(pytest.testbed_dir)
+    baseline_file = Path(pytest.rccl_baseline) if pytest.rccl_baseline else \
+        testbed.parent / "baselines" / f"{testbed.stem}_{results['collective']}.json"
+    if pytest.rccl_update_baseline:
+        baseline_file.parent.mkdir(parents=True, exist_ok=True)
+        write_results(results, baseline_file)
+        return
+    baseline = load_baseline(baseline_file)
+    if baseline is None:
+        log.info(f"No rccl-tests baseline {baseline_file}, busbw regression check skipped")
+        return
+    regressions = compare_to_baseline(results, baseline, pytest.rccl_threshold)
+    for regression in regressions:
+        log.error(regression)
+    assert not regressions, f"busbw regressed more than {pytest.rccl_threshold * 100:.0f}% against {baseline_file} at {len(regressions)} message sizes"
 
-    # Delete the batch script on the remote host 
-    exit_code, output = amd_host.execute_command(f"sudo rm -rf {remote_script}")
-    assert not exit_code , f" Error deleting the script {remote_script}!, {output['stderr']}"  
+def test_multi_node_scaling():
+    """
+    Run distributed_pytorch.py over 1..N nodes and powers of two ranks per node up to the GPUs of a node
+
+    TestID: TCID-ENROOT-MULTI-NODE-SCALING
+
+    Setup:
+        1.Copy helper script - distributed_pytorch.py to the test_pytorch directory of every node
+        2.Copy batch file to the home directory
+    Validation:
+        1. Verify all the jobs of the matrix are completed
+        2. Write the bandwidth, throughput and scaling efficiency of every config to scaling_report.json/.csv
+        3. Verify the throughput efficiency if --scaling-min-efficiency is given
+    Raises:
+        AssertionError: Above validation points are failed
+    """
+    if not pytest.scaling_sweep:
+        pytest.skip("Scaling sweep not requested, use --scaling-sweep")
+    parent_dir = "test_pytorch"
+    hosts = pytest.testdata.amd_host
+    for amd_host in hosts:
+        local_pytorch_script = helper_scripts_folder / "distributed_pytorch.py"
+        exit_code = create_helper_script(amd_host,local_pytorch_script,parent_dir)
+        assert not exit_code, f"{local_pytorch_script.name} on {amd_host.host_ip} couldnt be created!!"
+
+    amd_host = hosts[0]
+    local_script = batch_scripts_folder / "distributed_pytorch_sbatch.sh"
+    remote_script = str(local_script.name)
+    exit_code = create_batch_script(amd_host,local_script)
+    assert not exit_code, f"{local_script.name} on {amd_host.host_ip} couldnt be created!!"
+
+    configs = scaling_matrix(len(hosts), amd_host.gpu_num)
+    log.info(f"Scaling matrix : {[config.name for config in configs]}")
+    dist_args = f"{DEFAULT_DIST_ARGS} {pytest.dist_pytorch_args}".strip()
+    sweep = ScalingSweep(amd_host, remote_script, configs, hosts=hosts, dist_args=dist_args,
+                         mode=pytest.scaling_mode, global_batch=pytest.scaling_global_batch)
+    rows = sweep.run()
+    write_report(rows, pytest.testdata.results_dir, mode=pytest.scaling_mode)
+    for line in format_table(rows):
+        log.info(line)
+
+    # Copy back the job logs, every node may hold the result files
+    for row in rows:
+        if row["job_id"] is None:
+            continue
+        for file in (f"pytorch_logs/pytorch-rccl-{row['job_id']}.out", f"pytorch_logs/pytorch-rccl-{row['job_id']}.err"):
+            if amd_host.copy_from_host(file, pytest.testdata.results_dir / Path(file).name):
+                log.info(f"Could not copy {file}")
+    for host in hosts:
+        remove_remote_files(host, [parent_dir] + ([remote_script] if host is amd_host else []))
+
+    failed = [f"{row['config']} : {row['state']}" for row in rows if row["state"] != "COMPLETED"]
+    assert not failed, f"Scaling jobs failed : {failed}"
+    if pytest.scaling_min_efficiency:
+        low = [f"{row['config']} : {row['throughput_efficiency'] * 100:.1f}%" for row in rows
+               if row["throughput_efficiency"] is not None and row["throughput_efficiency"] < pytest.scaling_min_efficiency]
+        assert not low, f"Throughput scaling efficiency below {pytest.scaling_min_efficiency * 100:.0f}% : {low}"
 
 def teardown_test():
     """
@@ -582,19 +809,27 @@ def teardown_test():
     uninstall_script = "uninstall_slurm.sh"
     local_uninstall_script = config_folder/uninstall_script   
     pytorch_logs = "pytorch_logs"  
-    for amd_host in  pytest.testdata.amd_host:
+
+    async def teardown_host(amd_host):
         # Remove the logs directory
         log.info(f"Removing {pytorch_logs} directory")
-        exit_code, output = amd_host.execute_command(f"sudo rm -rf {pytorch_logs}")
-        assert not exit_code, f" Error deleting the folder {pytorch_logs} !, {output['stderr']}"  
+        result = await amd_host.run(f"sudo rm -rf {pytorch_logs}")
+        assert not result.exit_code, f" Error deleting the folder {pytorch_logs} !, {result.stderr}"  
 
         log.info(f"Uninstalling slurm on {amd_host.host_ip}... ")
-        amd_host.helper_obj.run_scripts(local_uninstall_script, uninstall_script,pytest.testdata.results_dir)
+        exit_code = await amd_host.helper_obj.run_scripts_async(local_uninstall_script, uninstall_script,pytest.testdata.results_dir)
+        assert not exit_code, f"{uninstall_script} failed on {amd_host.host_ip} with exit code {exit_code}"
         log.info(f"Uninstalling slurm on {amd_host.host_ip}... SUCCESSFUL  !!")
 
         log.info(f"Uninstalling enroot on {amd_host.host_ip}... ")
-        exit_code, output = amd_host.execute_command(f"""yes "Y" | sudo  DEBIAN_FRONTEND=noninteractive apt purge enroot """)
-        if exit_code :
-            assert False , f" Error uninstalling enroot on {amd_host.host_ip}, {output['stderr']}"  
+        result = await amd_host.run("""yes "Y" | sudo  DEBIAN_FRONTEND=noninteractive apt purge enroot """)
+        if result.exit_code :
+            assert False , f" Error uninstalling enroot on {amd_host.host_ip}, {result.stderr}"  
+
+    async def teardown_all():
+        # Every host is torn down at the same time from one event loop
+        await asyncio.gather(*(teardown_host(amd_host) for amd_host in pytest.testdata.amd_host))
+
+    asyncio.run(teardown_all())
         
     log.info("Testbed teardown complete")    
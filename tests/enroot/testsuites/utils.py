@@ -18,12 +18,13 @@ import pytest
 import os
 import re
 import yaml
-import tenacity
 import textwrap
 from pathlib import Path
 
 from lib.host_handler import RemoteHostHandler
 from lib.helper_lib import HelperLib
+from lib.job_watcher import JobWatcher
+from lib.nccl_log import NcclLogAnalyzer
 
 log = logging.getLogger(__name__)
 
@@ -244,109 +245,46 @@ def create_batch_script(amd_host,local_batch_script):
         return exit_code
     return exit_code
 
-@tenacity.retry(wait=tenacity.wait_fixed(20), stop=tenacity.stop_after_attempt(60))
-def wait_for_job_completion(headnode, job_id):
-
-    # Get job status from sacct
-    exit_code, output = headnode.execute_command(f"sacct -j {job_id} --format=JobID,State --noheader")
-    if exit_code:
-        log.info(f"Error getting the sacct job status : {output['stderr']}")
-        return exit_code, output
-    #Parse sacct output 
-    sacct_output  = output['stdout']
-    lines = [l for l in sacct_output.splitlines() if l.strip()]
-    if not lines:
-        log.info("No sacct result yet, retrying...")
-        raise Exception("Job state not available yet")
-
-    cols = lines[0].split()
-    state = cols[1] if len(cols) > 1 else None
-    
-    log.info(f"Current job state: {state}")
-    if state in ["COMPLETED", "FAILED", "CANCELLED", "TIMEOUT", "OUT_OF_MEMORY"]:
-        return state, sacct_output
-
-    raise Exception(f"Job still running: {state}")
-
-def list_all_ib_devices_remote(amd_host):
-    exit_code, output = amd_host.execute_command(f"ls /sys/class/infiniband")
-    if exit_code:
-        log.error(f"Error listing IB devices: {output['stderr']}")
-        return exit_code,0
-
-    devices = []
-    for dev in output['stdout'].split():
-        ports_cmd = f"ls /sys/class/infiniband/{dev}/ports"
-        exit_code, output = amd_host.execute_command(ports_cmd)
-        if exit_code:
-            log.error(f"Error listing IB devices Ports: {output['stderr']}")
-            return exit_code,0
-        ports_out = output['stdout']
-        for port in ports_out.split():
-            devices.append((dev, int(port)))
-
-    if not devices:
-        return exit_code,0
-
-    return exit_code, devices
-
-def read_ib_counters_remote(amd_host, device, port):
-    base = f"/sys/class/infiniband/{device}/ports/{port}/hw_counters"
-
-    counters = {}
-    for name in (
-        "tx_rdma_ucast_bytes",
-        "rx_rdma_ucast_bytes",
-        "tx_rdma_ucast_pkts",
-        "rx_rdma_ucast_pkts",
-    ):
-        cmd = f"cat {base}/{name} 2>/dev/null || echo 0"
-        exit_code, output = amd_host.execute_command(cmd)
-        if exit_code:
-            log.error(f"Error listing IB devices: {output['stderr']}")
-            return exit_code,0
-        val = output['stdout']
-        counters[name] = int(val)
-
-    return counters
-
-def parse_used_ib_devices_from_log(log_path):
-
-    NET_IB_REGEX = re.compile(
-    r'\[\d+\]([a-zA-Z0-9_]+):(\d+)/(?:RoCE|IB)',
-    re.IGNORECASE)
-
-    devices = set()
-    net_ib_lines = []
-    socket_lines = []
-
-    with open(log_path, "r", errors="ignore") as f:
-        for line in f:
-            line = line.strip()
+def remove_remote_files(amd_host, paths):
+    """
+    Delete the given files/directories on the remote host in one round trip,
+    every path is attempted and each failure is reported
+    """
+    results = amd_host.execute_batch([f"sudo rm -rf {path}" for path in paths], stop_on_failure=False)
+    assert len(results) == len(paths), f" Error deleting {paths} on {amd_host.host_ip} !, {results[-1].stderr if results else ''}"
+    failed = [f"{result.command} : {result.stderr}" for result in results if result.exit_code]
+    assert not failed, f" Error deleting the files on {amd_host.host_ip} !, {failed}"
 
-            if "NET/Socket" in line:
-                socket_lines.append(line)
+def wait_for_job_completion(headnode, job_id, timeout=20 * 60):
+    """
+    Wait for one sbatch job, use a JobWatcher directly to wait for many jobs at once
 
-            if "NET/IB" not in line:
-                continue
+    Return : (state, sacct_output) of the job
+    """
+    watcher = JobWatcher(headnode, timeout=timeout)
+    try:
+        status = watcher.watch(job_id).result()
+    finally:
+        watcher.stop()
+    log.info(f"Job {job_id} steps : {status.steps}")
+    return status.state, status.sacct_output
 
-            net_ib_lines.append(line)
+def parse_used_ib_devices_from_log(log_path, analyzer=None):
+    """
+    Find the IB devices used by NCCL in a log, fail on socket fallback
 
-            for m in NET_IB_REGEX.finditer(line):
-                dev, port = m.groups()
-                devices.add((dev, int(port)))
+    Return : (sorted list of (device, port), NET/IB lines)
+    """
+    if analyzer is None:
+        analyzer = NcclLogAnalyzer.from_file(log_path)
 
-    if not net_ib_lines:
+    if not analyzer.net_ib_lines:
         raise AssertionError("No NET/IB lines found in NCCL log")
 
-    if socket_lines:
+    if analyzer.socket_lines:
         raise AssertionError(
             "Socket fallback detected:\n" +
-            "\n".join(socket_lines[:3])
+            "\n".join(analyzer.socket_lines[:3])
         )
 
-    return sorted(devices), net_ib_lines
-
-def counter_delta(before, after):
-    return {k: after[k] - before[k] for k in before}
-
+    return sorted(analyzer.devices), analyzer.net_ib_lines